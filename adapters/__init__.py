@@ -1,18 +1,43 @@
 """
 Adapters para diferentes APIs de búsqueda y scraping.
+
+Las clases de cada API se importan al pedirlas (from adapters import
+TavilyAdapter), no al importar el paquete, así que `import adapters` no
+carga los SDKs de Firecrawl, Tavily, OpenAI ni requests. El orquestador usa
+RegistroAdapters (adapters/registro.py), que además construye cada adapter
+la primera vez que una búsqueda lo necesita.
 """
+import importlib
+
 from .base import SearchAdapter, SearchResult
-from .firecrawl_adapter import FirecrawlAdapter
-from .google_adapter import GoogleSearchAdapter, GooglePlacesAdapter
-from .tavily_adapter import TavilyAdapter
-from .openai_adapter import OpenAIAdapter
+from .registro import REGISTRO_ADAPTERS, RegistroAdapters, api_configurada, clase_adapter
+
+# Clase -> módulo que la define (se importa en el primer acceso)
+_MODULOS_CLASES = {
+    "FirecrawlAdapter": ".firecrawl_adapter",
+    "GoogleSearchAdapter": ".google_adapter",
+    "GooglePlacesAdapter": ".google_adapter",
+    "TavilyAdapter": ".tavily_adapter",
+    "OpenAIAdapter": ".openai_adapter",
+}
+
+
+def __getattr__(nombre: str):
+    if nombre in _MODULOS_CLASES:
+        return getattr(importlib.import_module(_MODULOS_CLASES[nombre], __name__), nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
 
 __all__ = [
     "SearchAdapter",
     "SearchResult",
     "FirecrawlAdapter",
-    "GoogleSearchAdapter", 
+    "GoogleSearchAdapter",
     "GooglePlacesAdapter",
     "TavilyAdapter",
     "OpenAIAdapter",
+    "REGISTRO_ADAPTERS",
+    "RegistroAdapters",
+    "api_configurada",
+    "clase_adapter",
 ]
@@ -1,11 +1,22 @@
 """
 Clase base para todos los adapters de búsqueda.
 """
+import functools
+import inspect
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from datetime import datetime
 
+from utils.cache_consultas import get_cache
+from utils.limitador import (
+    REINTENTOS_429, es_limite_superado, obtener_limitador, segundos_reintento
+)
+from utils.presupuesto import hay_cuota, liberar_cuota, reservar_cuota
+from utils.telefonos import normalizar_telefono
+from utils.trazas import anotar, span, tamano_payload
+
 
 @dataclass
 class SearchResult:
@@ -23,10 +34,11 @@ class SearchResult:
     fuente: Optional[str] = None
     url_origen: Optional[str] = None
     fecha_extraccion: str = field(default_factory=lambda: datetime.now().isoformat())
+    place_id: Optional[str] = None  # Google Places, para pedir los detalles
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convierte a diccionario para JSON."""
-        return {
+        """Convierte a diccionario para JSON (place_id solo si lo hay)."""
+        data = {
             "nombre": self.nombre,
             "tipo": self.tipo,
             "telefono": self.telefono,
@@ -41,6 +53,9 @@ class SearchResult:
             "url_origen": self.url_origen,
             "fecha_extraccion": self.fecha_extraccion,
         }
+        if self.place_id:
+            data["place_id"] = self.place_id
+        return data
     
     def es_valido(self) -> bool:
         """Verifica si tiene al menos un método de contacto."""
@@ -63,17 +78,71 @@ class SearchResult:
             fuente=data.get("fuente"),
             url_origen=data.get("url_origen"),
             fecha_extraccion=data.get("fecha_extraccion", datetime.now().isoformat()),
+            place_id=data.get("place_id"),
         )
 
 
+def _con_cache(metodo: str, funcion: Callable) -> Callable:
+    """Envuelve un método de búsqueda con la caché persistente de consultas."""
+    firma = inspect.signature(funcion)
+    
+    @functools.wraps(funcion)
+    def envoltura(self, *args, **kwargs):
+        if not self.usar_cache or not self.esta_disponible():
+            return funcion(self, *args, **kwargs)
+        
+        # Argumentos por nombre, con defaults: search(q, 10) == search(q, num=10)
+        llamada = firma.bind(self, *args, **kwargs)
+        llamada.apply_defaults()
+        parametros = {}
+        for nombre, valor in list(llamada.arguments.items())[1:]:
+            if firma.parameters[nombre].kind is inspect.Parameter.VAR_KEYWORD:
+                parametros.update(valor)
+            elif firma.parameters[nombre].kind is not inspect.Parameter.VAR_POSITIONAL:
+                parametros[nombre] = valor
+        
+        cache = get_cache()
+        clave = cache.clave(self.nombre, metodo, parametros)
+        with cache.bloqueo(clave):
+            guardado = cache.obtener(self.nombre, clave)
+            anotar(cache="hit" if guardado is not None else "miss")
+            if guardado is not None:
+                return [SearchResult.from_dict(d) for d in guardado]
+            
+            resultados = funcion(self, *args, **kwargs)
+            # Vacío suele ser un error ya impreso por el adapter: no se guarda
+            if resultados and all(isinstance(r, SearchResult) for r in resultados):
+                cache.guardar(self.nombre, metodo, clave, parametros, [r.to_dict() for r in resultados])
+            return resultados
+    
+    return envoltura
+
+
 class SearchAdapter(ABC):
     """Clase base abstracta para adapters de búsqueda."""
     
+    # Métodos cuyos resultados se guardan en la caché de consultas
+    # (utils.cache_consultas); las subclases pueden ampliar la lista
+    METODOS_CACHEABLES = ("search",)
+    usar_cache = True
+    
+    # El modo asíncrono del orquestador llama a un mismo adapter desde varios hilos
+    _lock_contador = threading.Lock()
+    
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key
         self.nombre = "base"
         self.requests_realizados = 0
         self.limite_requests = None
+        # Cuota reservada por cada hilo para su próxima llamada (ver llamar_api)
+        self._reservas = threading.local()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for metodo in cls.METODOS_CACHEABLES:
+            funcion = cls.__dict__.get(metodo)
+            if funcion is not None:
+                setattr(cls, metodo, _con_cache(metodo, funcion))
     
     @abstractmethod
     def search(self, query: str, **kwargs) -> List[SearchResult]:
@@ -85,42 +154,96 @@ class SearchAdapter(ABC):
         return bool(self.api_key)
     
     def dentro_de_limite(self) -> bool:
-        """Verifica si está dentro del límite de requests."""
-        if self.limite_requests is None:
-            return True
-        return self.requests_realizados < self.limite_requests
-    
-    def incrementar_contador(self, cantidad: int = 1, creditos: int = 0):
-        """Incrementa el contador de requests y registra uso."""
-        self.requests_realizados += cantidad
+        """
+        Verifica si está dentro del límite de requests de esta instancia y
+        del presupuesto diario/mensual compartido (utils.presupuesto).
+        """
+        if self.limite_requests is not None and self.requests_realizados >= self.limite_requests:
+            return False
+        return hay_cuota(self.nombre)
+    
+    def llamar_api(self, funcion: Callable, *args, **kwargs):
+        """
+        Ejecuta una llamada a la API respetando su limitador de tasa.
+        
+        El limitador (utils.limitador) se comparte entre todos los hilos y
+        todas las instancias de la misma API. Un 429 (o el 403 de ritmo de
+        Google), tanto en la respuesta como en una excepción, pausa la API
+        para todos y se reintenta hasta REINTENTOS_429 veces antes de
+        devolverlo o propagarlo. Los 5xx los reintenta la sesión HTTP
+        (utils.http) en los adapters que la usan.
         
-        # Registrar en el tracker de costos
+        Si la llamada acaba en excepción (error de red, timeout, 429
+        agotado) se devuelve la cuota que reservó antes reservar_cuota():
+        la API no ha servido nada.
+        
+        Args:
+            funcion: Llamada bloqueante (requests.get, método del cliente...)
+            
+        Returns:
+            Lo que devuelva `funcion`
+        """
+        reserva = getattr(self._reservas, "pendiente", None)
+        self._reservas.pendiente = None
         try:
-            from utils.api_tracker import registrar_uso
-            registrar_uso(
-                api=self.nombre,
-                requests=cantidad,
-                creditos=creditos if creditos else cantidad
-            )
-        except ImportError:
-            pass  # Tracker no disponible
+            return self._llamar_con_limitador(funcion, *args, **kwargs)
+        except BaseException:
+            if reserva:
+                liberar_cuota(self.nombre, *reserva)
+                with self._lock_contador:
+                    self.requests_realizados -= reserva[0]
+            raise
+    
+    def _llamar_con_limitador(self, funcion: Callable, *args, **kwargs):
+        limitador = obtener_limitador(self.nombre)
+        for intento in range(REINTENTOS_429 + 1):
+            with limitador, span("llamada_api", api=self.nombre, intento=intento) as datos:
+                try:
+                    respuesta = funcion(*args, **kwargs)
+                except Exception as e:
+                    if intento == REINTENTOS_429 or not es_limite_superado(e):
+                        raise
+                    respuesta = e
+                else:
+                    datos["bytes"] = tamano_payload(respuesta)
+                    if hasattr(respuesta, "status_code"):
+                        datos["status"] = respuesta.status_code
+                    if intento == REINTENTOS_429 or not es_limite_superado(respuesta):
+                        return respuesta
+                datos["limite_superado"] = True
+            espera = segundos_reintento(respuesta, intento)
+            print(f"[{self.nombre}] Límite de tasa, reintento en {espera:.1f}s")
+            limitador.penalizar(espera)
+    
+    def reservar_cuota(self, cantidad: int = 1, creditos: int = 0):
+        """
+        Reserva cuota para una llamada antes de hacerla y la registra en el
+        tracker de costos.
+        
+        La reserva es atómica entre hilos, procesos y sesiones de Streamlit
+        (utils.presupuesto), así que varias ejecuciones a la vez no pasan
+        de los topes diario y mensual de la API.
+        
+        Args:
+            cantidad: Requests de la llamada
+            creditos: Créditos que consume (por defecto, uno por request)
+            
+        Raises:
+            PresupuestoAgotado: Si la llamada pasaría algún tope
+        """
+        creditos = creditos if creditos else cantidad
+        reservar_cuota(self.nombre, requests=cantidad, creditos=creditos)
+        self._reservas.pendiente = (cantidad, creditos)
+        with self._lock_contador:
+            self.requests_realizados += cantidad
     
     def resetear_contador(self):
         """Resetea el contador de requests."""
         self.requests_realizados = 0
     
     def normalizar_telefono(self, telefono: str) -> str:
-        """Normaliza un número de teléfono español."""
-        if not telefono:
-            return ""
-        # Eliminar espacios, guiones, paréntesis
-        limpio = "".join(c for c in telefono if c.isdigit() or c == "+")
-        # Añadir prefijo +34 si no tiene
-        if limpio.startswith("34") and not limpio.startswith("+"):
-            limpio = "+" + limpio
-        elif limpio.startswith("6") or limpio.startswith("9"):
-            limpio = "+34" + limpio
-        return limpio
+        """Normaliza un número de teléfono al formato canónico +34 XXX XXX XXX."""
+        return normalizar_telefono(telefono) or (telefono or "").strip()
     
     def validar_email(self, email: str) -> bool:
         """Valida formato básico de email."""
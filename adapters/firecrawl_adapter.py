@@ -70,6 +70,9 @@ Devuelve JSON válido.
 class FirecrawlAdapter(SearchAdapter):
     """Adapter para Firecrawl con capacidades avanzadas de scraping."""
     
+    # Los directorios se extraen en cada ronda y cuestan un crédito por URL
+    METODOS_CACHEABLES = ("search", "extract_structured")
+    
     def __init__(self, api_key: Optional[str] = None):
         super().__init__(api_key or os.getenv("FIRECRAWL_API_KEY"))
         self.nombre = "firecrawl"
@@ -88,8 +91,8 @@ class FirecrawlAdapter(SearchAdapter):
             return []
         
         try:
-            resultado = self.app.search(query, limit=limit)
-            self.incrementar_contador()
+            self.reservar_cuota()
+            resultado = self.llamar_api(self.app.search, query, limit=limit)
             return self._procesar_resultados_busqueda(resultado, query)
         except Exception as e:
             print(f"[Firecrawl] Error en búsqueda: {e}")
@@ -102,8 +105,8 @@ class FirecrawlAdapter(SearchAdapter):
         
         formats = formats or ["markdown", "links"]
         try:
-            resultado = self.app.scrape(url, formats=formats, only_main_content=True)
-            self.incrementar_contador()
+            self.reservar_cuota()
+            resultado = self.llamar_api(self.app.scrape, url, formats=formats, only_main_content=True)
             return resultado if isinstance(resultado, dict) else {"markdown": str(resultado)}
         except Exception as e:
             print(f"[Firecrawl] Error scraping {url}: {e}")
@@ -123,8 +126,8 @@ class FirecrawlAdapter(SearchAdapter):
         
         # Primero intentar mapear el sitio para encontrar contacto
         try:
-            mapa = self.app.map(url_base, limit=20)
-            self.incrementar_contador()
+            self.reservar_cuota()
+            mapa = self.llamar_api(self.app.map, url_base, limit=20)
             
             urls = mapa.get("urls", []) if isinstance(mapa, dict) else []
             
@@ -166,8 +169,8 @@ class FirecrawlAdapter(SearchAdapter):
         resultados = []
         try:
             # Firecrawl extract acepta lista de URLs
-            extraction = self.app.extract(urls=urls, schema=schema, prompt=prompt)
-            self.incrementar_contador(len(urls))
+            self.reservar_cuota(len(urls))
+            extraction = self.llamar_api(self.app.extract, urls=urls, schema=schema, prompt=prompt)
             
             # Procesar resultado
             if isinstance(extraction, dict):
@@ -194,13 +197,14 @@ class FirecrawlAdapter(SearchAdapter):
         
         resultados = []
         try:
-            crawl_result = self.app.crawl(
+            self.reservar_cuota(max_pages)
+            crawl_result = self.llamar_api(
+                self.app.crawl,
                 url,
                 limit=max_pages,
                 max_depth=2,
                 scrape_options={"formats": ["markdown"]}
             )
-            self.incrementar_contador(max_pages)
             
             # Procesar cada página crawleada
             pages = crawl_result.get("data", []) if isinstance(crawl_result, dict) else []
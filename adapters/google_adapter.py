@@ -3,22 +3,25 @@ Adapters para Google APIs.
 - Google Custom Search API (100 búsquedas/día gratis)
 - Google Places API ($200 crédito/mes gratis)
 """
+import contextvars
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Dict, Any
 from .base import SearchAdapter, SearchResult
+from utils.http import REQUESTS_DISPONIBLE, get_sesion
+from utils.limitador import obtener_limitador
 
-try:
-    import requests
-    REQUESTS_DISPONIBLE = True
-except ImportError:
-    REQUESTS_DISPONIBLE = False
+
+MAX_WORKERS_DETALLES = 10  # hilos de enriquecer_con_detalles (los acota además el limitador)
 
 
 class GoogleSearchAdapter(SearchAdapter):
     """Adapter para Google Custom Search API."""
     
     BASE_URL = "https://www.googleapis.com/customsearch/v1"
+    # Respuesta parcial: solo lo que lee _procesar_resultados
+    CAMPOS = "items(title,link,snippet)"
     
     def __init__(self, api_key: Optional[str] = None, cse_id: Optional[str] = None):
         super().__init__(api_key or os.getenv("GOOGLE_API_KEY"))
@@ -43,10 +46,11 @@ class GoogleSearchAdapter(SearchAdapter):
                 "num": min(num, 10),  # máximo 10 por request
                 "lr": "lang_es",  # resultados en español
                 "cr": "countryES",  # desde España
+                "fields": self.CAMPOS,
             }
             
-            response = requests.get(self.BASE_URL, params=params, timeout=30)
-            self.incrementar_contador()
+            self.reservar_cuota()
+            response = self.llamar_api(get_sesion().get, self.BASE_URL, params=params, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -136,6 +140,14 @@ class GooglePlacesAdapter(SearchAdapter):
     """Adapter para Google Places API."""
     
     BASE_URL = "https://maps.googleapis.com/maps/api/place"
+    # Campos de Place Details que usa _place_detail_to_result (los demás
+    # engordan la respuesta y algunos, como reviews, se facturan aparte).
+    # Nearby Search (API legacy) no admite máscara de campos
+    CAMPOS_DETALLE = "name,formatted_address,formatted_phone_number,website,rating"
+    
+    # Los detalles se guardan en la caché de consultas por place_id, así
+    # que un lugar ya consultado dentro del TTL no vuelve a pagarse
+    METODOS_CACHEABLES = ("search", "_detalle")
     
     # Coordenadas de distritos de Madrid
     DISTRITOS_MADRID = {
@@ -198,8 +210,8 @@ class GooglePlacesAdapter(SearchAdapter):
                 "type": "lawyer",
             }
             
-            response = requests.get(url, params=params, timeout=30)
-            self.incrementar_contador()
+            self.reservar_cuota()
+            response = self.llamar_api(get_sesion().get, url, params=params, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -237,7 +249,7 @@ class GooglePlacesAdapter(SearchAdapter):
             
             # Filtrar duplicados por place_id
             for r in resultados:
-                place_id = getattr(r, '_place_id', r.nombre)
+                place_id = r.place_id or r.nombre
                 if place_id not in place_ids_vistos:
                     place_ids_vistos.add(place_id)
                     r.distrito = distrito.title()
@@ -246,31 +258,36 @@ class GooglePlacesAdapter(SearchAdapter):
         return todos_resultados
     
     def get_details(self, place_id: str) -> Optional[SearchResult]:
-        """Obtiene detalles completos de un lugar."""
+        """Obtiene detalles completos de un lugar (de la caché si ya se pidieron)."""
         if not self.esta_disponible():
             return None
         
+        detalles = self._detalle(place_id)
+        return detalles[0] if detalles else None
+    
+    def _detalle(self, place_id: str) -> List[SearchResult]:
+        """Llamada a Place Details. Devuelve una lista (vacía si falla) para poder cachearla."""
         try:
             url = f"{self.BASE_URL}/details/json"
             params = {
                 "key": self.api_key,
                 "place_id": place_id,
-                "fields": "name,formatted_address,formatted_phone_number,website,rating,reviews,opening_hours,types",
+                "fields": self.CAMPOS_DETALLE,
                 "language": "es",
             }
             
-            response = requests.get(url, params=params, timeout=30)
-            self.incrementar_contador()
+            self.reservar_cuota()
+            response = self.llamar_api(get_sesion().get, url, params=params, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
                 if data.get("status") == "OK":
-                    return self._place_detail_to_result(data.get("result", {}))
+                    return [self._place_detail_to_result(data.get("result", {}))]
                     
         except Exception as e:
             print(f"[GooglePlaces] Error obteniendo detalles: {e}")
         
-        return None
+        return []
     
     def _procesar_places(self, places: List[Dict]) -> List[SearchResult]:
         """Procesa lista de lugares de Google Places."""
@@ -287,11 +304,9 @@ class GooglePlacesAdapter(SearchAdapter):
                 valoracion=place.get("rating"),
                 ciudad="Madrid",
                 fuente="google_places",
+                place_id=place.get("place_id") or None,  # para obtener detalles después
             )
             
-            # Guardar place_id para obtener detalles después
-            sr._place_id = place.get("place_id", "")
-            
             # Tipos pueden indicar especialización
             types = place.get("types", [])
             if "lawyer" in types:
@@ -315,25 +330,58 @@ class GooglePlacesAdapter(SearchAdapter):
             fuente="google_places_detail",
         )
     
-    def enriquecer_con_detalles(self, resultados: List[SearchResult]) -> List[SearchResult]:
-        """Enriquece resultados con detalles completos (consume más API calls)."""
-        enriquecidos = []
+    def enriquecer_con_detalles(
+        self,
+        resultados: List[SearchResult],
+        max_workers: int = MAX_WORKERS_DETALLES
+    ) -> List[SearchResult]:
+        """
+        Enriquece resultados con detalles completos (consume más API calls).
+        
+        Cada place_id se pide una sola vez aunque se repita, los ya
+        consultados dentro del TTL salen de la caché, y el resto se piden a
+        la vez: como mucho max_workers, y nunca más de las que deja el
+        limitador compartido de google_places.
         
+        Args:
+            resultados: Resultados de search/search_nearby (con place_id)
+            max_workers: Llamadas simultáneas como mucho
+            
+        Returns:
+            Los mismos resultados, con teléfono, web, dirección y valoración
+            del detalle cuando los trae
+        """
+        place_ids = list(dict.fromkeys(r.place_id for r in resultados if r.place_id))
+        detalles = self._detalles_en_paralelo(place_ids, max_workers)
+        
+        enriquecidos = []
         for r in resultados:
-            place_id = getattr(r, '_place_id', None)
-            if place_id:
-                detalle = self.get_details(place_id)
-                if detalle:
-                    # Fusionar datos
-                    if detalle.telefono:
-                        r.telefono = detalle.telefono
-                    if detalle.web:
-                        r.web = detalle.web
-                    if detalle.direccion:
-                        r.direccion = detalle.direccion
-                    if detalle.valoracion:
-                        r.valoracion = detalle.valoracion
+            detalle = detalles.get(r.place_id)
+            if detalle:
+                # Fusionar datos
+                if detalle.telefono:
+                    r.telefono = detalle.telefono
+                if detalle.web:
+                    r.web = detalle.web
+                if detalle.direccion:
+                    r.direccion = detalle.direccion
+                if detalle.valoracion:
+                    r.valoracion = detalle.valoracion
             
             enriquecidos.append(r)
         
         return enriquecidos
+    
+    def _detalles_en_paralelo(self, place_ids: List[str], max_workers: int) -> Dict[str, Optional[SearchResult]]:
+        """get_details de varios lugares con un pool de hilos acotado."""
+        workers = min(max_workers, obtener_limitador(self.nombre).max_paralelo, len(place_ids))
+        if workers <= 1:
+            return {place_id: self.get_details(place_id) for place_id in place_ids}
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="places_detalle") as executor:
+            # Cada hilo con su copia del contexto, para que la traza activa registre las llamadas
+            futuros = {
+                place_id: executor.submit(contextvars.copy_context().run, self.get_details, place_id)
+                for place_id in place_ids
+            }
+            return {place_id: futuro.result() for place_id, futuro in futuros.items()}
@@ -98,7 +98,9 @@ class OpenAIAdapter(SearchAdapter):
             return []
         
         try:
-            response = self.client.chat.completions.create(
+            self.reservar_cuota()
+            response = self.llamar_api(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {
@@ -113,7 +115,6 @@ class OpenAIAdapter(SearchAdapter):
                 temperature=0.1,
                 response_format={"type": "json_object"}
             )
-            self.incrementar_contador()
             
             contenido = response.choices[0].message.content
             return self._procesar_json_response(contenido)
@@ -134,7 +135,9 @@ class OpenAIAdapter(SearchAdapter):
         texto = texto[:8000]
         
         try:
-            response = self.client.chat.completions.create(
+            self.reservar_cuota()
+            response = self.llamar_api(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {
@@ -149,7 +152,6 @@ class OpenAIAdapter(SearchAdapter):
                 temperature=0,
                 response_format={"type": "json_object"}
             )
-            self.incrementar_contador()
             
             contenido = response.choices[0].message.content
             return self._procesar_json_response(contenido)
@@ -184,7 +186,9 @@ Responde JSON:
 }}"""
 
         try:
-            response = self.client.chat.completions.create(
+            self.reservar_cuota()
+            response = self.llamar_api(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "Analiza duplicados de registros. Solo JSON."},
@@ -193,7 +197,6 @@ Responde JSON:
                 temperature=0,
                 response_format={"type": "json_object"}
             )
-            self.incrementar_contador()
             
             return json.loads(response.choices[0].message.content)
             
@@ -226,7 +229,9 @@ Genera un registro actualizado que:
 Responde SOLO con el JSON actualizado."""
 
         try:
-            response = self.client.chat.completions.create(
+            self.reservar_cuota()
+            response = self.llamar_api(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "Fusiona registros de datos. Solo JSON."},
@@ -235,7 +240,6 @@ Responde SOLO con el JSON actualizado."""
                 temperature=0,
                 response_format={"type": "json_object"}
             )
-            self.incrementar_contador()
             
             return json.loads(response.choices[0].message.content)
             
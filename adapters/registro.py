@@ -0,0 +1,96 @@
+"""
+Registro de adapters con carga perezosa.
+
+Saber si una API se puede usar solo requiere mirar sus variables de entorno
+y si su SDK está instalado (importlib.util.find_spec, sin importarlo). El
+módulo del adapter, su SDK y el cliente se cargan la primera vez que una
+búsqueda pide el adapter, así que una ejecución que solo usa Tavily no paga
+el import ni la construcción de Firecrawl, OpenAI o requests.
+"""
+import importlib
+import importlib.util
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple, Type
+
+from .base import SearchAdapter
+
+
+# API -> (módulo, clase, variables de entorno necesarias, SDK)
+REGISTRO_ADAPTERS: Dict[str, Tuple[str, str, Tuple[str, ...], str]] = {
+    "firecrawl": ("adapters.firecrawl_adapter", "FirecrawlAdapter", ("FIRECRAWL_API_KEY",), "firecrawl"),
+    "google_search": ("adapters.google_adapter", "GoogleSearchAdapter",
+                      ("GOOGLE_API_KEY", "GOOGLE_CSE_ID"), "requests"),
+    "google_places": ("adapters.google_adapter", "GooglePlacesAdapter", ("GOOGLE_API_KEY",), "requests"),
+    "tavily": ("adapters.tavily_adapter", "TavilyAdapter", ("TAVILY_API_KEY",), "tavily"),
+    "openai": ("adapters.openai_adapter", "OpenAIAdapter", ("OPENAI_API_KEY",), "openai"),
+}
+
+
+def api_configurada(api: str) -> bool:
+    """True si la API tiene sus variables de entorno y su SDK instalado (sin importarlo)."""
+    if api not in REGISTRO_ADAPTERS:
+        return False
+    _, _, variables, sdk = REGISTRO_ADAPTERS[api]
+    if not all(os.getenv(variable) for variable in variables):
+        return False
+    try:
+        return importlib.util.find_spec(sdk) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def clase_adapter(api: str) -> Type[SearchAdapter]:
+    """Importa el módulo del adapter de una API y devuelve su clase."""
+    modulo, clase, _, _ = REGISTRO_ADAPTERS[api]
+    return getattr(importlib.import_module(modulo), clase)
+
+
+class RegistroAdapters(Mapping):
+    """
+    Adapters de las APIs disponibles, construidos en el primer acceso.
+
+    Se usa como un dict de solo lectura: `api in registro` y la iteración
+    no construyen nada; `registro[api]` importa y construye el adapter la
+    primera vez (una sola, aunque lo pidan varios hilos a la vez).
+    """
+
+    def __init__(self, apis: Iterable[str]):
+        """
+        Args:
+            apis: APIs habilitadas en la configuración
+        """
+        self._disponibles: List[str] = [api for api in apis if api_configurada(api)]
+        self._instancias: Dict[str, SearchAdapter] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, api: str) -> SearchAdapter:
+        adapter = self._instancias.get(api)
+        if adapter is not None:
+            return adapter
+        with self._lock:
+            if api in self._instancias:
+                return self._instancias[api]
+            if api not in self._disponibles:
+                raise KeyError(api)
+            adapter = clase_adapter(api)()
+            if not adapter.esta_disponible():
+                # Credenciales o SDK que solo fallan al crear el cliente
+                self._disponibles.remove(api)
+                print(f"[Adapters] ⚠ {api} no disponible")
+                raise KeyError(api)
+            self._instancias[api] = adapter
+            return adapter
+
+    def __contains__(self, api: object) -> bool:
+        return api in self._disponibles
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._disponibles))
+
+    def __len__(self) -> int:
+        return len(self._disponibles)
+
+    def cargados(self) -> Dict[str, SearchAdapter]:
+        """Adapters ya construidos."""
+        return dict(self._instancias)
@@ -51,7 +51,9 @@ class TavilyAdapter(SearchAdapter):
         
         resultados = []
         try:
-            response = self.client.search(
+            self.reservar_cuota()
+            response = self.llamar_api(
+                self.client.search,
                 query=query,
                 max_results=min(max_results, 20),
                 search_depth=search_depth,
@@ -59,7 +61,6 @@ class TavilyAdapter(SearchAdapter):
                 include_domains=[],  # Sin restricción
                 exclude_domains=["facebook.com", "twitter.com", "linkedin.com"],
             )
-            self.incrementar_contador()
             
             resultados = self._procesar_respuesta(response, query)
             
@@ -117,11 +118,12 @@ class TavilyAdapter(SearchAdapter):
             return ""
         
         try:
-            context = self.client.get_search_context(
+            self.reservar_cuota()
+            context = self.llamar_api(
+                self.client.get_search_context,
                 query=query,
                 max_tokens=max_tokens,
             )
-            self.incrementar_contador()
             return context
         except Exception as e:
             print(f"[Tavily] Error obteniendo contexto: {e}")
@@ -9,6 +9,8 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime, date
 
+from utils.database import cargar_archivo
+
 # Configuración de página
 st.set_page_config(
     page_title="Dashboard - Abogados Extranjería",
@@ -125,8 +127,7 @@ def cargar_todos_los_datos():
             continue
         
         try:
-            with open(archivo, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = cargar_archivo(archivo)
             
             registros = data.get("registros", [])
             ciudad = archivo.stem.title()
@@ -2,10 +2,12 @@
 Módulos core del sistema de búsqueda multi-agente.
 """
 from .consolidador import Consolidador, ConsolidacionResult
+from .deduplicador_global import DeduplicadorGlobal
 from .orquestador import Orquestador
 
 __all__ = [
     "Consolidador",
     "ConsolidacionResult",
+    "DeduplicadorGlobal",
     "Orquestador",
 ]
@@ -0,0 +1,221 @@
+"""
+Agrupación de duplicados con union-find.
+
+Une en componentes conexas los registros que comparten algún dato de
+contacto (email, dominio web, teléfono con nombre parecido). Un duplicado
+transitivo (A~B por teléfono, B~C por web) queda en el mismo grupo sin
+enumerar todos los pares de cada cubo. El nombre, ni siquiera idéntico,
+no une por sí solo ("Contacto", "Derecho de Extranjería" son de muchos
+despachos): esos casos salen como pares para revisar (pares_nombre_similar).
+
+Lo usan el Consolidador (agrupar_duplicados / deduplicar), la página de
+depuración y el deduplicador global entre ciudades.
+"""
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# numpy se importa al puntuar el primer bloque (cuesta ~0.1 s al arrancar)
+try:
+    from rapidfuzz import fuzz, process
+    CDIST_DISPONIBLE = importlib.util.find_spec("numpy") is not None
+except ImportError:
+    CDIST_DISPONIBLE = False
+
+
+# Por encima de este tamaño no se comparan todos los nombres entre sí
+MAX_REGISTROS_NOMBRE = 5000
+
+# Filas por bloque al comparar nombres con process.cdist
+FILAS_BLOQUE_NOMBRES = 256
+
+DESCRIPCION_SENALES = {
+    "tel": "Mismo teléfono",
+    "email": "Mismo email",
+    "dom": "Mismo dominio",
+}
+
+
+class UnionFind:
+    """Conjuntos disjuntos con compresión de caminos y unión por tamaño."""
+
+    def __init__(self, elementos: Iterable = ()):
+        self.padre: Dict = {}
+        self.tamano: Dict = {}
+        for x in elementos:
+            self.agregar(x)
+
+    def agregar(self, x):
+        if x not in self.padre:
+            self.padre[x] = x
+            self.tamano[x] = 1
+
+    def encontrar(self, x):
+        raiz = x
+        while self.padre[raiz] != raiz:
+            raiz = self.padre[raiz]
+        while self.padre[x] != raiz:
+            self.padre[x], x = raiz, self.padre[x]
+        return raiz
+
+    def unir(self, a, b) -> bool:
+        """Une los conjuntos de a y b. Devuelve False si ya estaban unidos."""
+        ra, rb = self.encontrar(a), self.encontrar(b)
+        if ra == rb:
+            return False
+        if self.tamano[ra] < self.tamano[rb]:
+            ra, rb = rb, ra
+        self.padre[rb] = ra
+        self.tamano[ra] += self.tamano[rb]
+        return True
+
+    def grupos(self) -> Dict:
+        """Raíz -> lista de elementos del grupo."""
+        grupos: Dict = {}
+        for x in self.padre:
+            grupos.setdefault(self.encontrar(x), []).append(x)
+        return grupos
+
+
+@dataclass
+class GrupoDuplicados:
+    """Componente conexa de registros que parecen el mismo despacho."""
+    indices: List[int]
+    senales: Set[str] = field(default_factory=set)  # tel | email | dom
+    sugerido: Optional[Dict] = None  # registro fusionado propuesto
+
+    @property
+    def razon(self) -> str:
+        return ", ".join(DESCRIPCION_SENALES[s] for s in sorted(self.senales))
+
+
+def agrupar(
+    n: int,
+    cubos: Iterable[Tuple[str, Sequence[int]]],
+    nombres_norm: Sequence[str],
+    similitud: Callable[[str, str], float],
+    umbral_telefono: float = 60,
+) -> List[GrupoDuplicados]:
+    """
+    Agrupa registros duplicados en una pasada.
+
+    Solo une por datos de contacto compartidos: mismo email, mismo dominio
+    y mismo teléfono con nombre parecido (las reglas del nivel 4 del
+    consolidador). El nombre no une por sí solo, ni idéntico ni parecido:
+    nombres genéricos juntarían despachos distintos y la similitud difusa
+    no es transitiva; para eso está pares_nombre_similar().
+
+    Args:
+        n: Número de registros (índices 0..n-1)
+        cubos: (clave, índices) por cada clave de contacto compartida.
+            Las claves llevan prefijo tel:, email: o dom:
+        nombres_norm: Nombre normalizado de cada registro
+        similitud: Similitud 0-100 entre dos nombres normalizados
+        umbral_telefono: Similitud de nombre exigida además del teléfono
+
+    Returns:
+        Grupos de más de un registro, de mayor a menor
+    """
+    uf = UnionFind(range(n))
+    senales: Dict[int, Set[str]] = {}
+
+    def unir(a: int, b: int, senal: str):
+        uf.unir(a, b)
+        senales.setdefault(a, set()).add(senal)
+
+    for clave, indices in cubos:
+        if len(indices) < 2:
+            continue
+        tipo = clave.split(":", 1)[0]
+        if tipo == "tel":
+            # Teléfonos compartidos (centralitas, colegios) exigen nombre parecido
+            for i, a in enumerate(indices):
+                for b in indices[i + 1:]:
+                    if uf.encontrar(a) == uf.encontrar(b):
+                        continue
+                    if similitud(nombres_norm[a], nombres_norm[b]) > umbral_telefono:
+                        unir(a, b, tipo)
+        else:
+            # Mismo email o web: basta con enlazar cada uno con el primero
+            for b in indices[1:]:
+                if uf.encontrar(indices[0]) != uf.encontrar(b):
+                    unir(indices[0], b, tipo)
+
+    senales_grupo: Dict = {}
+    for a, tipos in senales.items():
+        senales_grupo.setdefault(uf.encontrar(a), set()).update(tipos)
+
+    grupos = [
+        GrupoDuplicados(indices=sorted(miembros), senales=senales_grupo.get(raiz, set()))
+        for raiz, miembros in uf.grupos().items()
+        if len(miembros) > 1
+    ]
+    grupos.sort(key=lambda g: (-len(g.indices), g.indices[0]))
+    return grupos
+
+
+def pares_nombre_similar(
+    nombres_norm: Sequence[str],
+    similitud: Callable[[str, str], float],
+    umbral: float,
+    grupos: Sequence[GrupoDuplicados] = (),
+) -> List[Tuple[int, int, float]]:
+    """
+    Pares de registros con nombre parecido que no están ya en un mismo grupo.
+
+    Es la única parte cuadrática: con rapidfuzz se calcula en C por bloques
+    de filas, sin límite hasta MAX_REGISTROS_NOMBRE registros.
+
+    Args:
+        nombres_norm: Nombre normalizado de cada registro
+        similitud: Similitud 0-100 entre dos nombres normalizados
+        umbral: Similitud mínima
+        grupos: Grupos de agrupar(), cuyos pares internos se omiten
+
+    Returns:
+        (i, j, similitud) con i < j, de mayor a menor similitud
+    """
+    if len(nombres_norm) > MAX_REGISTROS_NOMBRE:
+        return []
+
+    grupo_de = {idx: g for g, grupo in enumerate(grupos) for idx in grupo.indices}
+    pares = [
+        (i, j, puntuacion)
+        for i, j, puntuacion in _puntuar_nombres(nombres_norm, similitud, umbral)
+        if grupo_de.get(i, -1 - i) != grupo_de.get(j, -1 - j)
+    ]
+    pares.sort(key=lambda p: -p[2])
+    return pares
+
+
+def _puntuar_nombres(
+    nombres_norm: Sequence[str],
+    similitud: Callable[[str, str], float],
+    umbral: float,
+) -> Iterable[Tuple[int, int, float]]:
+    """(i, j, similitud) con i < j y similitud >= umbral."""
+    con_nombre = [i for i, nombre in enumerate(nombres_norm) if nombre]
+    nombres = [nombres_norm[i] for i in con_nombre]
+
+    if not CDIST_DISPONIBLE:
+        for x in range(len(nombres)):
+            for y in range(x + 1, len(nombres)):
+                puntuacion = similitud(nombres[x], nombres[y])
+                if puntuacion >= umbral:
+                    yield con_nombre[x], con_nombre[y], puntuacion
+        return
+
+    import numpy as np
+
+    # Misma puntuación que similitud_nombre (máximo de los tres scorers),
+    # calculada en C por bloques de filas contra los nombres siguientes
+    for inicio in range(0, len(nombres), FILAS_BLOQUE_NOMBRES):
+        filas = nombres[inicio:inicio + FILAS_BLOQUE_NOMBRES]
+        columnas = nombres[inicio:]
+        puntuaciones = np.maximum.reduce([
+            process.cdist(filas, columnas, scorer=scorer, dtype=np.float64, workers=-1)
+            for scorer in (fuzz.ratio, fuzz.partial_ratio, fuzz.token_sort_ratio)
+        ])
+        for x, y in zip(*np.nonzero(puntuaciones >= umbral)):
+            if y > x:
+                yield con_nombre[inicio + x], con_nombre[inicio + y], float(puntuaciones[x, y])
@@ -0,0 +1,237 @@
+"""
+Checkpoints de ejecuciones de búsqueda.
+
+Cada ejecución de Orquestador.ejecutar_busqueda escribe en
+data/ejecuciones/<run_id>/:
+
+    estado.json       -> BusquedaConfig, etapa actual, fechas y el plan
+                         (APIs, prompts y directorios elegidos)
+    resultados.jsonl  -> una línea por tarea terminada (API + prompt,
+                         Places o directorio) con sus resultados
+
+Si la ejecución se corta, `--resume RUN_ID` vuelve a cargar lo ya pagado,
+lanza solo las tareas que faltan del plan original y pasa a consolidar.
+Al completarse se borra resultados.jsonl (ya está en la ciudad); los
+directorios viejos se podan con podar_ejecuciones().
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Union
+
+from adapters import SearchResult
+
+
+# Etapas de una ejecución, en orden
+ETAPA_BUSQUEDA = "busqueda"
+ETAPA_CONSOLIDACION = "consolidacion"
+ETAPA_COMPLETADA = "completada"
+
+
+class CheckpointBusqueda:
+    """Directorio de checkpoints de una ejecución de búsqueda."""
+
+    def __init__(self, directorio: Union[str, Path], estado: Dict[str, Any]):
+        self.directorio = Path(directorio)
+        self.estado = estado
+        self._tareas: Dict[str, List[Dict]] = {}
+        self._reanudadas: Set[str] = set()  # tareas pagadas por un intento anterior
+        self._lock = threading.Lock()  # el modo asíncrono registra desde varios hilos
+
+    @property
+    def run_id(self) -> str:
+        return self.directorio.name
+
+    @property
+    def etapa(self) -> str:
+        return self.estado.get("etapa", ETAPA_BUSQUEDA)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """BusquedaConfig de la ejecución como dict."""
+        return self.estado.get("config", {})
+
+    @classmethod
+    def crear(cls, base_dir: Union[str, Path], config: Dict[str, Any]) -> "CheckpointBusqueda":
+        """
+        Crea el directorio de una ejecución nueva.
+
+        Args:
+            base_dir: Directorio de ejecuciones (data/ejecuciones)
+            config: BusquedaConfig como dict
+
+        Returns:
+            Checkpoint vacío en etapa "busqueda"
+        """
+        ciudad = str(config.get("ciudad", "ciudad")).lower().replace(" ", "_")
+        run_id = f"{ciudad}-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        directorio = Path(base_dir) / run_id
+        directorio.mkdir(parents=True)
+
+        checkpoint = cls(directorio, {
+            "config": config,
+            "etapa": ETAPA_BUSQUEDA,
+            "creado": datetime.now().isoformat(),
+        })
+        checkpoint._guardar_estado()
+        return checkpoint
+
+    @classmethod
+    def abrir(cls, base_dir: Union[str, Path], run_id: str) -> "CheckpointBusqueda":
+        """
+        Carga una ejecución existente con sus tareas terminadas.
+
+        Raises:
+            FileNotFoundError: Si no existe la ejecución
+        """
+        directorio = Path(base_dir) / run_id
+        with open(directorio / "estado.json", "r", encoding="utf-8") as f:
+            checkpoint = cls(directorio, json.load(f))
+
+        archivo = directorio / "resultados.jsonl"
+        if archivo.exists():
+            with open(archivo, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        entrada = json.loads(linea)
+                    except ValueError:
+                        continue  # última línea a medio escribir
+                    checkpoint._tareas[entrada["tarea"]] = entrada["resultados"]
+        checkpoint._reanudadas = set(checkpoint._tareas)
+        return checkpoint
+
+    def plan(self, clave: str, planificado: List[str]) -> List[str]:
+        """
+        Lista planificada de la ejecución (APIs, prompts de una API...).
+
+        La primera vez se guarda `planificado`; al reanudar se devuelve lo
+        guardado, aunque el planificador elija ahora otra cosa, para no
+        lanzar tareas que el intento original no iba a hacer.
+
+        Args:
+            clave: Qué se planifica ("apis", "consultas|tavily"...)
+            planificado: Lo que se planificaría ahora
+
+        Returns:
+            La lista de la ejecución
+        """
+        with self._lock:
+            planes = self.estado.setdefault("plan", {})
+            if clave not in planes:
+                planes[clave] = list(planificado)
+                self._guardar_estado()
+            return list(planes[clave])
+
+    def completada(self, tarea: str) -> bool:
+        return tarea in self._tareas
+
+    def reanudada(self, tarea: str) -> bool:
+        """True si la tarea la terminó un intento anterior (sus resultados ya se contaron)."""
+        return tarea in self._reanudadas
+
+    def resultados(self, tarea: str) -> List[SearchResult]:
+        """Resultados guardados de una tarea terminada."""
+        return [SearchResult.from_dict(r) for r in self._tareas.get(tarea, [])]
+
+    def registrar(self, tarea: str, resultados: List[Any]):
+        """
+        Guarda los resultados de una tarea terminada (con fsync).
+
+        Args:
+            tarea: Clave de la tarea (ver clave_tarea)
+            resultados: SearchResult o dicts
+        """
+        registros = [r.to_dict() if isinstance(r, SearchResult) else r for r in resultados]
+        linea = json.dumps({"tarea": tarea, "resultados": registros}, ensure_ascii=False)
+
+        with self._lock:
+            self._tareas[tarea] = registros
+            with open(self.directorio / "resultados.jsonl", "a", encoding="utf-8") as f:
+                f.write(linea + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def marcar_etapa(self, etapa: str):
+        self.estado["etapa"] = etapa
+        self.estado[f"fecha_{etapa}"] = datetime.now().isoformat()
+        self._guardar_estado()
+        if etapa == ETAPA_COMPLETADA:
+            # Los resultados ya están en la ciudad: solo queda estado.json
+            (self.directorio / "resultados.jsonl").unlink(missing_ok=True)
+
+    def _guardar_estado(self):
+        tmp = self.directorio / "estado.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.estado, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.directorio / "estado.json")
+
+
+def clave_tarea(origen: str, entrada: str) -> str:
+    """Clave de una tarea: 'tavily|<prompt>', 'directorio|<url>'..."""
+    return f"{origen}|{entrada}"
+
+
+def podar_ejecuciones(base_dir: Union[str, Path], dias_completadas: float = 7,
+                      dias_pendientes: float = 30) -> int:
+    """
+    Borra los directorios de ejecuciones viejas.
+
+    Args:
+        base_dir: Directorio de ejecuciones
+        dias_completadas: Días que se guardan las completadas
+        dias_pendientes: Días que se guardan las cortadas (se pueden reanudar)
+
+    Returns:
+        Ejecuciones borradas
+    """
+    ahora = datetime.now()
+    borradas = 0
+    for estado_path in Path(base_dir).glob("*/estado.json"):
+        try:
+            with open(estado_path, "r", encoding="utf-8") as f:
+                estado = json.load(f)
+            completada = estado.get("etapa") == ETAPA_COMPLETADA
+            fecha = estado.get(f"fecha_{ETAPA_COMPLETADA}" if completada else "creado")
+            edad = ahora - datetime.fromisoformat(fecha)
+        except (OSError, ValueError, TypeError):
+            continue
+        if edad > timedelta(days=dias_completadas if completada else dias_pendientes):
+            shutil.rmtree(estado_path.parent, ignore_errors=True)
+            borradas += 1
+    return borradas
+
+
+def listar_ejecuciones(base_dir: Union[str, Path], pendientes: bool = False) -> List[Dict[str, Any]]:
+    """
+    Ejecuciones guardadas, de la más reciente a la más antigua.
+
+    Args:
+        base_dir: Directorio de ejecuciones
+        pendientes: Solo las que no llegaron a completarse
+
+    Returns:
+        Lista de {"run_id", "ciudad", "etapa", "creado"}
+    """
+    ejecuciones = []
+    for estado_path in Path(base_dir).glob("*/estado.json"):
+        try:
+            with open(estado_path, "r", encoding="utf-8") as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if pendientes and estado.get("etapa") == ETAPA_COMPLETADA:
+            continue
+        ejecuciones.append({
+            "run_id": estado_path.parent.name,
+            "ciudad": estado.get("config", {}).get("ciudad"),
+            "etapa": estado.get("etapa"),
+            "creado": estado.get("creado"),
+        })
+    ejecuciones.sort(key=lambda e: e["creado"] or "", reverse=True)
+    return ejecuciones
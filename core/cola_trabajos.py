@@ -0,0 +1,533 @@
+"""
+Cola de trabajos de búsqueda.
+
+La página Buscar (y `py scripts/trabajador.py --encolar`) solo añade
+trabajos a una tabla SQLite (data/cola_trabajos.sqlite); un proceso
+trabajador de larga duración los va tomando y lanza cada uno en su propio
+proceso, varios a la vez. Cada trabajo:
+
+- escribe su salida en data/trabajos/<id>.log y la última línea en la
+  columna `progreso`, que es lo que consulta la interfaz
+- crea su checkpoint (data/ejecuciones/<run_id>) antes de empezar, así que
+  si el trabajador muere el trabajo vuelve a la cola y se reanuda sin
+  repetir lo ya pagado
+- al terminar guarda el resumen en la cola y en data/historial_busquedas.json
+
+Estados: pendiente -> ejecutando -> completado | error; un pendiente se
+puede cancelar. Nunca se ejecutan a la vez dos trabajos de la misma ciudad.
+
+Cada trabajo en ejecución anota el trabajador que lo tomó. Solo se devuelve
+a la cola un trabajo sin latido si su trabajador también ha dejado de latir,
+y el estado final solo lo escribe ese trabajador: un trabajo que sigue vivo
+aunque su latido falle no llega a ejecutarse dos veces.
+"""
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from utils.database import DATA_DIR, bloquear_archivo
+
+
+COLA_PATH = DATA_DIR / "cola_trabajos.sqlite"
+DIR_LOGS = DATA_DIR / "trabajos"
+HISTORIAL_PATH = DATA_DIR / "historial_busquedas.json"
+
+INTERVALO_LATIDO = 15    # segundos entre latidos de un trabajo en curso
+LATIDO_MAXIMO = 120      # sin latido en este tiempo, el trabajo se da por huérfano
+MAX_HISTORIAL = 100
+
+PENDIENTE = "pendiente"
+EJECUTANDO = "ejecutando"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+
+class ColaTrabajos:
+    """Tabla de trabajos de búsqueda compartida entre procesos."""
+
+    def __init__(self, db_path: Union[str, Path] = COLA_PATH):
+        self.db_path = Path(db_path)
+        self._inicializado = False
+        self._lock = threading.Lock()
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Conexión nueva en autocommit (transacciones explícitas con BEGIN)."""
+        if not self._inicializado:
+            with self._lock:
+                if not self._inicializado:
+                    self._crear_tablas()
+                    self._inicializado = True
+        con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _crear_tablas(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS trabajos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ciudad TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    progreso TEXT NOT NULL DEFAULT '',
+                    run_id TEXT,
+                    resultado TEXT,
+                    error TEXT,
+                    creado REAL NOT NULL,
+                    iniciado REAL,
+                    terminado REAL,
+                    latido REAL,
+                    trabajador TEXT
+                )
+            """)
+            columnas = {fila[1] for fila in con.execute("PRAGMA table_info(trabajos)")}
+            if "trabajador" not in columnas:
+                # Colas creadas antes de anotar el trabajador de cada trabajo
+                con.execute("ALTER TABLE trabajos ADD COLUMN trabajador TEXT")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS trabajadores (
+                    id TEXT PRIMARY KEY,
+                    iniciado REAL NOT NULL,
+                    latido REAL NOT NULL
+                )
+            """)
+
+    def encolar(self, config: Dict[str, Any]) -> int:
+        """
+        Añade un trabajo a la cola.
+
+        Args:
+            config: BusquedaConfig como dict (asdict)
+
+        Returns:
+            Id del trabajo
+        """
+        with closing(self._conectar()) as con:
+            cursor = con.execute(
+                "INSERT INTO trabajos (ciudad, config, estado, creado) VALUES (?, ?, ?, ?)",
+                (config["ciudad"], json.dumps(config, ensure_ascii=False), PENDIENTE, time.time())
+            )
+            return cursor.lastrowid
+
+    def tomar(self, trabajador: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Marca como en ejecución el pendiente más antiguo cuya ciudad no se
+        esté buscando ya, y lo devuelve (None si no hay ninguno).
+
+        Args:
+            trabajador: Id del trabajador que lo ejecutará
+        """
+        ahora = time.time()
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            fila = con.execute(
+                "SELECT * FROM trabajos WHERE estado = ? AND lower(ciudad) NOT IN "
+                "(SELECT lower(ciudad) FROM trabajos WHERE estado = ?) ORDER BY id LIMIT 1",
+                (PENDIENTE, EJECUTANDO)
+            ).fetchone()
+            if fila:
+                con.execute(
+                    "UPDATE trabajos SET estado = ?, iniciado = ?, latido = ?, trabajador = ? WHERE id = ?",
+                    (EJECUTANDO, ahora, ahora, trabajador, fila["id"])
+                )
+            con.execute("COMMIT")
+        if not fila:
+            return None
+        trabajo = _fila_a_dict(fila)
+        trabajo.update(estado=EJECUTANDO, iniciado=ahora, latido=ahora, trabajador=trabajador)
+        return trabajo
+
+    def obtener(self, trabajo_id: int) -> Optional[Dict[str, Any]]:
+        with closing(self._conectar()) as con:
+            fila = con.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        return _fila_a_dict(fila) if fila else None
+
+    def listar(self, limite: int = 50, estados: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Trabajos del más reciente al más antiguo."""
+        consulta = "SELECT * FROM trabajos"
+        parametros: List[Any] = []
+        if estados:
+            consulta += f" WHERE estado IN ({', '.join('?' * len(estados))})"
+            parametros.extend(estados)
+        consulta += " ORDER BY id DESC LIMIT ?"
+        parametros.append(limite)
+        with closing(self._conectar()) as con:
+            return [_fila_a_dict(f) for f in con.execute(consulta, parametros)]
+
+    def actualizar(self, trabajo_id: int, **campos):
+        """Actualiza columnas de un trabajo (progreso, run_id...) y su latido."""
+        campos["latido"] = time.time()
+        asignaciones = ", ".join(f"{nombre} = ?" for nombre in campos)
+        with closing(self._conectar()) as con:
+            con.execute(
+                f"UPDATE trabajos SET {asignaciones} WHERE id = ?",
+                (*campos.values(), trabajo_id)
+            )
+
+    def terminar(self, trabajo_id: int, resultado: Optional[Dict] = None, error: Optional[str] = None,
+                 trabajador: Optional[str] = None) -> bool:
+        """
+        Marca un trabajo en ejecución como completado (con su resumen) o con error.
+
+        Args:
+            trabajo_id: Id del trabajo
+            resultado: Resumen de la búsqueda
+            error: Mensaje de error (el trabajo queda en estado error)
+            trabajador: Id del trabajador que lo tomó; si el trabajo volvió a
+                la cola y ahora es de otro, no se toca
+
+        Returns:
+            False si el trabajo ya no estaba en ejecución por ese trabajador
+        """
+        ahora = time.time()
+        with closing(self._conectar()) as con:
+            cursor = con.execute(
+                "UPDATE trabajos SET estado = ?, resultado = ?, error = ?, terminado = ?, latido = ? "
+                "WHERE id = ? AND estado = ? AND trabajador IS ?",
+                (
+                    ERROR if error else COMPLETADO,
+                    json.dumps(resultado, ensure_ascii=False) if resultado else None,
+                    error, ahora, ahora, trabajo_id, EJECUTANDO, trabajador,
+                )
+            )
+            return cursor.rowcount > 0
+
+    def cancelar(self, trabajo_id: int) -> bool:
+        """Cancela un trabajo pendiente. Devuelve False si ya había empezado."""
+        with closing(self._conectar()) as con:
+            cursor = con.execute(
+                "UPDATE trabajos SET estado = ?, terminado = ? WHERE id = ? AND estado = ?",
+                (CANCELADO, time.time(), trabajo_id, PENDIENTE)
+            )
+            return cursor.rowcount > 0
+
+    def devolver(self, trabajo_id: int, trabajador: Optional[str] = None):
+        """Devuelve a la cola un trabajo en ejecución (se reanudará por su run_id)."""
+        with closing(self._conectar()) as con:
+            con.execute(
+                "UPDATE trabajos SET estado = ?, progreso = 'Devuelto a la cola', trabajador = NULL "
+                "WHERE id = ? AND estado = ? AND trabajador IS ?",
+                (PENDIENTE, trabajo_id, EJECUTANDO, trabajador)
+            )
+
+    def recuperar_huerfanos(self, segundos: float = LATIDO_MAXIMO, excluir: Iterable[int] = ()) -> int:
+        """
+        Devuelve a la cola los trabajos en ejecución sin latido reciente cuyo
+        trabajador tampoco late (murió con ellos).
+
+        Args:
+            segundos: Antigüedad del latido para darlo por cortado
+            excluir: Ids que el trabajador que llama tiene vivos en sus
+                procesos; nunca se devuelven aunque les falle el latido
+
+        Returns:
+            Trabajos devueltos a la cola
+        """
+        excluir = list(excluir)
+        limite = time.time() - segundos
+        consulta = (
+            "UPDATE trabajos SET estado = ?, progreso = 'Recuperado tras cortarse', trabajador = NULL "
+            "WHERE estado = ? AND latido < ? AND (trabajador IS NULL OR trabajador NOT IN "
+            "(SELECT id FROM trabajadores WHERE latido >= ?))"
+        )
+        if excluir:
+            consulta += f" AND id NOT IN ({', '.join('?' * len(excluir))})"
+        with closing(self._conectar()) as con:
+            cursor = con.execute(consulta, (PENDIENTE, EJECUTANDO, limite, limite, *excluir))
+            return cursor.rowcount
+
+    def latido_trabajador(self, trabajador_id: str, iniciado: float):
+        with closing(self._conectar()) as con:
+            con.execute(
+                "INSERT OR REPLACE INTO trabajadores (id, iniciado, latido) VALUES (?, ?, ?)",
+                (trabajador_id, iniciado, time.time())
+            )
+
+    def baja_trabajador(self, trabajador_id: str):
+        with closing(self._conectar()) as con:
+            con.execute("DELETE FROM trabajadores WHERE id = ?", (trabajador_id,))
+
+    def trabajadores_activos(self, segundos: float = LATIDO_MAXIMO) -> int:
+        """Trabajadores con latido reciente."""
+        with closing(self._conectar()) as con:
+            return con.execute(
+                "SELECT COUNT(*) FROM trabajadores WHERE latido >= ?", (time.time() - segundos,)
+            ).fetchone()[0]
+
+
+def _fila_a_dict(fila: sqlite3.Row) -> Dict[str, Any]:
+    trabajo = dict(fila)
+    trabajo["config"] = json.loads(trabajo["config"])
+    if trabajo.get("resultado"):
+        trabajo["resultado"] = json.loads(trabajo["resultado"])
+    return trabajo
+
+
+def ruta_log(trabajo_id: int) -> Path:
+    return DIR_LOGS / f"{trabajo_id}.log"
+
+
+def leer_log(trabajo_id: int, lineas: int = 40) -> str:
+    """Últimas líneas de la salida de un trabajo."""
+    try:
+        with open(ruta_log(trabajo_id), "r", encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lineas:])
+    except OSError:
+        return ""
+
+
+# =============================================================================
+# Ejecución de un trabajo (proceso hijo)
+# =============================================================================
+
+class _SalidaTrabajo(io.TextIOBase):
+    """stdout de un trabajo: al log completo y la última línea a la cola."""
+
+    def __init__(self, cola: ColaTrabajos, trabajo_id: int):
+        ruta = ruta_log(trabajo_id)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._log = open(ruta, "a", encoding="utf-8", buffering=1)
+        self._cola = cola
+        self._id = trabajo_id
+        self._lock = threading.Lock()
+        self._enviado = 0.0
+        self._ultima = ""
+
+    def write(self, texto: str) -> int:
+        with self._lock:
+            self._log.write(texto)
+            lineas = [linea.strip() for linea in texto.splitlines() if linea.strip()]
+            if lineas:
+                self._ultima = lineas[-1][:300]
+                if time.monotonic() - self._enviado >= 1:
+                    self._publicar()
+        return len(texto)
+
+    def publicar(self):
+        """Envía a la cola la última línea aunque no haya pasado un segundo."""
+        with self._lock:
+            self._publicar()
+
+    def _publicar(self):
+        self._enviado = time.monotonic()
+        try:
+            self._cola.actualizar(self._id, progreso=self._ultima)
+        except sqlite3.Error:
+            pass  # el progreso no debe cortar la búsqueda
+
+    def flush(self):
+        self._log.flush()
+
+    def close(self):
+        self._log.close()
+
+
+def resumen_resultado(resultado) -> Dict[str, Any]:
+    """Resumen serializable de un ResultadoBusqueda."""
+    consolidacion = resultado.consolidacion
+    return {
+        "fecha": resultado.fecha,
+        "run_id": resultado.run_id,
+        "total_encontrados": resultado.total_encontrados,
+        "nuevos": consolidacion.total_nuevos if consolidacion else 0,
+        "actualizados": len(consolidacion.actualizados) if consolidacion else 0,
+        "duplicados": len(consolidacion.duplicados_ignorados) if consolidacion else 0,
+        "filtrados": len(consolidacion.filtrados) if consolidacion else 0,
+        "descartados_prefiltro": sum(resultado.descartados_prefiltro.values()),
+        "duracion_segundos": round(resultado.duracion_segundos, 2),
+        "resultados_por_api": resultado.resultados_por_api,
+        "motivo_parada": resultado.motivo_parada,
+        "tiempos_por_etapa": resultado.tiempos_por_etapa,
+        "errores": resultado.errores,
+    }
+
+
+def registrar_historial(config: Dict[str, Any], resumen: Dict[str, Any], path: Path = HISTORIAL_PATH):
+    """Añade una búsqueda a data/historial_busquedas.json (últimas MAX_HISTORIAL)."""
+    entrada = {
+        "fecha": resumen["fecha"],
+        "ciudad": config["ciudad"],
+        "zonas": config.get("zonas", []),
+        "apis_usadas": config.get("apis_habilitadas", []),
+        "total_encontrados": resumen["total_encontrados"],
+        "nuevos": resumen["nuevos"],
+        "actualizados": resumen["actualizados"],
+        "duplicados": resumen["duplicados"],
+        "filtrados": resumen["filtrados"],
+        "duracion_segundos": resumen["duracion_segundos"],
+        "resultados_por_api": resumen["resultados_por_api"],
+        "max_resultados_por_api": config.get("max_resultados_por_api"),
+        "usar_places": config.get("usar_places"),
+        "scraping_profundo": config.get("scraping_profundo"),
+    }
+
+    # Varios trabajos pueden terminar a la vez
+    with bloquear_archivo(path.with_name(path.name + ".lock")):
+        historial = []
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    historial = json.load(f)
+            except (OSError, ValueError):
+                historial = []
+        historial = (historial + [entrada])[-MAX_HISTORIAL:]
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(historial, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+def ejecutar_trabajo(trabajo_id: int, db_path: Union[str, Path] = COLA_PATH,
+                     trabajador: Optional[str] = None):
+    """
+    Ejecuta un trabajo ya marcado como en ejecución (cuerpo del proceso hijo).
+
+    Si el trabajo tiene run_id (se cortó antes), reanuda su checkpoint.
+
+    Args:
+        trabajo_id: Id del trabajo
+        db_path: Base de datos de la cola
+        trabajador: Id del trabajador que lo tomó (ver ColaTrabajos.terminar)
+    """
+    cola = ColaTrabajos(db_path)
+    trabajo = cola.obtener(trabajo_id)
+    salida = _SalidaTrabajo(cola, trabajo_id)
+    sys.stdout = sys.stderr = salida
+
+    terminado = threading.Event()
+
+    def latir():
+        while not terminado.wait(INTERVALO_LATIDO):
+            try:
+                cola.actualizar(trabajo_id)
+            except sqlite3.Error:
+                pass
+
+    threading.Thread(target=latir, daemon=True).start()
+
+    try:
+        from core.checkpoint import CheckpointBusqueda
+        from core.orquestador import BusquedaConfig, Orquestador
+
+        orquestador = Orquestador()
+        if trabajo["run_id"]:
+            resultado = orquestador.reanudar(trabajo["run_id"])
+        else:
+            config = BusquedaConfig(**trabajo["config"])
+            checkpoint = None
+            if orquestador.config.get("busqueda", {}).get("checkpoints", True):
+                checkpoint = CheckpointBusqueda.crear(orquestador.dir_ejecuciones, asdict(config))
+                cola.actualizar(trabajo_id, run_id=checkpoint.run_id)
+            resultado = orquestador.ejecutar_busqueda(config, checkpoint)
+
+        resumen = resumen_resultado(resultado)
+        registrar_historial(trabajo["config"], resumen)
+        print(f"[Trabajo {trabajo_id}] Completado: {resumen['nuevos']} nuevos")
+        salida.publicar()
+        cola.terminar(trabajo_id, resultado=resumen, trabajador=trabajador)
+    except Exception as e:
+        print(f"[Trabajo {trabajo_id}] Error: {e}")
+        salida.publicar()
+        cola.terminar(trabajo_id, error=str(e), trabajador=trabajador)
+    finally:
+        terminado.set()
+        salida.flush()
+
+
+# =============================================================================
+# Trabajador
+# =============================================================================
+
+class Trabajador:
+    """Proceso de larga duración que ejecuta los trabajos de la cola."""
+
+    def __init__(self, cola: Optional[ColaTrabajos] = None, max_paralelo: int = 2, intervalo: float = 2.0):
+        """
+        Args:
+            cola: Cola de trabajos (por defecto data/cola_trabajos.sqlite)
+            max_paralelo: Trabajos a la vez, cada uno en su propio proceso
+            intervalo: Segundos entre consultas a la cola
+        """
+        self.cola = cola or ColaTrabajos()
+        self.max_paralelo = max(1, max_paralelo)
+        self.intervalo = intervalo
+        self.id = f"{os.getpid()}@{platform.node()}"
+        self._procesos: Dict[int, multiprocessing.Process] = {}
+
+    def ejecutar(self, continuo: bool = True):
+        """
+        Bucle principal.
+
+        Args:
+            continuo: Si False, termina cuando la cola queda vacía
+        """
+        iniciado = time.time()
+        print(f"[Trabajador] {self.id} atendiendo {self.cola.db_path} "
+              f"(máx. {self.max_paralelo} trabajos a la vez)")
+        try:
+            while True:
+                self.cola.latido_trabajador(self.id, iniciado)
+                recuperados = self.cola.recuperar_huerfanos(excluir=self._vivos())
+                if recuperados:
+                    print(f"[Trabajador] {recuperados} trabajos cortados vuelven a la cola")
+
+                self._recoger_terminados()
+                self._lanzar_pendientes()
+
+                if not continuo and not self._procesos and not self.cola.listar(1, [PENDIENTE]):
+                    break
+                time.sleep(self.intervalo)
+        except KeyboardInterrupt:
+            print("[Trabajador] Interrumpido: los trabajos en curso vuelven a la cola")
+            for trabajo_id, proceso in self._procesos.items():
+                proceso.terminate()
+                proceso.join()
+                self.cola.devolver(trabajo_id, self.id)
+        finally:
+            self.cola.baja_trabajador(self.id)
+
+    def _vivos(self) -> List[int]:
+        """Ids de los trabajos cuyo proceso sigue en marcha."""
+        return [trabajo_id for trabajo_id, proceso in self._procesos.items() if proceso.is_alive()]
+
+    def _lanzar_pendientes(self):
+        while len(self._procesos) < self.max_paralelo:
+            trabajo = self.cola.tomar(self.id)
+            if trabajo is None:
+                return
+            proceso = multiprocessing.Process(
+                target=ejecutar_trabajo,
+                args=(trabajo["id"], str(self.cola.db_path), self.id),
+                name=f"trabajo-{trabajo['id']}",
+            )
+            proceso.start()
+            self._procesos[trabajo["id"]] = proceso
+            print(f"[Trabajador] Trabajo {trabajo['id']} ({trabajo['ciudad']}) iniciado")
+
+    def _recoger_terminados(self):
+        for trabajo_id, proceso in list(self._procesos.items()):
+            if proceso.is_alive():
+                continue
+            proceso.join()
+            del self._procesos[trabajo_id]
+
+            # Si el proceso murió sin anotar el resultado, queda con error;
+            # si el trabajo ya es de otro trabajador, no se toca
+            self.cola.terminar(
+                trabajo_id, error=f"El proceso terminó con código {proceso.exitcode}", trabajador=self.id
+            )
+            trabajo = self.cola.obtener(trabajo_id)
+            print(f"[Trabajador] Trabajo {trabajo_id} terminado ({trabajo['estado']})")
@@ -3,21 +3,58 @@ Motor de consolidación y deduplicación de registros.
 Detecta duplicados con 3 niveles de precisión y fusiona datos.
 Incluye sistema de filtrado para eliminar listados, blogs, etc.
 """
-import json
+import gc
 import hashlib
-import re
+import importlib.util
+import json
+import os
+import zlib
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional, Tuple, Set
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterable, Iterator, Hashable
 from datetime import datetime
 from pathlib import Path
 
+from utils import normalizacion
+from utils.telefonos import (
+    clave_telefono, claves_telefonos, canonicalizar_telefonos, normalizar_telefono
+)
+from core.agrupador import GrupoDuplicados, agrupar, pares_nombre_similar
+from utils.database import (
+    leer_snapshot, reproducir_journal,
+    guardar_archivo, anexar_journal, ruta_journal,
+)
+from utils.trazas import span
+
 # Intentar importar rapidfuzz para similitud fuzzy
 try:
-    from rapidfuzz import fuzz
+    from rapidfuzz import fuzz, process
     RAPIDFUZZ_DISPONIBLE = True
 except ImportError:
     RAPIDFUZZ_DISPONIBLE = False
 
+# process.cpdist devuelve arrays numpy (numpy llega con pandas). Se importa
+# en el primer lote vectorizado: cuesta ~0.1 s y no siempre hace falta
+try:
+    CDIST_DISPONIBLE = RAPIDFUZZ_DISPONIBLE and importlib.util.find_spec("numpy") is not None
+except (ImportError, ValueError):
+    CDIST_DISPONIBLE = False
+
+# Lotes a partir de este tamaño se puntúan de una vez con process.cpdist
+MIN_LOTE_VECTORIZADO = 100
+
+# En modo journal se compacta cuando el journal supera esta fracción del snapshot
+JOURNAL_MAX_FRACCION = 0.5
+
+# Índices persistidos junto al snapshot (<ciudad>.indices.jsonz: JSON con
+# zlib, que además no entra en el glob data/*.json de las ciudades).
+# Subir la versión si cambian las claves (hash, normalización, bloqueo).
+SUFIJO_INDICES = ".indices.jsonz"
+SUFIJO_INDICES_ANTIGUO = ".indices.pkl"  # formato anterior (pickle), se borra
+VERSION_INDICES = 3
+CAMPOS_INDICES = ("indice_hash", "indice_telefono", "indice_email", "indice_bloques", "nombres_norm")
+
 # Importar sistema de filtros
 try:
     from utils.filtros import es_registro_valido, limpiar_nombre, DOMINIOS_EXCLUIR
@@ -26,15 +63,154 @@ except ImportError:
     FILTROS_DISPONIBLES = False
 
 
+def _sin_decimales(valor: str):
+    """El sidecar solo guarda enteros: un número con decimales lo invalida."""
+    raise ValueError(f"número no entero en el sidecar: {valor}")
+
+
+def similitud_nombres(n1: str, n2: str) -> float:
+    """
+    Similitud (0-100) entre dos nombres ya normalizados (normalizar_nombre).
+
+    Usa rapidfuzz si está disponible (la mejor de ratio, partial_ratio y
+    token_sort_ratio); si no, la proporción de palabras comunes.
+    """
+    if not n1 or not n2:
+        return 0.0
+    if n1 == n2:
+        return 100.0
+    
+    if RAPIDFUZZ_DISPONIBLE:
+        return max(fuzz.ratio(n1, n2), fuzz.partial_ratio(n1, n2), fuzz.token_sort_ratio(n1, n2))
+    
+    palabras1 = set(n1.split())
+    palabras2 = set(n2.split())
+    if not palabras1 or not palabras2:
+        return 0.0
+    return len(palabras1 & palabras2) / len(palabras1 | palabras2) * 100
+
+
+def claves_bloqueo(registro: Dict) -> Set[str]:
+    """
+    Claves de contacto de un registro: "tel:<E.164>", "email:<email>" y
+    "dom:<dominio web>". Dos registros solo pueden ser el mismo despacho
+    por nombre parecido si comparten alguna.
+    """
+    claves = {f"tel:{tel}" for tel in claves_telefonos(registro.get("telefono"))}
+    
+    email = (registro.get("email") or "").lower()
+    if email:
+        claves.add(f"email:{email}")
+    
+    dominio = normalizacion.extraer_dominio(registro.get("web") or "")
+    if dominio:
+        claves.add(f"dom:{dominio}")
+    
+    return claves
+
+
+@contextmanager
+def _sin_gc():
+    """
+    Pausa el recolector de ciclos mientras se crean los índices.
+
+    Son cientos de miles de dicts, sets y str sin ciclos: con el recolector
+    activo la mitad del arranque se iba en pasadas que no liberan nada.
+    """
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if activo:
+            gc.enable()
+
+
+def _leer_indice(guardado: Dict[str, List[int]], validas: frozenset, tipo_clave=str) -> Dict[Any, Set[int]]:
+    """
+    Índice clave -> posiciones leído del sidecar.
+    
+    Args:
+        guardado: Índice tal como se leyó del JSON
+        validas: Posiciones de la base (range(n) como conjunto)
+        tipo_clave: Tipo de las claves del índice (JSON solo tiene str)
+    
+    Raises:
+        ValueError: Si alguna posición no es un registro de la base
+    """
+    indice = {}
+    for clave, posiciones in guardado.items():
+        posiciones = set(posiciones)
+        if not posiciones <= validas:
+            raise ValueError("posición fuera de la base")
+        indice[tipo_clave(clave)] = posiciones
+    return indice
+
+
+@dataclass
+class EventoConsolidacion:
+    """Resultado de consolidar un registro (ver Consolidador.procesar_stream)."""
+    tipo: str  # agregado | actualizado | duplicado | invalido | filtrado
+    posicion: int  # posición del registro en la entrada
+    registro: Dict  # nuevo, o el fusionado si tipo == "actualizado"
+    indice: Optional[int] = None  # posición en la base (agregado/actualizado/duplicado)
+    existente: Optional[Dict] = None  # registro de la base antes de fusionar
+    metodo: str = ""  # método de detección del duplicado
+    razon: str = ""  # motivo de filtrado o invalidez
+
+
 @dataclass
 class ConsolidacionResult:
-    """Resultado de una operación de consolidación."""
+    """
+    Resultado de una operación de consolidación.
+    
+    Con solo_resumen=True las listas guardan solo identificadores (posición
+    en la base para agregados/actualizados/duplicados, posición en la entrada
+    para inválidos/filtrados) en lugar de copias de los registros, así que la
+    memoria no crece con el tamaño de los registros. len() de cada lista y
+    to_dict() funcionan igual en ambos modos.
+    """
     agregados: List[Dict] = field(default_factory=list)
     actualizados: List[Dict] = field(default_factory=list)
     duplicados_ignorados: List[Dict] = field(default_factory=list)
     invalidos: List[Dict] = field(default_factory=list)
     filtrados: List[Dict] = field(default_factory=list)  # Nuevo: rechazados por filtros
     razones_filtrado: Dict[str, int] = field(default_factory=dict)  # Estadísticas
+    solo_resumen: bool = False
+    
+    def registrar(self, evento: EventoConsolidacion):
+        """Acumula un evento en la lista que le corresponde."""
+        if evento.tipo == "filtrado":
+            self.razones_filtrado[evento.razon] = self.razones_filtrado.get(evento.razon, 0) + 1
+        
+        if self.solo_resumen:
+            id_registro = evento.posicion if evento.indice is None else evento.indice
+            destino = {
+                "agregado": self.agregados,
+                "actualizado": self.actualizados,
+                "duplicado": self.duplicados_ignorados,
+                "invalido": self.invalidos,
+                "filtrado": self.filtrados,
+            }[evento.tipo]
+            destino.append(id_registro)
+        elif evento.tipo == "agregado":
+            self.agregados.append(evento.registro)
+        elif evento.tipo == "actualizado":
+            self.actualizados.append({
+                "original": evento.existente,
+                "actualizado": evento.registro,
+                "metodo": evento.metodo
+            })
+        elif evento.tipo == "duplicado":
+            self.duplicados_ignorados.append({
+                "registro": evento.registro,
+                "existente": evento.existente,
+                "metodo": evento.metodo
+            })
+        elif evento.tipo == "invalido":
+            self.invalidos.append(evento.registro)
+        else:
+            self.filtrados.append({"registro": evento.registro, "razon": evento.razon})
     
     @property
     def total_procesados(self) -> int:
@@ -67,62 +243,169 @@ class Consolidador:
     3. Similitud fuzzy de nombre (>85%)
     """
     
-    def __init__(self, base_datos_path: str = None):
+    def __init__(self, base_datos_path: str = None, journal: bool = False):
         """
         Inicializa el consolidador.
         
         Args:
             base_datos_path: Ruta al archivo JSON de la base de datos
+            journal: Si True, guardar() añade solo los cambios a
+                <ciudad>.journal.jsonl en lugar de reescribir el JSON
         """
         self.base_datos_path = Path(base_datos_path) if base_datos_path else None
         self.registros: List[Dict] = []
-        self.indice_hash: Dict[str, int] = {}  # hash -> índice
-        self.indice_telefono: Dict[str, Set[int]] = {}  # telefono -> índices
-        self.indice_email: Dict[str, int] = {}  # email -> índice
+        self.indice_hash: Dict[str, Set[int]] = {}  # hash -> índices
+        self.indice_telefono: Dict[int, Set[int]] = {}  # clave E.164 -> índices
+        self.indice_email: Dict[str, Set[int]] = {}  # email -> índices
+        self.indice_bloques: Dict[str, Set[int]] = {}  # clave de contacto -> índices
+        self.nombres_norm: List[str] = []  # nombre normalizado por índice
+        self._cache_similitud: Dict[Tuple[str, str], float] = {}  # solo durante un lote
+        
+        # Persistencia incremental
+        self.journal = journal
+        self._journal_base: Optional[str] = None  # token del snapshot cargado
+        self._persistidos = 0  # registros ya presentes en snapshot + journal
+        self._pendientes: Set[int] = set()  # índices modificados desde el último guardado
+        self._reescribir = False  # posiciones movidas (deduplicar) o journal cortado: el journal no sirve
+        self._carga_fallida = False  # la base existe pero no se pudo leer: no se sobrescribe
         
         if self.base_datos_path and self.base_datos_path.exists():
             self._cargar_base_datos()
     
     def _cargar_base_datos(self):
-        """Carga la base de datos y construye índices."""
+        """
+        Carga la base de datos (snapshot + journal) y sus índices.
+        
+        Los índices del snapshot se leen del sidecar si su firma coincide
+        con el archivo; si no, se reconstruyen en memoria. Cargar no escribe
+        nada: el sidecar solo lo escribe guardar() al reescribir el snapshot.
+        Las operaciones del journal se aplican después, actualizando los
+        índices de forma incremental.
+        """
         try:
-            with open(self.base_datos_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with _sin_gc():
+                data, firma = leer_snapshot(self.base_datos_path)
+                
+                self.registros = data.get("registros", [])
+                self._journal_base = data["metadata"].get("journal_base")
+                if not self._cargar_indices(firma):
+                    self._construir_indices()
+                
+                _, completo = reproducir_journal(
+                    self.base_datos_path, self._journal_base, self.registros,
+                    lambda idx, anterior: self._actualizar_indices(idx, self.registros[idx], anterior=anterior)
+                )
+                # Tras una operación no válida el journal no admite más
+                # líneas: el próximo guardar() reescribe el snapshot
+                self._reescribir = not completo
             
-            self.registros = data.get("registros", [])
-            self._construir_indices()
+            self._persistidos = len(self.registros)
             print(f"[Consolidador] Cargados {len(self.registros)} registros")
             
         except Exception as e:
             print(f"[Consolidador] Error cargando base de datos: {e}")
             self.registros = []
+            self._construir_indices()
+            # Ni journal (sus índices serían de otro snapshot) ni snapshot
+            # (borraría los registros que no se han podido leer)
+            self._journal_base = None
+            self._carga_fallida = True
+    
+    @staticmethod
+    def _ruta_indices(path: Path) -> Path:
+        return path.with_name(path.stem + SUFIJO_INDICES)
+    
+    def _cargar_indices(self, firma: Dict[str, int]) -> bool:
+        """
+        Carga los índices desde el sidecar.
+        
+        Es JSON (no se ejecuta nada al leerlo) y solo se usa si su firma es
+        la del snapshot y todas sus posiciones existen; si no, se reconstruyen.
+        
+        Args:
+            firma: Firma del snapshot recién leído
+            
+        Returns:
+            True si el sidecar es válido para este snapshot
+        """
+        ruta = self._ruta_indices(self.base_datos_path)
+        try:
+            guardado = json.loads(
+                zlib.decompress(ruta.read_bytes()),
+                parse_float=_sin_decimales, parse_constant=_sin_decimales,
+            )
+            if (guardado.get("version") != VERSION_INDICES
+                    or guardado.get("firma") != firma
+                    or len(guardado.get("nombres_norm", [])) != len(self.registros)):
+                return False
+            
+            validas = frozenset(range(len(self.registros)))
+            indices = {
+                campo: _leer_indice(guardado[campo], validas, int if campo == "indice_telefono" else str)
+                for campo in CAMPOS_INDICES if campo != "nombres_norm"
+            }
+            nombres_norm = guardado["nombres_norm"]
+            if not all(isinstance(nombre, str) for nombre in nombres_norm):
+                return False
+        except (OSError, ValueError, TypeError, KeyError, AttributeError, zlib.error):
+            return False
+        
+        for campo, indice in indices.items():
+            setattr(self, campo, indice)
+        self.nombres_norm = nombres_norm
+        return True
+    
+    def _guardar_indices(self, path: Path, firma: Dict[str, int]):
+        """Escribe el sidecar de índices para el snapshot con esa firma."""
+        ruta = self._ruta_indices(path)
+        guardado = {"version": VERSION_INDICES, "firma": firma, "nombres_norm": self.nombres_norm}
+        for campo in CAMPOS_INDICES:
+            if campo != "nombres_norm":
+                guardado[campo] = {clave: sorted(posiciones) for clave, posiciones in getattr(self, campo).items()}
+        contenido = zlib.compress(
+            json.dumps(guardado, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1
+        )
+        
+        temporal = ruta.with_name(ruta.name + ".tmp")
+        try:
+            temporal.write_bytes(contenido)
+            os.replace(temporal, ruta)
+            path.with_name(path.stem + SUFIJO_INDICES_ANTIGUO).unlink(missing_ok=True)
+        except OSError as e:
+            # Sin sidecar solo se pierde el arranque rápido
+            print(f"[Consolidador] No se pudieron guardar los índices: {e}")
     
     def _construir_indices(self):
         """Construye índices para búsqueda rápida."""
         self.indice_hash = {}
         self.indice_telefono = {}
         self.indice_email = {}
+        self.indice_bloques = {}
+        self.nombres_norm = []
         
         for i, registro in enumerate(self.registros):
-            # Índice por hash
-            hash_registro = self.calcular_hash(registro)
-            self.indice_hash[hash_registro] = i
-            
-            # Índice por teléfonos
-            telefonos = registro.get("telefono", [])
-            if isinstance(telefonos, str):
-                telefonos = [telefonos]
-            for tel in telefonos:
-                tel_norm = self.normalizar_telefono(tel)
-                if tel_norm:
-                    if tel_norm not in self.indice_telefono:
-                        self.indice_telefono[tel_norm] = set()
-                    self.indice_telefono[tel_norm].add(i)
-            
-            # Índice por email
-            email = registro.get("email") or ""
-            if email:
-                self.indice_email[email.lower()] = i
+            self._actualizar_indices(i, registro)
+    
+    def _claves_telefono(self, registro: Dict) -> Set[int]:
+        """Claves E.164 de los teléfonos de un registro."""
+        return claves_telefonos(registro.get("telefono"))
+    
+    def claves_bloqueo(self, registro: Dict) -> Set[str]:
+        """
+        Claves de contacto que usa el nivel 4 para acotar candidatos.
+        
+        Son exactamente los datos que comprueba _tienen_datos_comunes
+        (teléfono, email y dominio web), así que dos registros solo pueden
+        ser "nombre_similar" si comparten al menos una clave.
+        """
+        return claves_bloqueo(registro)
+    
+    def _candidatos_nombre(self, registro: Dict) -> List[int]:
+        """Índices que comparten alguna clave de contacto, en orden de inserción."""
+        candidatos = set()
+        for clave in self.claves_bloqueo(registro):
+            candidatos.update(self.indice_bloques.get(clave, ()))
+        return sorted(candidatos)
     
     def calcular_hash(self, registro: Dict) -> str:
         """
@@ -134,7 +417,7 @@ class Consolidador:
         telefonos = registro.get("telefono") or []
         if isinstance(telefonos, str):
             telefonos = [telefonos]
-        telefono = self.normalizar_telefono(telefonos[0]) if telefonos else ""
+        telefono = (clave_telefono(telefonos[0]) or "") if telefonos else ""
         
         email = (registro.get("email") or "").lower().strip()
         
@@ -143,131 +426,83 @@ class Consolidador:
         return hashlib.md5(hash_string.encode()).hexdigest()
     
     def normalizar_telefono(self, telefono: str) -> str:
-        """Normaliza teléfono a solo dígitos con +34."""
-        if not telefono:
-            return ""
-        
-        # Solo dígitos y +
-        limpio = "".join(c for c in telefono if c.isdigit() or c == "+")
-        
-        # Asegurar formato +34XXXXXXXXX
-        if limpio.startswith("34") and not limpio.startswith("+"):
-            limpio = "+" + limpio
-        elif limpio and limpio[0] in "6789":
-            limpio = "+34" + limpio
-        
-        return limpio
+        """Normaliza teléfono al formato canónico (ver utils.telefonos)."""
+        return normalizar_telefono(telefono)
     
     def normalizar_nombre(self, nombre: str) -> str:
-        """Normaliza nombre para comparación."""
-        if not nombre:
-            return ""
-        
-        nombre = nombre.lower().strip()
-        
-        # Eliminar sufijos comunes
-        sufijos = [
-            "abogados", "abogado", "despacho", "bufete",
-            "& asociados", "y asociados", "asociados",
-            "s.l.", "s.l.p.", "s.c.", "s.a.",
-            "law", "lawyers", "legal",
-        ]
-        for sufijo in sufijos:
-            nombre = re.sub(rf'\s*{re.escape(sufijo)}\.?\s*$', '', nombre, flags=re.IGNORECASE)
-        
-        # Eliminar caracteres especiales
-        nombre = re.sub(r'[^\w\s]', '', nombre)
-        nombre = re.sub(r'\s+', ' ', nombre).strip()
-        
-        return nombre
+        """Normaliza nombre para comparación (ver utils.normalizacion)."""
+        return normalizacion.normalizar_nombre(nombre or "")
     
     def similitud_nombre(self, nombre1: str, nombre2: str) -> float:
         """
         Calcula similitud entre dos nombres (0-100).
         Usa rapidfuzz si está disponible, sino comparación simple.
         """
-        n1 = self.normalizar_nombre(nombre1)
-        n2 = self.normalizar_nombre(nombre2)
-        
-        if not n1 or not n2:
-            return 0.0
-        
-        if n1 == n2:
-            return 100.0
-        
-        if RAPIDFUZZ_DISPONIBLE:
-            # Usar múltiples métricas y promediar
-            ratio = fuzz.ratio(n1, n2)
-            partial = fuzz.partial_ratio(n1, n2)
-            token_sort = fuzz.token_sort_ratio(n1, n2)
-            return max(ratio, partial, token_sort)
-        else:
-            # Comparación simple por palabras comunes
-            palabras1 = set(n1.split())
-            palabras2 = set(n2.split())
-            if not palabras1 or not palabras2:
-                return 0.0
-            comunes = palabras1 & palabras2
-            total = palabras1 | palabras2
-            return (len(comunes) / len(total)) * 100
+        return self._similitud_normalizada(
+            self.normalizar_nombre(nombre1),
+            self.normalizar_nombre(nombre2)
+        )
     
-    def buscar_duplicado(self, registro: Dict) -> Tuple[bool, Optional[Dict], str]:
+    def _similitud_normalizada(self, n1: str, n2: str) -> float:
+        """Similitud entre dos nombres ya normalizados (ver similitud_nombres)."""
+        # Puntuación precalculada por procesar_batch en modo vectorizado
+        if self._cache_similitud and n1 and n2 and n1 != n2:
+            puntuacion = self._cache_similitud.get((n1, n2))
+            if puntuacion is not None:
+                return puntuacion
+        return similitud_nombres(n1, n2)
+    
+    def buscar_duplicado(self, registro: Dict) -> Tuple[bool, Optional[int], str]:
         """
         Busca si un registro ya existe en la base de datos.
         
         Returns:
-            Tuple: (es_duplicado, registro_existente, metodo_deteccion)
+            Tuple: (es_duplicado, indice_existente, metodo_deteccion)
         """
         # Nivel 1: Hash exacto
         hash_nuevo = self.calcular_hash(registro)
         if hash_nuevo in self.indice_hash:
-            idx = self.indice_hash[hash_nuevo]
-            return True, self.registros[idx], "hash_exacto"
+            return True, max(self.indice_hash[hash_nuevo]), "hash_exacto"
         
         # Nivel 2: Teléfono
+        nombre_nuevo = self.normalizar_nombre(registro.get("nombre", ""))
         telefonos = registro.get("telefono", [])
         if isinstance(telefonos, str):
             telefonos = [telefonos]
         
         for tel in telefonos:
-            tel_norm = self.normalizar_telefono(tel)
-            if tel_norm and tel_norm in self.indice_telefono:
+            clave = clave_telefono(tel)
+            if clave and clave in self.indice_telefono:
                 # Verificar que el nombre sea similar
-                for idx in self.indice_telefono[tel_norm]:
-                    existente = self.registros[idx]
-                    similitud = self.similitud_nombre(
-                        registro.get("nombre", ""),
-                        existente.get("nombre", "")
-                    )
+                for idx in self.indice_telefono[clave]:
+                    similitud = self._similitud_normalizada(nombre_nuevo, self.nombres_norm[idx])
                     if similitud > 60:  # Umbral bajo porque teléfono ya coincide
-                        return True, existente, "telefono"
+                        return True, idx, "telefono"
         
         # Nivel 3: Email exacto
         email = registro.get("email", "")
         if email:
             email_lower = email.lower()
             if email_lower in self.indice_email:
-                idx = self.indice_email[email_lower]
-                return True, self.registros[idx], "email"
+                return True, max(self.indice_email[email_lower]), "email"
         
         # Nivel 4: Similitud fuzzy de nombre (solo si no tiene contacto único)
-        nombre_nuevo = registro.get("nombre", "")
+        # Solo se puntúan los registros que comparten teléfono, email o dominio;
+        # el resto nunca pasaría _tienen_datos_comunes.
         if nombre_nuevo:
-            for existente in self.registros:
-                similitud = self.similitud_nombre(nombre_nuevo, existente.get("nombre", ""))
+            for idx in self._candidatos_nombre(registro):
+                similitud = self._similitud_normalizada(nombre_nuevo, self.nombres_norm[idx])
                 if similitud > 85:
                     # Verificar que tengan algún dato en común
-                    if self._tienen_datos_comunes(registro, existente):
-                        return True, existente, "nombre_similar"
+                    if self._tienen_datos_comunes(registro, self.registros[idx]):
+                        return True, idx, "nombre_similar"
         
         return False, None, ""
     
     def _tienen_datos_comunes(self, reg1: Dict, reg2: Dict) -> bool:
         """Verifica si dos registros tienen datos de contacto en común."""
         # Comparar teléfonos
-        tels1 = set(self.normalizar_telefono(t) for t in reg1.get("telefono", []))
-        tels2 = set(self.normalizar_telefono(t) for t in reg2.get("telefono", []))
-        if tels1 & tels2:
+        if self._claves_telefono(reg1) & self._claves_telefono(reg2):
             return True
         
         # Comparar email
@@ -289,9 +524,7 @@ class Consolidador:
     
     def _extraer_dominio(self, url: str) -> str:
         """Extrae el dominio de una URL."""
-        url = url.lower().replace("https://", "").replace("http://", "")
-        url = url.replace("www.", "")
-        return url.split("/")[0]
+        return normalizacion.extraer_dominio(url)
     
     def fusionar(self, existente: Dict, nuevo: Dict) -> Dict:
         """
@@ -302,22 +535,21 @@ class Consolidador:
         
         # Campos que se combinan (listas)
         for campo in ["telefono", "especialidades", "idiomas"]:
-            valores_existentes = existente.get(campo, [])
-            valores_nuevos = nuevo.get(campo, [])
+            valores_existentes = existente.get(campo) or []
+            valores_nuevos = nuevo.get(campo) or []
             
+            # Copia: el existente sigue indexado con sus valores actuales
             if isinstance(valores_existentes, str):
                 valores_existentes = [valores_existentes]
+            else:
+                valores_existentes = list(valores_existentes)
             if isinstance(valores_nuevos, str):
                 valores_nuevos = [valores_nuevos]
             
-            # Normalizar teléfonos para comparación
+            # Teléfonos: sin repetidos por clave y en formato canónico
             if campo == "telefono":
-                existentes_norm = {self.normalizar_telefono(t): t for t in valores_existentes}
-                for tel in valores_nuevos:
-                    tel_norm = self.normalizar_telefono(tel)
-                    if tel_norm and tel_norm not in existentes_norm:
-                        valores_existentes.append(tel)
-                fusionado[campo] = valores_existentes
+                nuevos_validos = [t for t in valores_nuevos if clave_telefono(t)]
+                fusionado[campo] = canonicalizar_telefonos(valores_existentes + nuevos_validos)
             else:
                 # Para otros campos, simplemente combinar únicos
                 combinados = list(set(valores_existentes + valores_nuevos))
@@ -338,6 +570,76 @@ class Consolidador:
         
         return fusionado
     
+    def cargar_registros(self, registros: List[Dict]):
+        """Sustituye los registros en memoria (sin archivo) y reconstruye índices."""
+        self.registros = registros
+        self._construir_indices()
+    
+    def agrupar_duplicados(self) -> List[GrupoDuplicados]:
+        """
+        Agrupa toda la base en componentes de posibles duplicados.
+        
+        Usa las claves de contacto ya indexadas (indice_bloques) y une los
+        duplicados transitivos con union-find (ver core.agrupador).
+        
+        Returns:
+            Grupos de más de un registro con su registro fusionado sugerido
+        """
+        cubos = (
+            (clave, sorted(indices))
+            for clave, indices in self.indice_bloques.items()
+            if len(indices) > 1
+        )
+        grupos = agrupar(len(self.registros), cubos, self.nombres_norm, self._similitud_normalizada)
+        for grupo in grupos:
+            grupo.sugerido = self._fusionar_grupo(grupo.indices)
+        return grupos
+    
+    def pares_nombre_similar(
+        self, umbral: float = 85, grupos: List[GrupoDuplicados] = ()
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Pares con nombre parecido fuera de los grupos, para revisar a mano.
+        
+        Returns:
+            (i, j, similitud) de mayor a menor similitud
+        """
+        return pares_nombre_similar(self.nombres_norm, self._similitud_normalizada, umbral, grupos)
+    
+    def _fusionar_grupo(self, indices: List[int]) -> Dict:
+        """Fusiona los registros de un grupo sobre el primero (el más antiguo)."""
+        fusionado = self.registros[indices[0]]
+        for idx in indices[1:]:
+            fusionado = self.fusionar(fusionado, self.registros[idx])
+        return fusionado
+    
+    def deduplicar(self, grupos: Optional[List[GrupoDuplicados]] = None) -> int:
+        """
+        Fusiona cada grupo en su primer registro y elimina los demás.
+        
+        Las posiciones cambian, así que el siguiente guardar() reescribe el
+        snapshot completo aunque esté activo el journal.
+        
+        Args:
+            grupos: Grupos a fusionar (por defecto, agrupar_duplicados())
+        
+        Returns:
+            Número de registros eliminados
+        """
+        if grupos is None:
+            grupos = self.agrupar_duplicados()
+        
+        eliminar = set()
+        for grupo in grupos:
+            self.registros[grupo.indices[0]] = grupo.sugerido or self._fusionar_grupo(grupo.indices)
+            eliminar.update(grupo.indices[1:])
+        
+        if eliminar:
+            self.registros = [r for i, r in enumerate(self.registros) if i not in eliminar]
+            self._construir_indices()
+            self._reescribir = True
+        return len(eliminar)
+    
     def es_valido(self, registro: Dict) -> Tuple[bool, str]:
         """
         Verifica si un registro cumple los requisitos mínimos Y pasa los filtros.
@@ -365,108 +667,298 @@ class Consolidador:
         
         return True, "ok"
     
-    def procesar_batch(self, nuevos: List[Dict], verbose: bool = False) -> ConsolidacionResult:
+    def procesar_batch(
+        self,
+        nuevos: List[Dict],
+        verbose: bool = False,
+        vectorizado: Optional[bool] = None
+    ) -> ConsolidacionResult:
         """
         Procesa un lote de registros nuevos con validación y filtrado.
         
         Args:
             nuevos: Lista de registros a procesar
             verbose: Si True, imprime detalles de filtrado
+            vectorizado: Puntuar todos los nombres del lote de una vez con
+                process.cpdist. None lo activa automáticamente en lotes grandes.
             
         Returns:
             ConsolidacionResult con estadísticas
         """
         resultado = ConsolidacionResult()
+        with span("procesar_batch", entrada=len(nuevos)) as datos:
+            for _ in self.procesar_stream(
+                nuevos, resultado, verbose=verbose,
+                vectorizado=vectorizado, tamano_lote=max(len(nuevos), 1)
+            ):
+                pass
+            datos["nuevos"] = resultado.total_nuevos
+        return resultado
+    
+    def procesar_stream(
+        self,
+        registros: Iterable[Dict],
+        resultado: Optional[ConsolidacionResult] = None,
+        verbose: bool = False,
+        vectorizado: Optional[bool] = None,
+        tamano_lote: int = 500
+    ) -> Iterator[EventoConsolidacion]:
+        """
+        Consolida registros según llegan y emite un evento por registro.
         
-        for registro in nuevos:
-            # Limpiar nombre si filtros disponibles
-            if FILTROS_DISPONIBLES and registro.get("nombre"):
-                registro["nombre"] = limpiar_nombre(registro["nombre"])
+        La entrada se consume en tramos de tamano_lote (cada tramo se
+        vectoriza como un lote), así que no hace falta tener todos los
+        registros en memoria. Para no acumular resultados completos, pasar
+        ConsolidacionResult(solo_resumen=True) o no pasar ninguno.
+        
+        Args:
+            registros: Iterable de registros (lista, generador...)
+            resultado: Si se pasa, acumula en él cada evento
+            verbose: Si True, imprime detalles de filtrado
+            vectorizado: Como en procesar_batch, decidido por tramo
+            tamano_lote: Registros por tramo
             
-            # Validar con filtros
-            valido, razon = self.es_valido(registro)
+        Yields:
+            EventoConsolidacion por cada registro, en orden de entrada
+        """
+        iterador = iter(registros)
+        posicion = 0
+        
+        while True:
+            tramo = list(islice(iterador, tamano_lote))
+            if not tramo:
+                break
             
-            if not valido:
-                if razon.startswith("dominio_excluido") or razon.startswith("nombre_invalido") or razon == "url_blog":
-                    # Es un registro filtrado (listado, blog, etc.)
-                    resultado.filtrados.append({"registro": registro, "razon": razon})
-                    resultado.razones_filtrado[razon] = resultado.razones_filtrado.get(razon, 0) + 1
-                    if verbose:
-                        print(f"  [FILTRADO] {razon}: {registro.get('nombre', '')[:40]}")
+            usar_cdist = vectorizado if vectorizado is not None else len(tramo) >= MIN_LOTE_VECTORIZADO
+            eventos: List[Optional[EventoConsolidacion]] = []
+            validos = []
+            for registro in tramo:
+                # Limpiar nombre si filtros disponibles
+                if FILTROS_DISPONIBLES and registro.get("nombre"):
+                    registro["nombre"] = limpiar_nombre(registro["nombre"])
+                
+                # Validar con filtros
+                valido, razon = self.es_valido(registro)
+                
+                if not valido:
+                    if razon.startswith("dominio_excluido") or razon.startswith("nombre_invalido") or razon == "url_blog":
+                        # Es un registro filtrado (listado, blog, etc.)
+                        eventos.append(EventoConsolidacion("filtrado", posicion, registro, razon=razon))
+                        if verbose:
+                            print(f"  [FILTRADO] {razon}: {registro.get('nombre', '')[:40]}")
+                    else:
+                        # Es inválido por falta de datos
+                        eventos.append(EventoConsolidacion("invalido", posicion, registro, razon=razon))
                 else:
-                    # Es inválido por falta de datos
-                    resultado.invalidos.append(registro)
-                continue
+                    eventos.append(None)
+                    validos.append((posicion, registro))
+                posicion += 1
             
-            # Buscar duplicado
-            es_dup, existente, metodo = self.buscar_duplicado(registro)
+            if usar_cdist and CDIST_DISPONIBLE:
+                self._precalcular_similitudes([registro for _, registro in validos])
             
-            if es_dup:
-                # Verificar si el nuevo aporta datos
-                fusionado = self.fusionar(existente, registro)
-                if fusionado != existente:
-                    # Actualizar en la base
-                    idx = self.registros.index(existente)
-                    self.registros[idx] = fusionado
-                    self._actualizar_indices(idx, fusionado)
-                    resultado.actualizados.append({
-                        "original": existente,
-                        "actualizado": fusionado,
-                        "metodo": metodo
-                    })
-                else:
-                    resultado.duplicados_ignorados.append({
-                        "registro": registro,
-                        "existente": existente,
-                        "metodo": metodo
-                    })
-            else:
-                # Agregar nuevo registro
-                registro["fecha_actualizacion"] = datetime.now().isoformat()
-                self.registros.append(registro)
-                idx = len(self.registros) - 1
-                self._actualizar_indices(idx, registro)
-                resultado.agregados.append(registro)
+            try:
+                pendientes = iter(validos)
+                for evento in eventos:
+                    if evento is None:
+                        evento = self._consolidar_registro(*next(pendientes))
+                    if resultado is not None:
+                        resultado.registrar(evento)
+                    yield evento
+            finally:
+                self._cache_similitud = {}
         
         # Imprimir resumen de filtrado si hay filtrados
-        if resultado.filtrados and verbose:
+        if resultado is not None and resultado.filtrados and verbose:
             print(f"\n[Consolidador] Filtrados: {len(resultado.filtrados)} registros no válidos")
             for razon, count in sorted(resultado.razones_filtrado.items(), key=lambda x: -x[1])[:5]:
                 print(f"  - {razon}: {count}")
+    
+    def _consolidar_registro(self, posicion: int, registro: Dict) -> EventoConsolidacion:
+        """Fusiona o agrega un registro ya validado."""
+        # Buscar duplicado
+        es_dup, idx, metodo = self.buscar_duplicado(registro)
+        
+        if es_dup:
+            existente = self.registros[idx]
+            # Verificar si el nuevo aporta datos
+            fusionado = self.fusionar(existente, registro)
+            if fusionado != existente:
+                # Actualizar en la base
+                self.registros[idx] = fusionado
+                self._actualizar_indices(idx, fusionado, anterior=existente)
+                self._pendientes.add(idx)
+                return EventoConsolidacion("actualizado", posicion, fusionado, idx, existente, metodo)
+            return EventoConsolidacion("duplicado", posicion, registro, idx, existente, metodo)
+        
+        # Agregar nuevo registro
+        if registro.get("telefono"):
+            registro["telefono"] = canonicalizar_telefonos(registro["telefono"])
+        registro["fecha_actualizacion"] = datetime.now().isoformat()
+        self.registros.append(registro)
+        idx = len(self.registros) - 1
+        self._actualizar_indices(idx, registro)
+        self._pendientes.add(idx)
+        return EventoConsolidacion("agregado", posicion, registro, idx)
+    
+    def _precalcular_similitudes(self, registros: List[Dict]):
+        """
+        Puntúa de una vez los nombres del lote contra sus candidatos.
+        
+        Reúne los candidatos de los niveles 2 (teléfono) y 4 (bloqueo) de
+        cada registro y los puntúa con process.cpdist (la variante por
+        parejas de cdist) en varios hilos, usando las mismas métricas que
+        similitud_nombre. Las parejas que aparezcan después (registros
+        agregados o fusionados en este mismo lote) se siguen calculando
+        una a una.
+        """
+        pares = set()
+        for registro in registros:
+            nombre_nuevo = self.normalizar_nombre(registro.get("nombre", ""))
+            if not nombre_nuevo:
+                continue
+            
+            candidatos = set(self._candidatos_nombre(registro))
+            for tel in self._claves_telefono(registro):
+                candidatos.update(self.indice_telefono.get(tel, ()))
+            
+            for idx in candidatos:
+                nombre_existente = self.nombres_norm[idx]
+                if nombre_existente and nombre_existente != nombre_nuevo:
+                    pares.add((nombre_nuevo, nombre_existente))
         
-        return resultado
+        if not pares:
+            return
+        
+        pares = list(pares)
+        nuevos = [a for a, _ in pares]
+        existentes = [b for _, b in pares]
+        
+        import numpy as np
+        
+        puntuaciones = None
+        for scorer in (fuzz.ratio, fuzz.partial_ratio, fuzz.token_sort_ratio):
+            parcial = process.cpdist(
+                nuevos, existentes, scorer=scorer, dtype=np.float64, workers=-1
+            )
+            puntuaciones = parcial if puntuaciones is None else np.maximum(puntuaciones, parcial)
+        
+        cache = dict(zip(pares, puntuaciones.tolist()))
+        self._cache_similitud = cache
     
-    def _actualizar_indices(self, idx: int, registro: Dict):
-        """Actualiza los índices para un registro."""
-        # Hash
-        hash_reg = self.calcular_hash(registro)
-        self.indice_hash[hash_reg] = idx
+    def _actualizar_indices(self, idx: int, registro: Dict, anterior: Optional[Dict] = None):
+        """
+        Actualiza los índices para un registro.
         
-        # Teléfonos
-        telefonos = registro.get("telefono", [])
-        if isinstance(telefonos, str):
-            telefonos = [telefonos]
-        for tel in telefonos:
-            tel_norm = self.normalizar_telefono(tel)
-            if tel_norm:
-                if tel_norm not in self.indice_telefono:
-                    self.indice_telefono[tel_norm] = set()
-                self.indice_telefono[tel_norm].add(idx)
+        Args:
+            idx: Posición del registro en self.registros
+            registro: Versión nueva del registro
+            anterior: Versión que ocupaba esa posición (sus claves se retiran)
+        """
+        if anterior is not None:
+            self._quitar_de_indices(idx, anterior)
         
-        # Email
-        email = registro.get("email", "")
+        # Nombre normalizado
+        nombre_norm = self.normalizar_nombre(registro.get("nombre", ""))
+        if idx < len(self.nombres_norm):
+            self.nombres_norm[idx] = nombre_norm
+        else:
+            self.nombres_norm.append(nombre_norm)
+        
+        for indice, clave in self._claves_indices(registro):
+            if clave not in indice:
+                indice[clave] = set()
+            indice[clave].add(idx)
+    
+    def _quitar_de_indices(self, idx: int, registro: Dict):
+        """Retira de los índices las claves de una versión antigua del registro."""
+        for indice, clave in self._claves_indices(registro):
+            indices = indice.get(clave)
+            if indices is not None:
+                indices.discard(idx)
+                if not indices:
+                    del indice[clave]
+    
+    def _claves_indices(self, registro: Dict) -> List[Tuple[Dict, Hashable]]:
+        """Pares (índice, clave) bajo los que se indexa un registro."""
+        claves = [(self.indice_hash, self.calcular_hash(registro))]
+        
+        for tel in self._claves_telefono(registro):
+            claves.append((self.indice_telefono, tel))
+        
+        email = (registro.get("email") or "").lower()
         if email:
-            self.indice_email[email.lower()] = idx
+            claves.append((self.indice_email, email))
+        
+        # Bloqueo para nivel 4
+        for clave in self.claves_bloqueo(registro):
+            claves.append((self.indice_bloques, clave))
+        
+        return claves
     
     def guardar(self, path: str = None):
-        """Guarda la base de datos consolidada."""
+        """
+        Guarda la base de datos consolidada.
+        
+        En modo journal, y si path es la base cargada, solo añade al journal
+        los registros agregados o actualizados desde el último guardado.
+        Compacta (reescribe el snapshot) cuando el journal crece demasiado
+        o el snapshot aún no tiene token de journal.
+        """
         path = Path(path) if path else self.base_datos_path
         if not path:
             raise ValueError("No se especificó ruta para guardar")
+        self._comprobar_escritura(path)
+        
+        if (self.journal and path == self.base_datos_path
+                and self._journal_base and path.exists() and not self._reescribir):
+            if not self._pendientes:
+                return
+            operaciones = [
+                {
+                    "op": "agregar" if idx >= self._persistidos else "actualizar",
+                    "idx": idx,
+                    "registro": self.registros[idx],
+                }
+                for idx in sorted(self._pendientes)
+            ]
+            tam_journal = anexar_journal(path, self._journal_base, operaciones)
+            self._persistidos = len(self.registros)
+            self._pendientes.clear()
+            print(f"[Consolidador] Journal: {len(operaciones)} cambios en {ruta_journal(path).name}")
+            
+            if tam_journal > path.stat().st_size * JOURNAL_MAX_FRACCION:
+                self.compactar()
+            return
         
-        # Asegurar que existe el directorio
-        path.parent.mkdir(parents=True, exist_ok=True)
+        self._escribir_snapshot(path)
+    
+    def compactar(self):
+        """
+        Reescribe el snapshot con todos los registros y vacía el journal.
+        
+        Se puede llamar a demanda (p. ej. al terminar una tanda de búsquedas);
+        guardar() lo hace solo cuando el journal supera JOURNAL_MAX_FRACCION.
+        """
+        if not self.base_datos_path:
+            raise ValueError("No se especificó ruta para guardar")
+        self._comprobar_escritura(self.base_datos_path)
+        self._escribir_snapshot(self.base_datos_path)
+    
+    def _comprobar_escritura(self, path: Path):
+        """
+        Impide sobrescribir una base que existe pero no se pudo cargar.
         
+        Raises:
+            ValueError: Si path es la base cargada y su carga falló
+        """
+        if self._carga_fallida and path == self.base_datos_path:
+            raise ValueError(
+                f"No se guarda {path.name}: no se pudo cargar y se perderían sus registros"
+            )
+    
+    def _escribir_snapshot(self, path: Path):
+        """Escribe el JSON completo de forma atómica."""
         data = {
             "metadata": {
                 "fecha_actualizacion": datetime.now().isoformat(),
@@ -476,8 +968,14 @@ class Consolidador:
             "registros": self.registros
         }
         
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        firma = guardar_archivo(path, data)
+        self._guardar_indices(path, firma)
+        
+        if path == self.base_datos_path:
+            self._journal_base = data["metadata"]["journal_base"]
+            self._persistidos = len(self.registros)
+            self._pendientes.clear()
+            self._reescribir = False
         
         print(f"[Consolidador] Guardados {len(self.registros)} registros en {path}")
     
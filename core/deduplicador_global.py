@@ -0,0 +1,602 @@
+"""
+Deduplicación global entre ciudades.
+
+Reparte los registros de todas las ciudades en shards por clave de contacto
+(teléfono, email, dominio web), busca coincidencias dentro de cada shard en
+un ProcessPoolExecutor y une los resultados de todos los shards con
+union-find (core.agrupador), de modo que un despacho que aparece en varias
+ciudades acaba en un único grupo aunque sus coincidencias caigan en shards
+distintos.
+
+Es incremental: actualizar_ciudad() solo reprocesa los registros nuevos o
+modificados (y los grupos de los que han desaparecido), y vista_unificada()
+solo vuelve a fusionar los grupos tocados. guardar_estado() deja ese estado
+(grupos, claves, nombres y vista) en data/dedup_global.jsonz, y
+desde_directorio(estado=...) lo retoma, así que la siguiente ejecución de
+scripts/optimizar_datos.py o de la multiciudad solo resuelve lo que ha
+cambiado en los archivos desde entonces.
+"""
+import hashlib
+import json
+import os
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from core.agrupador import UnionFind
+from core.consolidador import claves_bloqueo, similitud_nombres
+from utils.database import cargar_archivo
+from utils.normalizacion import extraer_dominio, normalizar_nombre
+from utils.telefonos import canonicalizar_telefonos, claves_telefonos, formatear_telefono
+
+
+# (ciudad, huella del contenido): no cambia al reordenar o borrar otros registros
+IdRegistro = Tuple[str, str]
+
+# Mismo umbral que el nivel 2 del Consolidador (teléfono + nombre parecido)
+UMBRAL_NOMBRE_TELEFONO = 60
+
+# Por debajo de este número de claves a resolver no compensa arrancar procesos
+MIN_CLAVES_PARALELO = 2000
+
+# Archivos de data/ que no son ciudades
+ARCHIVOS_NO_CIUDAD = ("config", "api_usage", "historial", "optimizados", "backup")
+
+# Estado persistido entre ejecuciones (JSON con zlib, fuera del glob *.json).
+# Subir la versión si cambian las claves, la normalización o la fusión.
+ESTADO_PATH = "dedup_global.jsonz"
+VERSION_ESTADO = 1
+
+
+def _resolver_shard(tareas: List[Tuple[str, List[Tuple[IdRegistro, str]], List[Tuple[IdRegistro, str]]]]) -> List[Tuple[IdRegistro, IdRegistro]]:
+    """
+    Busca coincidencias dentro de un shard.
+
+    Se ejecuta en un proceso del pool, así que solo recibe claves, ids y
+    nombres normalizados (no los registros completos).
+
+    Args:
+        tareas: (clave, existentes, nuevos) por cada clave del shard.
+            existentes ya están resueltos entre sí de llamadas anteriores.
+
+    Returns:
+        Pares de ids que son el mismo despacho
+    """
+    pares = []
+    for clave, existentes, nuevos in tareas:
+        vistos = list(existentes)
+        for rid, nombre in nuevos:
+            if clave.startswith("tel:"):
+                # Un teléfono compartido (centralitas, colegios) no basta:
+                # se exige además un nombre parecido, como en el nivel 2
+                for otro, nombre_otro in vistos:
+                    if similitud_nombres(nombre, nombre_otro) > UMBRAL_NOMBRE_TELEFONO:
+                        pares.append((rid, otro))
+            elif vistos:
+                # Mismo email o misma web = mismo despacho
+                pares.append((rid, vistos[0][0]))
+            vistos.append((rid, nombre))
+    return pares
+
+
+class DeduplicadorGlobal:
+    """
+    Motor de deduplicación entre ciudades por shards de claves de contacto.
+
+    Uso:
+        dedup = DeduplicadorGlobal.desde_directorio("data")
+        registros = dedup.vista_unificada()
+        ...
+        dedup.actualizar_ciudad("Madrid", registros_madrid)  # tras una búsqueda
+        registros = dedup.vista_unificada()  # solo refusiona lo tocado
+    """
+
+    def __init__(self, n_shards: int = None, max_workers: int = None):
+        """
+        Args:
+            n_shards: Número de particiones de claves (por defecto 4 por worker)
+            max_workers: Procesos del pool (por defecto, núcleos disponibles)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.n_shards = n_shards or self.max_workers * 4
+        self.registros: Dict[IdRegistro, Dict] = {}
+        self.claves: Dict[str, List[IdRegistro]] = {}  # clave de contacto -> ids
+        self.claves_registro: Dict[IdRegistro, List[str]] = {}  # id -> sus claves
+        self.nombres: Dict[IdRegistro, str] = {}  # id -> nombre normalizado
+        self.uf = UnionFind()
+        self.por_ciudad: Dict[str, Set[IdRegistro]] = {}
+        self._tocados: Set[IdRegistro] = set()
+        self._vista: Dict[Tuple[IdRegistro, ...], Dict] = {}  # grupo -> registro fusionado
+
+    @classmethod
+    def desde_directorio(cls, data_dir, estado: Union[str, Path, None] = None, **kwargs) -> "DeduplicadorGlobal":
+        """
+        Crea el motor con todos los archivos de ciudad de data_dir.
+
+        Args:
+            data_dir: Directorio de las ciudades
+            estado: Estado de una ejecución anterior (guardar_estado); si es
+                válido solo se reprocesa lo que ha cambiado desde entonces
+        """
+        dedup = (cls.cargar_estado(estado, **kwargs) if estado else None) or cls(**kwargs)
+        ciudades: Dict[str, Dict[IdRegistro, Dict]] = {}
+        for archivo in sorted(Path(data_dir).glob("*.json")):
+            if any(excluir in archivo.name for excluir in ARCHIVOS_NO_CIUDAD):
+                continue
+            try:
+                data = cargar_archivo(archivo)
+            except Exception as e:
+                print(f"[DedupGlobal] Error cargando {archivo}: {e}")
+                continue
+            ciudad = archivo.stem.title()
+            ciudades[ciudad] = _ids_ciudad(ciudad, data.get("registros", []), archivo.name)
+        
+        # Todas las ciudades de una vez: quitar un registro rehace grupos de
+        # varias ciudades, y sus otros miembros tienen que estar ya cargados.
+        # Las ciudades del estado sin archivo (o ilegible) se quitan enteras
+        actuales = {rid: registro for ids in ciudades.values() for rid, registro in ids.items()}
+        conocidos = set().union(*dedup.por_ciudad.values())
+        cambios = {}
+        for rid, registro in actuales.items():
+            if rid in conocidos:
+                dedup.registros[rid] = registro
+            else:
+                cambios[rid] = registro
+        dedup.por_ciudad = {ciudad: set(ids) for ciudad, ids in ciudades.items() if ids}
+        
+        quitados = conocidos - actuales.keys()
+        if quitados:
+            cambios.update(dedup._quitar(quitados))
+        if cambios:
+            dedup._procesar(cambios)
+        return dedup
+
+    def actualizar_ciudad(self, ciudad: str, registros: List[Dict], archivo: str = None) -> int:
+        """
+        Incorpora el estado actual de una ciudad.
+
+        Solo se reprocesan los registros nuevos o que han cambiado desde la
+        última llamada. Los que ya no están (borrados, fusionados o con otro
+        contenido) salen del índice y sus grupos se vuelven a resolver sin
+        ellos, porque podían ser el único enlace entre otros registros.
+
+        Args:
+            ciudad: Nombre de la ciudad (como en _ciudad_origen)
+            registros: Registros de la ciudad, en el orden de su archivo
+            archivo: Nombre del archivo de origen
+
+        Returns:
+            Número de registros reprocesados
+        """
+        actuales = _ids_ciudad(ciudad, registros, archivo)
+        anteriores = self.por_ciudad.get(ciudad, set())
+        quitados = anteriores - actuales.keys()
+        cambios = {rid: r for rid, r in actuales.items() if rid not in anteriores}
+        self.por_ciudad[ciudad] = set(actuales)
+
+        if quitados:
+            cambios.update(self._quitar(quitados))
+        if cambios:
+            self._procesar(cambios)
+        return len(cambios)
+
+    def _quitar(self, quitados: Set[IdRegistro]) -> Dict[IdRegistro, Dict]:
+        """
+        Saca registros del índice y deshace los grupos en los que estaban.
+
+        Union-find no permite separar, así que se rehace sin los grupos
+        afectados. Devuelve el resto de miembros de esos grupos, que hay que
+        volver a resolver (solo entre ellos se perdían enlaces).
+        """
+        raices = {self.uf.encontrar(rid) for rid in quitados}
+        afectados = [rid for rid in self.uf.padre if self.uf.encontrar(rid) in raices]
+
+        uf = UnionFind()
+        for rid in self.uf.padre:
+            raiz = self.uf.encontrar(rid)
+            if raiz not in raices:
+                uf.agregar(rid)
+                uf.agregar(raiz)
+                uf.unir(rid, raiz)
+        self.uf = uf
+
+        for rid in quitados:
+            self.registros.pop(rid, None)
+            self.nombres.pop(rid, None)
+            for clave in self.claves_registro.pop(rid, ()):
+                miembros = self.claves.get(clave, [])
+                if rid in miembros:
+                    miembros.remove(rid)
+                if not miembros:
+                    self.claves.pop(clave, None)
+        self._tocados.difference_update(quitados)
+
+        return {rid: self.registros[rid] for rid in afectados if rid not in quitados}
+
+    def _procesar(self, cambios: Dict[IdRegistro, Dict]):
+        """Resuelve los registros cambiados contra el resto, por shards."""
+        tareas_por_clave: Dict[str, List[Tuple[IdRegistro, str]]] = {}
+        for rid, registro in cambios.items():
+            self.registros[rid] = registro
+            self.nombres[rid] = normalizar_nombre(registro.get("nombre") or "")
+            self.claves_registro[rid] = sorted(claves_bloqueo(registro))
+            self.uf.agregar(rid)
+            for clave in self.claves_registro[rid]:
+                tareas_por_clave.setdefault(clave, []).append((rid, self.nombres[rid]))
+
+        shards: List[list] = [[] for _ in range(self.n_shards)]
+        for clave, nuevos in tareas_por_clave.items():
+            ids_nuevos = {rid for rid, _ in nuevos}
+            existentes = [
+                (rid, self.nombres[rid]) for rid in self.claves.get(clave, ())
+                if rid not in ids_nuevos
+            ]
+            shards[zlib.crc32(clave.encode()) % self.n_shards].append((clave, existentes, nuevos))
+
+        # Las coincidencias de cada shard se unen aquí: un registro con
+        # teléfono en un shard y dominio en otro enlaza ambos grupos
+        for pares in self._ejecutar_shards([s for s in shards if s], len(tareas_por_clave)):
+            for a, b in pares:
+                self.uf.unir(a, b)
+
+        for clave, nuevos in tareas_por_clave.items():
+            miembros = self.claves.setdefault(clave, [])
+            conocidos = set(miembros)
+            miembros.extend(rid for rid, _ in nuevos if rid not in conocidos)
+
+        self._tocados.update(cambios)
+
+    def _ejecutar_shards(self, shards: List[list], total_claves: int) -> Iterable[List[Tuple[IdRegistro, IdRegistro]]]:
+        if total_claves < MIN_CLAVES_PARALELO or self.max_workers <= 1 or len(shards) <= 1:
+            return [_resolver_shard(shard) for shard in shards]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(_resolver_shard, shards))
+
+    def grupos(self) -> List[List[IdRegistro]]:
+        """Grupos de ids que corresponden al mismo despacho."""
+        return [sorted(miembros) for miembros in self.uf.grupos().values()]
+
+    def vista_unificada(self, fusionar: Callable[[List[Dict]], Dict] = None) -> List[Dict]:
+        """
+        Un registro por despacho, con sus ciudades agrupadas.
+
+        Solo se vuelven a fusionar los grupos con algún registro cambiado
+        desde la última llamada.
+
+        Args:
+            fusionar: Función grupo -> registro (por defecto unificar_grupo)
+
+        Returns:
+            Lista de registros unificados
+        """
+        fusionar = fusionar or unificar_grupo
+        vista = {}
+        for miembros in self.grupos():
+            grupo = tuple(miembros)
+            if grupo in self._vista and self._tocados.isdisjoint(grupo):
+                vista[grupo] = self._vista[grupo]
+            else:
+                vista[grupo] = fusionar([dict(self.registros[rid]) for rid in grupo])
+
+        self._vista = vista
+        self._tocados.clear()
+        return list(vista.values())
+
+    def guardar_estado(self, path: Union[str, Path]):
+        """
+        Guarda el estado incremental (sin los registros, que se releen de
+        las ciudades) para retomarlo con desde_directorio(estado=path).
+
+        Llamar después de vista_unificada(): la vista guardada es la de
+        ese momento.
+        """
+        ids = list(self.uf.padre)
+        posicion = {rid: i for i, rid in enumerate(ids)}
+        estado = {
+            "version": VERSION_ESTADO,
+            "ids": [list(rid) for rid in ids],
+            "nombres": [self.nombres.get(rid, "") for rid in ids],
+            "claves": [self.claves_registro.get(rid, []) for rid in ids],
+            "padre": [posicion[self.uf.encontrar(rid)] for rid in ids],
+            "vista": [
+                [[posicion[rid] for rid in grupo], registro]
+                for grupo, registro in self._vista.items()
+                if self._tocados.isdisjoint(grupo)
+            ],
+        }
+        contenido = zlib.compress(
+            json.dumps(estado, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"), 1
+        )
+        path = Path(path)
+        temporal = path.with_name(path.name + ".tmp")
+        try:
+            temporal.write_bytes(contenido)
+            os.replace(temporal, path)
+        except OSError as e:
+            # Sin estado solo se pierde la parte incremental
+            print(f"[DedupGlobal] No se pudo guardar el estado: {e}")
+
+    @classmethod
+    def cargar_estado(cls, path: Union[str, Path], **kwargs) -> Optional["DeduplicadorGlobal"]:
+        """
+        Motor con el estado de guardar_estado(), o None si no existe, es de
+        otra versión o está dañado (entonces se reconstruye todo).
+
+        Los registros no están en el estado: los pone actualizar_ciudad()
+        al releer cada ciudad.
+        """
+        try:
+            estado = json.loads(zlib.decompress(Path(path).read_bytes()))
+            if estado.get("version") != VERSION_ESTADO:
+                return None
+            ids = [(str(ciudad), str(huella)) for ciudad, huella in estado["ids"]]
+            nombres, claves, padre = estado["nombres"], estado["claves"], estado["padre"]
+            posiciones = padre + [i for miembros, _ in estado["vista"] for i in miembros]
+            if (not len(ids) == len(nombres) == len(claves) == len(padre)
+                    or not all(type(i) is int and 0 <= i < len(ids) for i in posiciones)):
+                return None
+            dedup = cls(**kwargs)
+            for rid, nombre, claves_rid, raiz in zip(ids, nombres, claves, padre):
+                dedup.nombres[rid] = str(nombre)
+                dedup.claves_registro[rid] = [str(clave) for clave in claves_rid]
+                for clave in dedup.claves_registro[rid]:
+                    dedup.claves.setdefault(clave, []).append(rid)
+                dedup.uf.agregar(rid)
+                dedup.por_ciudad.setdefault(rid[0], set()).add(rid)
+            for rid, raiz in zip(ids, padre):
+                dedup.uf.unir(ids[raiz], rid)
+            for miembros, registro in estado["vista"]:
+                if not isinstance(registro, dict):
+                    return None
+                dedup._vista[tuple(sorted(ids[i] for i in miembros))] = registro
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError, IndexError, zlib.error) as e:
+            print(f"[DedupGlobal] Estado no válido ({e}), se reconstruye todo")
+            return None
+        return dedup
+
+    def estadisticas(self) -> Dict:
+        grupos = self.grupos()
+        return {
+            "total_original": len(self.registros),
+            "total_optimizado": len(grupos),
+            "reduccion": len(self.registros) - len(grupos),
+            "grupos_fusionados": sum(1 for g in grupos if len(g) > 1),
+            "registros_con_multiple_ciudad": sum(1 for g in grupos if len({c for c, _ in g}) > 1),
+        }
+
+
+def _ids_ciudad(ciudad: str, registros: List[Dict], archivo: Optional[str] = None) -> Dict[IdRegistro, Dict]:
+    """Registros de una ciudad anotados con su origen, por id."""
+    archivo = archivo or f"{ciudad.lower()}.json"
+    actuales: Dict[IdRegistro, Dict] = {}
+    repeticiones: Dict[str, int] = {}
+    for registro in registros:
+        anotado = dict(registro, _ciudad_origen=ciudad, _archivo_origen=archivo)
+        huella = _huella(anotado)
+        # Registros idénticos dentro de la ciudad: #1, #2...
+        n = repeticiones[huella] = repeticiones.get(huella, 0) + 1
+        actuales[(ciudad, huella if n == 1 else f"{huella}#{n}")] = anotado
+    return actuales
+
+
+def _huella(registro: Dict) -> str:
+    """Hash del contenido de un registro (cambia si cambia cualquier campo)."""
+    texto = json.dumps(registro, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=12).hexdigest()
+
+
+# === FUSIÓN DE GRUPOS (vista unificada) ===
+
+def extraer_nombre_desde_dominio(dominio: str) -> str:
+    """
+    Extrae un nombre razonable desde el dominio.
+    Ejemplo: 'abogadosextranjeriamadrid.com' -> 'Abogados Extranjería Madrid'
+    """
+    if not dominio:
+        return ""
+
+    # Quitar extensiones
+    nombre = dominio.split('.')[0]
+
+    # Reemplazar guiones y underscores por espacios
+    nombre = nombre.replace('-', ' ').replace('_', ' ')
+
+    # Capitalizar palabras
+    palabras = nombre.split()
+    nombre_capitalizado = ' '.join(p.capitalize() for p in palabras)
+
+    # Correcciones comunes
+    nombre_capitalizado = re.sub(r'\bAbogado\b', 'Abogados', nombre_capitalizado, flags=re.IGNORECASE)
+    nombre_capitalizado = re.sub(r'\bExtranjeria\b', 'Extranjería', nombre_capitalizado, flags=re.IGNORECASE)
+
+    return nombre_capitalizado
+
+
+def limpiar_nombre_actual(nombre: str, dominio: str) -> Tuple[str, str]:
+    """
+    Limpia nombre actual y extrae descripción.
+    Returns: (nombre_limpio, descripcion)
+    """
+    if not nombre:
+        return extraer_nombre_desde_dominio(dominio), ""
+
+    descripcion = ""
+
+    # Separadores comunes
+    separadores = [' - ', ' | ', ' – ', ' — ', ' · ', ' • ', ':', ' (', ' [', ' - ']
+
+    for sep in separadores:
+        if sep in nombre:
+            partes = nombre.split(sep, 1)
+            nombre = partes[0].strip()
+            if len(partes) > 1 and len(partes[1]) > 5:
+                desc = partes[1].strip()
+                # Quitar paréntesis de cierre
+                desc = desc.rstrip(')').rstrip(']')
+                if len(desc) > 5 and desc not in ['Madrid', 'Barcelona', 'Valencia', 'España']:
+                    descripcion = desc
+            break
+
+    # Limpiar sufijos
+    sufijos = [
+        r'\s*[-|]\s*(Abogados?|Despacho|Bufete|Madrid|Barcelona|Valencia|España).*$',
+        r'\s*\(.*\)\s*$',
+        r'\.{3,}$',
+    ]
+
+    for patron in sufijos:
+        nombre = re.sub(patron, '', nombre, flags=re.IGNORECASE)
+
+    nombre = nombre.strip()
+
+    # Si el nombre es muy genérico, usar dominio
+    if len(nombre) < 3 or nombre.lower() in ['contacto', 'inicio', 'home', 'about']:
+        nombre = extraer_nombre_desde_dominio(dominio)
+
+    return nombre, descripcion
+
+
+def fusionar_registros(registros: List[Dict]) -> Dict:
+    """
+    Fusiona múltiples registros del mismo despacho.
+    Agrupa ciudades, teléfonos, direcciones, etc.
+    """
+    if not registros:
+        return {}
+
+    # Seleccionar registro base (el más completo)
+    registro_base = max(registros, key=lambda r: sum([
+        bool(r.get("telefono")),
+        bool(r.get("email")),
+        bool(r.get("direccion")),
+        len(r.get("especialidades", []))
+    ]))
+
+    fusionado = registro_base.copy()
+
+    # Agrupar ciudades (nueva estructura: ciudades como lista)
+    ciudades = set()
+    direcciones = []
+    distritos = set()
+
+    for r in registros:
+        if r.get("ciudad"):
+            ciudades.add(r.get("ciudad"))
+        if r.get("direccion"):
+            dir_actual = r.get("direccion")
+            if dir_actual not in direcciones:
+                direcciones.append(dir_actual)
+        if r.get("distrito"):
+            distritos.add(r.get("distrito"))
+
+    # Nueva estructura: ciudades como lista
+    fusionado["ciudades"] = sorted(list(ciudades)) if ciudades else [registro_base.get("ciudad")] if registro_base.get("ciudad") else []
+    fusionado["ciudad"] = fusionado["ciudades"][0] if fusionado["ciudades"] else None  # Mantener para compatibilidad
+    fusionado["direcciones"] = direcciones if len(direcciones) > 1 else [direcciones[0]] if direcciones else []
+    if fusionado["direcciones"] and not fusionado.get("direccion"):
+        fusionado["direccion"] = fusionado["direcciones"][0]
+    if distritos:
+        fusionado["distritos"] = sorted(list(distritos))
+
+    # Combinar teléfonos (sin duplicados por clave E.164)
+    todas_claves = set()
+    for r in registros:
+        todas_claves.update(claves_telefonos(r.get("telefono")))
+
+    fusionado["telefono"] = [formatear_telefono(clave) for clave in sorted(todas_claves)]
+
+    # Combinar especialidades
+    todas_esp = set()
+    for r in registros:
+        esp = r.get("especialidades", [])
+        if isinstance(esp, list):
+            todas_esp.update(esp)
+    fusionado["especialidades"] = sorted(list(todas_esp))
+
+    # Combinar idiomas
+    todos_idiomas = set()
+    for r in registros:
+        idiomas = r.get("idiomas", [])
+        if isinstance(idiomas, list):
+            todos_idiomas.update(idiomas)
+    if todos_idiomas:
+        fusionado["idiomas"] = sorted(list(todos_idiomas))
+
+    # Mejor email (el del dominio si existe)
+    dominio = extraer_dominio(fusionado.get("web", ""))
+    if dominio:
+        for r in registros:
+            email = r.get("email", "")
+            if email and dominio in email.lower():
+                fusionado["email"] = email
+                break
+
+    # Mejor nombre basado en dominio
+    nombre_limpio, descripcion = limpiar_nombre_actual(fusionado.get("nombre", ""), dominio)
+    fusionado["nombre"] = nombre_limpio
+    if descripcion:
+        fusionado["descripcion"] = descripcion
+
+    # Fecha de actualización más reciente
+    fechas = [r.get("fecha_actualizacion") for r in registros if r.get("fecha_actualizacion")]
+    if fechas:
+        fusionado["fecha_actualizacion"] = max(fechas)
+    else:
+        fusionado["fecha_actualizacion"] = datetime.now().isoformat()
+
+    # Metadatos
+    fusionado["_ciudades_originales"] = sorted(list(ciudades))
+    fusionado["_registros_fusionados"] = len(registros)
+
+    return fusionado
+
+
+def unificar_grupo(registros: List[Dict]) -> Dict:
+    """
+    Registro de la vista unificada para un grupo.
+
+    Los grupos de varios registros se fusionan; uno solo se deja tal cual,
+    limpiando el nombre con su dominio y con ciudades como lista.
+    """
+    if len(registros) > 1:
+        return fusionar_registros(registros)
+
+    r = registros[0]
+    if r.get("telefono"):
+        r["telefono"] = canonicalizar_telefonos(r["telefono"])
+    dominio = extraer_dominio(r.get("web", ""))
+    if dominio:
+        nombre_limpio, desc = limpiar_nombre_actual(r.get("nombre", ""), dominio)
+        r["nombre"] = nombre_limpio
+        if desc:
+            r["descripcion"] = desc
+        # Convertir ciudad a lista para consistencia
+        if r.get("ciudad") and "ciudades" not in r:
+            r["ciudades"] = [r["ciudad"]]
+    return r
+
+
+def guardar_vista(path, registros: List[Dict], stats: Dict):
+    """Escribe la vista unificada (data/registros_optimizados.json)."""
+    data = {
+        "metadata": {
+            "fecha_optimizacion": datetime.now().isoformat(),
+            "total_registros": len(registros),
+            "total_original": stats["total_original"],
+            "reduccion": stats["reduccion"],
+            "fuente": "deduplicacion_global"
+        },
+        "registros": registros
+    }
+
+    path = Path(path)
+    temporal = path.with_name(path.name + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, path)
@@ -0,0 +1,122 @@
+"""
+Filtrado de URLs antes de scrapear y consolidar.
+
+Es el paso "Filtrar URLs relevantes" del pipeline del Orquestador:
+descarta lo que la consolidación iba a rechazar y lo que no añade nada a
+la base, antes de gastar en ello créditos de Firecrawl o CPU del
+Consolidador.
+"""
+from typing import Dict, Iterable, Iterator, List, Set
+
+from adapters import SearchResult
+from core.consolidador import Consolidador
+from utils.normalizacion import canonicalizar_url, extraer_dominio
+from utils.telefonos import claves_telefonos
+
+
+class FiltroURLs:
+    """
+    Etapa previa a la consolidación de una ciudad.
+
+    Para cada resultado de búsqueda:
+    1. Canonicaliza la web y la reduce a su dominio
+    2. Aplica los filtros de utils/filtros (los mismos que Consolidador.es_valido)
+    3. Descarta el resultado si su dominio ya está en la base de la ciudad, o
+       ha salido antes en esta búsqueda, y no aporta teléfono, email ni
+       dirección nuevos
+    """
+
+    def __init__(self, consolidador: Consolidador):
+        """
+        Args:
+            consolidador: Consolidador de la ciudad (base e índices ya cargados)
+        """
+        self.consolidador = consolidador
+        self.descartados: Dict[str, int] = {}
+        self.dominios_nuevos = 0  # dominios que no estaban en la base ni habían salido antes
+        self._vistos: Dict[str, List[Dict]] = {}  # dominio -> resultados que han pasado
+
+    def filtrar(self, resultados: Iterable) -> Iterator[Dict]:
+        """
+        Filtra resultados de búsqueda según se consumen.
+
+        Args:
+            resultados: SearchResult o dicts
+
+        Yields:
+            Registros (dicts) que merece la pena consolidar
+        """
+        for resultado in resultados:
+            registro = resultado.to_dict() if isinstance(resultado, SearchResult) else resultado
+
+            web = registro.get("web")
+            if web:
+                registro["web"] = canonicalizar_url(web)
+
+            valido, razon = self.consolidador.es_valido(registro)
+            if not valido:
+                self._descartar(razon)
+                continue
+
+            dominio = extraer_dominio(registro["web"])
+            conocidos = self._registros_dominio(dominio)
+            if conocidos and not self._aporta_datos(registro, conocidos):
+                self._descartar("dominio_conocido")
+                continue
+            if not conocidos:
+                self.dominios_nuevos += 1
+
+            self._vistos.setdefault(dominio, []).append(registro)
+            yield registro
+
+    def _descartar(self, razon: str):
+        self.descartados[razon] = self.descartados.get(razon, 0) + 1
+
+    def _registros_dominio(self, dominio: str) -> List[Dict]:
+        """Registros de la base y de esta búsqueda con el mismo dominio."""
+        indices = self.consolidador.indice_bloques.get(f"dom:{dominio}", ())
+        return [self.consolidador.registros[i] for i in indices] + self._vistos.get(dominio, [])
+
+    @staticmethod
+    def _aporta_datos(registro: Dict, conocidos: List[Dict]) -> bool:
+        """True si el registro trae teléfono, email o dirección que no se tenían."""
+        telefonos: Set[int] = set()
+        emails: Set[str] = set()
+        for conocido in conocidos:
+            telefonos |= claves_telefonos(conocido.get("telefono"))
+            if conocido.get("email"):
+                emails.add(conocido["email"].lower())
+
+        if claves_telefonos(registro.get("telefono")) - telefonos:
+            return True
+        email = (registro.get("email") or "").lower()
+        if email and email not in emails:
+            return True
+        return bool(registro.get("direccion")) and not any(c.get("direccion") for c in conocidos)
+
+
+def urls_por_dominio(urls: Iterable[str], limite: int) -> List[str]:
+    """
+    Canonicaliza URLs de directorios y deja una por dominio.
+
+    Las primeras tienen prioridad, así que la URL de la ciudad gana a la
+    general del mismo directorio y el hueco lo ocupa otro directorio.
+
+    Args:
+        urls: URLs candidatas por orden de preferencia
+        limite: Máximo de URLs a devolver
+
+    Returns:
+        Como mucho `limite` URLs canónicas de dominios distintos
+    """
+    elegidas = []
+    dominios = set()
+    for url in urls:
+        url = canonicalizar_url(url)
+        dominio = extraer_dominio(url)
+        if dominio and dominio not in dominios:
+            dominios.add(dominio)
+            elegidas.append(url)
+        if len(elegidas) >= limite:
+            break
+    return elegidas
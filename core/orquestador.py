@@ -5,19 +5,54 @@ Coordina búsquedas paralelas, selección de APIs y pipeline completo.
 import asyncio
 import json
 import os
-from dataclasses import dataclass, field
+import sys
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Cargar variables de entorno ANTES de importar adapters
-from dotenv import load_dotenv
-load_dotenv()
+from adapters import REGISTRO_ADAPTERS, RegistroAdapters, SearchAdapter, SearchResult
+from core.checkpoint import (
+    CheckpointBusqueda, clave_tarea, podar_ejecuciones, ETAPA_CONSOLIDACION, ETAPA_COMPLETADA
+)
+from core.consolidador import Consolidador, ConsolidacionResult
+from core.deduplicador_global import ESTADO_PATH, DeduplicadorGlobal, guardar_vista
+from core.filtro_urls import FiltroURLs, urls_por_dominio
+from core.pipeline import CAPACIDAD_COLA, PipelineConsolidacion
+from core.planificador import PlanificadorConsultas
+from core.saturacion import DetectorSaturacion
+from utils.database import bloquear_archivo, cargar_archivo, cargar_config_agentes, ruta_bloqueo
+from utils.cache_consultas import configurar_cache
+from utils.http import configurar_http
+from utils.limitador import configurar_limitadores
+from utils.presupuesto import configurar_presupuesto
+from utils.trazas import (
+    METRICAS_PROMETHEUS, TRAZAS_JSONL, Traza, activar, desactivar,
+    exportar_jsonl, exportar_prometheus, span, tamano_payload,
+)
+from prompts.busqueda import PROMPTS_BUSQUEDA, URLS_DIRECTORIOS, get_grupos_prompts
+
+
+MAX_CIUDADES_PARALELO = 3  # ciudades a la vez en ejecutar_multiciudad(paralelo=True)
 
-# Soporte para Streamlit Cloud secrets
-def _cargar_streamlit_secrets():
-    """Carga secrets de Streamlit Cloud si están disponibles."""
+SECRETS_STREAMLIT = [Path(".streamlit/secrets.toml"), Path.home() / ".streamlit/secrets.toml"]
+
+
+def _cargar_entorno():
+    """
+    Carga .env y, si los hay, los secrets de Streamlit Cloud en os.environ.
+
+    Se llama al crear el Orquestador (no al importar el módulo) y antes de
+    registrar los adapters, que miran las credenciales. Streamlit solo se
+    importa si ya está cargado (dentro de la app) o existe un secrets.toml.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    if "streamlit" not in sys.modules and not any(p.exists() for p in SECRETS_STREAMLIT):
+        return
     try:
         import streamlit as st
         if hasattr(st, 'secrets'):
@@ -28,15 +63,16 @@ def _cargar_streamlit_secrets():
     except:
         pass  # No estamos en Streamlit
 
-_cargar_streamlit_secrets()
 
-from adapters import (
-    SearchAdapter, SearchResult,
-    FirecrawlAdapter, GoogleSearchAdapter, GooglePlacesAdapter,
-    TavilyAdapter, OpenAIAdapter
-)
-from core.consolidador import Consolidador, ConsolidacionResult
-from prompts.busqueda import PROMPTS_BUSQUEDA, URLS_DIRECTORIOS, get_prompts_ciudad
+
+def _completar_config(config: Dict, defaults: Dict) -> Dict:
+    """Añade a config (recursivamente) las claves de defaults que le faltan."""
+    for clave, valor in defaults.items():
+        if clave not in config:
+            config[clave] = valor
+        elif isinstance(config[clave], dict) and isinstance(valor, dict):
+            _completar_config(config[clave], valor)
+    return config
 
 
 @dataclass
@@ -48,6 +84,7 @@ class BusquedaConfig:
     max_resultados_por_api: int = 20
     usar_places: bool = True
     scraping_profundo: bool = True
+    modo_async: bool = False  # APIs, Places y directorios a la vez (asyncio)
 
 
 @dataclass
@@ -58,8 +95,37 @@ class ResultadoBusqueda:
     resultados_por_api: Dict[str, int] = field(default_factory=dict)
     total_encontrados: int = 0
     consolidacion: Optional[ConsolidacionResult] = None
+    descartados_prefiltro: Dict[str, int] = field(default_factory=dict)  # razón -> cantidad
     errores: List[str] = field(default_factory=list)
     duracion_segundos: float = 0
+    run_id: Optional[str] = None  # checkpoint en data/ejecuciones/<run_id>
+    motivo_parada: Optional[str] = None  # si la búsqueda se cortó por saturación de la ciudad
+    apis_saturadas: Dict[str, str] = field(default_factory=dict)  # origen -> motivo de su parada
+    tiempos_por_etapa: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # Traza.resumen()
+    trazas: List[Dict[str, Any]] = field(default_factory=list)  # spans (utils.trazas)
+
+
+@dataclass
+class EjecucionCiudad:
+    """
+    Estado de una búsqueda en curso. Cada llamada a ejecutar_busqueda tiene
+    el suyo, así que varias ciudades pueden buscar a la vez con el mismo
+    Orquestador sin pisarse el consolidador ni el checkpoint.
+    """
+    config: BusquedaConfig
+    resultado: ResultadoBusqueda
+    consolidador: Consolidador
+    filtro: FiltroURLs
+    consolidacion: ConsolidacionResult
+    saturacion: DetectorSaturacion
+    checkpoint: Optional[CheckpointBusqueda] = None
+    traza: Optional[Traza] = None
+    pipeline: Optional[PipelineConsolidacion] = None  # consumidor que llama a _consolidar_tarea
+    recursos: ExitStack = field(default_factory=ExitStack)  # <ciudad>.json.lock, traza, consumidor
+    
+    def liberar(self):
+        """Para el consumidor, suelta el bloqueo de la ciudad y desactiva la traza."""
+        self.recursos.close()
 
 
 class Orquestador:
@@ -85,18 +151,43 @@ class Orquestador:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
+        # Credenciales ANTES de registrar los adapters
+        _cargar_entorno()
+        
         # Cargar configuración
         self.config = self._cargar_config(config_path)
+        configurar_limitadores(self.config)
+        configurar_cache(self.config)
+        configurar_presupuesto(self.config)
+        configurar_http(self.config)
         
-        # Inicializar adapters
-        self.adapters: Dict[str, SearchAdapter] = {}
+        # Adapters (se construyen al usarlos por primera vez)
+        self.adapters: RegistroAdapters
         self._inicializar_adapters()
         
-        # Consolidador (se inicializa por ciudad)
-        self.consolidador: Optional[Consolidador] = None
+        # Deduplicación entre ciudades (se crea en la primera multiciudad)
+        self.deduplicador: Optional[DeduplicadorGlobal] = None
+        
+        # Checkpoints de cada ejecución (--resume RUN_ID)
+        self.dir_ejecuciones = self.data_dir / "ejecuciones"
+        
+        # Rendimiento de cada prompt por ciudad y API (qué consultas lanzar).
+        # En un subdirectorio: todo data/*.json se lista como ciudad
+        historial = self.data_dir / "planificador" / "rendimiento_consultas.json"
+        antiguo = self.data_dir / historial.name
+        if antiguo.exists() and not historial.exists():
+            historial.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(antiguo, historial)
+        self.planificador = PlanificadorConsultas(historial, self.config.get("busqueda", {}))
     
     def _cargar_config(self, config_path: str) -> Dict:
-        """Carga configuración desde archivo o usa defaults."""
+        """
+        Carga la configuración sobre los defaults.
+        
+        Sin config_path se usa data/config_agentes.json, la misma que leen
+        los limitadores, la caché, el presupuesto y las sesiones HTTP cuando
+        nadie los configura: así sus valores por API no se pierden.
+        """
         default_config = {
             "apis": {
                 "firecrawl": {"habilitado": True, "prioridad": 1},
@@ -112,56 +203,31 @@ class Orquestador:
             }
         }
         
-        if config_path and Path(config_path).exists():
+        config = {}
+        if not config_path:
+            config = cargar_config_agentes()
+        elif Path(config_path).exists():
             try:
                 with open(config_path, "r", encoding="utf-8") as f:
                     config = json.load(f)
-                # Merge con defaults
-                for key in default_config:
-                    if key not in config:
-                        config[key] = default_config[key]
-                return config
             except Exception as e:
                 print(f"[Orquestador] Error cargando config: {e}")
         
-        return default_config
+        return _completar_config(config, default_config)
     
     def _inicializar_adapters(self):
-        """Inicializa todos los adapters disponibles."""
-        # Firecrawl
-        if self.config["apis"].get("firecrawl", {}).get("habilitado", True):
-            adapter = FirecrawlAdapter()
-            if adapter.esta_disponible():
-                self.adapters["firecrawl"] = adapter
-                print("[Orquestador] OK Firecrawl disponible")
-        
-        # Google Search
-        if self.config["apis"].get("google_search", {}).get("habilitado", True):
-            adapter = GoogleSearchAdapter()
-            if adapter.esta_disponible():
-                self.adapters["google_search"] = adapter
-                print("[Orquestador] OK Google Search disponible")
-        
-        # Google Places
-        if self.config["apis"].get("google_places", {}).get("habilitado", True):
-            adapter = GooglePlacesAdapter()
-            if adapter.esta_disponible():
-                self.adapters["google_places"] = adapter
-                print("[Orquestador] OK Google Places disponible")
-        
-        # Tavily
-        if self.config["apis"].get("tavily", {}).get("habilitado", True):
-            adapter = TavilyAdapter()
-            if adapter.esta_disponible():
-                self.adapters["tavily"] = adapter
-                print("[Orquestador] OK Tavily disponible")
-        
-        # OpenAI
-        if self.config["apis"].get("openai", {}).get("habilitado", True):
-            adapter = OpenAIAdapter()
-            if adapter.esta_disponible():
-                self.adapters["openai"] = adapter
-                print("[Orquestador] OK OpenAI disponible")
+        """
+        Registra las APIs habilitadas que tienen credenciales y SDK. El
+        adapter de cada una (y su SDK) se importa y construye la primera
+        vez que una búsqueda lo usa (adapters/registro.py).
+        """
+        habilitadas = [
+            api for api in REGISTRO_ADAPTERS
+            if self.config["apis"].get(api, {}).get("habilitado", True)
+        ]
+        self.adapters = RegistroAdapters(habilitadas)
+        for api in self.adapters:
+            print(f"[Orquestador] OK {api} disponible")
         
         if not self.adapters:
             print("[Orquestador] ⚠ No hay APIs configuradas")
@@ -170,133 +236,489 @@ class Orquestador:
         """Devuelve lista de APIs disponibles."""
         return list(self.adapters.keys())
     
-    def ejecutar_busqueda(self, config: BusquedaConfig) -> ResultadoBusqueda:
+    def ejecutar_busqueda(
+        self,
+        config: BusquedaConfig,
+        checkpoint: Optional[CheckpointBusqueda] = None
+    ) -> ResultadoBusqueda:
         """
         Ejecuta búsqueda completa para una ciudad.
         
         Args:
             config: Configuración de la búsqueda
+            checkpoint: Ejecución a continuar (ver reanudar); si no se
+                indica se crea una nueva en data/ejecuciones
             
         Returns:
             ResultadoBusqueda con estadísticas
         """
-        inicio = datetime.now()
-        resultado = ResultadoBusqueda(
-            ciudad=config.ciudad,
-            fecha=inicio.isoformat()
-        )
+        if config.modo_async:
+            return asyncio.run(self.ejecutar_busqueda_async(config, checkpoint))
         
-        # Inicializar consolidador para esta ciudad
-        db_path = self.data_dir / f"{config.ciudad.lower()}.json"
-        self.consolidador = Consolidador(str(db_path))
-        
-        todos_resultados: List[SearchResult] = []
+        inicio = datetime.now()
+        ejecucion = self._iniciar_busqueda(config, inicio, checkpoint)
+        resultado, checkpoint = ejecucion.resultado, ejecucion.checkpoint
+        saturacion = ejecucion.saturacion
         
         try:
-            # Paso 1: Búsqueda con APIs de búsqueda
-            print(f"\n[Orquestador] === Buscando en {config.ciudad} ===")
+            grupos = self._grupos_prompts(config.ciudad)
             
-            # Obtener prompts para la ciudad
-            prompts = get_prompts_ciudad(config.ciudad)
-            if not prompts:
-                prompts = [f"abogado extranjería {config.ciudad} contacto teléfono"]
-            
-            # Búsqueda paralela con diferentes APIs
-            for api_nombre in config.apis_habilitadas:
-                if api_nombre not in self.adapters:
+            # Paso 1: Búsqueda con APIs de búsqueda, las más rentables primero.
+            # Cada consulta pasa al consolidador (core/pipeline.py) en cuanto
+            # vuelve, que la procesa mientras sale la siguiente
+            for api_nombre in self._plan(checkpoint, "apis", self._apis_busqueda(config, grupos)):
+                if saturacion.parar():
+                    break
+                adapter = self.adapters.get(api_nombre)
+                if adapter is None:
                     continue
+                consultas = self._plan(
+                    checkpoint, f"consultas|{api_nombre}",
+                    self.planificador.planificar(config.ciudad, api_nombre, grupos)
+                )
+                print(f"\n[{api_nombre}] Ejecutando {len(consultas)} búsquedas...")
                 
-                adapter = self.adapters[api_nombre]
-                print(f"\n[{api_nombre}] Ejecutando búsquedas...")
-                
-                resultados_api = self._buscar_con_adapter(
+                encontrados = self._buscar_con_adapter(
+                    ejecucion,
                     adapter, 
-                    prompts[:5],  # Limitar prompts por API
+                    consultas,
                     config.max_resultados_por_api
                 )
                 
-                resultado.resultados_por_api[api_nombre] = len(resultados_api)
-                todos_resultados.extend(resultados_api)
-                print(f"[{api_nombre}] Encontrados: {len(resultados_api)}")
+                resultado.resultados_por_api[api_nombre] = encontrados
+                print(f"[{api_nombre}] Encontrados: {encontrados}")
             
             # Paso 2: Google Places si está habilitado
-            if config.usar_places and "google_places" in self.adapters:
+            places_adapter = self.adapters.get("google_places") if config.usar_places else None
+            if places_adapter and not saturacion.parar("google_places"):
                 print("\n[google_places] Buscando negocios locales...")
-                places_adapter = self.adapters["google_places"]
                 
-                resultados_places = places_adapter.search(
-                    f"abogado extranjería {config.ciudad}"
+                consulta = f"abogado extranjería {config.ciudad}"
+                resultados_places = self._tarea(
+                    checkpoint, clave_tarea("google_places", consulta),
+                    places_adapter.search, consulta
                 )
                 resultado.resultados_por_api["google_places"] = len(resultados_places)
-                todos_resultados.extend(resultados_places)
                 print(f"[google_places] Encontrados: {len(resultados_places)}")
+                ejecucion.pipeline.publicar("google_places", consulta, resultados_places)
             
             # Paso 3: Scraping profundo con Firecrawl
-            if config.scraping_profundo and "firecrawl" in self.adapters:
+            firecrawl = self.adapters.get("firecrawl") if config.scraping_profundo else None
+            if firecrawl and not saturacion.parar("directorio"):
                 print("\n[firecrawl] Scraping de directorios...")
-                firecrawl = self.adapters["firecrawl"]
-                
-                # URLs de directorios para la ciudad
-                urls = URLS_DIRECTORIOS.get(config.ciudad.lower(), [])
-                urls.extend(URLS_DIRECTORIOS.get("generales", [])[:2])
                 
-                for url in urls[:3]:  # Limitar scraping
+                for url in self._plan(checkpoint, "directorios", self._urls_directorios(config.ciudad)):
+                    if saturacion.parar("directorio"):
+                        break
                     try:
-                        resultados_scrape = firecrawl.extract_structured([url])
-                        todos_resultados.extend(resultados_scrape)
+                        resultados_scrape = self._tarea(
+                            checkpoint, clave_tarea("directorio", url),
+                            firecrawl.extract_structured, [url]
+                        )
                     except Exception as e:
                         resultado.errores.append(f"Error scraping {url}: {e}")
+                        continue
+                    ejecucion.pipeline.publicar("directorio", url, resultados_scrape)
             
-            # Paso 4: Consolidación con filtrado automático
-            print(f"\n[Consolidador] Procesando {len(todos_resultados)} resultados con filtros...")
+            # Paso 4: Esperar a que se consolide lo pendiente y guardar
+            ejecucion.pipeline.cerrar()
+            self._marcar_etapa(checkpoint, ETAPA_CONSOLIDACION)
+            self._finalizar_busqueda(ejecucion)
+            self._marcar_etapa(checkpoint, ETAPA_COMPLETADA)
             
-            # Convertir SearchResult a dict
-            registros = [
-                r.to_dict() if isinstance(r, SearchResult) else r 
-                for r in todos_resultados
-            ]
+        except Exception as e:
+            resultado.errores.append(f"Error general: {e}")
+            print(f"[Orquestador] Error: {e}")
+        finally:
+            ejecucion.liberar()
+        
+        self._cerrar_busqueda(ejecucion, inicio)
+        return resultado
+    
+    async def ejecutar_busqueda_async(
+        self,
+        config: BusquedaConfig,
+        checkpoint: Optional[CheckpointBusqueda] = None
+    ) -> ResultadoBusqueda:
+        """
+        Variante asíncrona de ejecutar_busqueda.
+        
+        Lanza a la vez cada par (API, prompt), la búsqueda de Places y los
+        scrapings de directorios. Cada adapter admite como mucho
+        busqueda.max_paralelo llamadas simultáneas, y los resultados se
+        consolidan según llegan, así que una ciudad tarda aproximadamente
+        lo que la API más lenta.
+        
+        Args:
+            config: Configuración de la búsqueda
+            checkpoint: Ejecución a continuar (como en ejecutar_busqueda)
+            
+        Returns:
+            ResultadoBusqueda con estadísticas
+        """
+        inicio = datetime.now()
+        ejecucion = self._iniciar_busqueda(config, inicio, checkpoint)
+        resultado, checkpoint = ejecucion.resultado, ejecucion.checkpoint
+        max_paralelo = self.config.get("busqueda", {}).get("max_paralelo", 3)
+        semaforos = {nombre: asyncio.Semaphore(max_paralelo) for nombre in self.adapters}
+        saturacion = ejecucion.saturacion
+        
+        try:
+            grupos = self._grupos_prompts(config.ciudad)
+            tareas = []
+            
+            # Búsquedas: un par (API, prompt) por tarea
+            for api_nombre in self._plan(checkpoint, "apis", self._apis_busqueda(config, grupos)):
+                adapter = self.adapters.get(api_nombre)
+                if adapter is None:
+                    continue
+                resultado.resultados_por_api[api_nombre] = 0
+                
+                def hay_cupo(api_nombre=api_nombre, adapter=adapter) -> bool:
+                    if saturacion.parar(api_nombre):
+                        return False
+                    if not adapter.dentro_de_limite():
+                        print(f"  [{api_nombre}] Límite alcanzado")
+                        return False
+                    return resultado.resultados_por_api[api_nombre] < config.max_resultados_por_api
+                
+                consultas = self._plan(
+                    checkpoint, f"consultas|{api_nombre}",
+                    self.planificador.planificar(config.ciudad, api_nombre, grupos)
+                )
+                for prompt in consultas:
+                    tareas.append(self._llamar_async(
+                        api_nombre, prompt, semaforos[api_nombre], self._tarea,
+                        checkpoint, clave_tarea(api_nombre, prompt), adapter.search,
+                        prompt, max_results=10, puede_empezar=hay_cupo
+                    ))
+            
+            # Google Places
+            places_adapter = self.adapters.get("google_places") if config.usar_places else None
+            if places_adapter:
+                resultado.resultados_por_api["google_places"] = 0
+                consulta = f"abogado extranjería {config.ciudad}"
+                tareas.append(self._llamar_async(
+                    "google_places", consulta, semaforos["google_places"], self._tarea,
+                    checkpoint, clave_tarea("google_places", consulta),
+                    places_adapter.search, consulta,
+                    puede_empezar=lambda: not saturacion.parar("google_places")
+                ))
             
-            # Procesar batch con filtrado verbose
-            consolidacion = self.consolidador.procesar_batch(registros, verbose=True)
-            resultado.consolidacion = consolidacion
-            resultado.total_encontrados = len(todos_resultados)
+            # Scraping de directorios (comparte el límite de Firecrawl)
+            firecrawl = self.adapters.get("firecrawl") if config.scraping_profundo else None
+            if firecrawl:
+                for url in self._plan(checkpoint, "directorios", self._urls_directorios(config.ciudad)):
+                    tareas.append(self._llamar_async(
+                        "directorio", url, semaforos["firecrawl"], self._tarea,
+                        checkpoint, clave_tarea("directorio", url),
+                        firecrawl.extract_structured, [url],
+                        puede_empezar=lambda: not saturacion.parar("directorio")
+                    ))
             
-            # Guardar
-            self.consolidador.guardar()
+            print(f"\n[Orquestador] {len(tareas)} llamadas en paralelo "
+                  f"(máx. {max_paralelo} por API)")
             
-            # Estadísticas
-            stats = self.consolidador.estadisticas()
-            print(f"\n[Resultado] Ciudad: {config.ciudad}")
-            print(f"  - Total en BD: {stats['total']}")
-            print(f"  - Nuevos agregados: {consolidacion.total_nuevos}")
-            print(f"  - Actualizados: {len(consolidacion.actualizados)}")
-            print(f"  - Duplicados: {len(consolidacion.duplicados_ignorados)}")
-            print(f"  - Filtrados (rechazados): {len(consolidacion.filtrados)}")
+            # Pasar cada respuesta al consolidador en cuanto llega
+            for siguiente in asyncio.as_completed(tareas):
+                origen, consulta, nuevos, error = await siguiente
+                
+                if nuevos is None:  # no llegó a lanzarse
+                    continue
+                if error:
+                    if origen == "directorio":
+                        resultado.errores.append(f"Error scraping {consulta}: {error}")
+                    else:
+                        print(f"  [{origen}] Error en búsqueda: {error}")
+                    continue
+                
+                if origen in config.apis_habilitadas:
+                    restantes = config.max_resultados_por_api - resultado.resultados_por_api[origen]
+                    nuevos = nuevos[:max(restantes, 0)]
+                if origen in resultado.resultados_por_api:
+                    resultado.resultados_por_api[origen] += len(nuevos)
+                
+                # Si la cola está llena se espera sin bloquear el bucle
+                await asyncio.to_thread(ejecucion.pipeline.publicar, origen, consulta, nuevos)
             
-            # Mostrar razones de filtrado si hay
-            if consolidacion.razones_filtrado:
-                print(f"\n[Filtrado] Razones:")
-                for razon, count in sorted(consolidacion.razones_filtrado.items(), key=lambda x: -x[1])[:5]:
-                    print(f"  - {razon}: {count}")
+            for api_nombre, total in resultado.resultados_por_api.items():
+                print(f"[{api_nombre}] Encontrados: {total}")
+            
+            await asyncio.to_thread(ejecucion.pipeline.cerrar)
+            self._marcar_etapa(checkpoint, ETAPA_CONSOLIDACION)
+            self._finalizar_busqueda(ejecucion)
+            self._marcar_etapa(checkpoint, ETAPA_COMPLETADA)
             
         except Exception as e:
             resultado.errores.append(f"Error general: {e}")
             print(f"[Orquestador] Error: {e}")
+        finally:
+            ejecucion.liberar()
         
-        resultado.duracion_segundos = (datetime.now() - inicio).total_seconds()
+        self._cerrar_busqueda(ejecucion, inicio)
         return resultado
     
+    async def _llamar_async(
+        self,
+        origen: str,
+        consulta: str,
+        semaforo: asyncio.Semaphore,
+        funcion: Callable[..., List[SearchResult]],
+        *args,
+        puede_empezar: Optional[Callable[[], bool]] = None,
+        **kwargs
+    ) -> Tuple[str, str, Optional[List[SearchResult]], Optional[Exception]]:
+        """
+        Ejecuta una llamada bloqueante de un adapter en un hilo.
+        
+        Returns:
+            (origen, consulta, resultados, error); resultados es None si
+            puede_empezar() dijo que no. Nunca lanza para no cortar el resto
+        """
+        async with semaforo:
+            if puede_empezar and not puede_empezar():
+                return origen, consulta, None, None
+            try:
+                return origen, consulta, await asyncio.to_thread(funcion, *args, **kwargs), None
+            except Exception as e:
+                return origen, consulta, [], e
+    
+    def _iniciar_busqueda(
+        self,
+        config: BusquedaConfig,
+        inicio: datetime,
+        checkpoint: Optional[CheckpointBusqueda]
+    ) -> EjecucionCiudad:
+        """
+        Bloquea el archivo de la ciudad, activa la traza y prepara su
+        consolidador, el checkpoint y el resultado vacío. El bloqueo
+        (<ciudad>.json.lock) se mantiene hasta EjecucionCiudad.liberar():
+        otra búsqueda de la misma ciudad, en otro hilo o proceso, espera a
+        que esta guarde.
+        """
+        busqueda = self.config.get("busqueda", {})
+        if checkpoint is None and busqueda.get("checkpoints", True):
+            podar_ejecuciones(
+                self.dir_ejecuciones,
+                busqueda.get("retencion_ejecuciones_dias", 7),
+                busqueda.get("retencion_ejecuciones_pendientes_dias", 30),
+            )
+            checkpoint = CheckpointBusqueda.crear(self.dir_ejecuciones, asdict(config))
+        
+        print(f"\n[Orquestador] === Buscando en {config.ciudad} ===")
+        resultado = ResultadoBusqueda(ciudad=config.ciudad, fecha=inicio.isoformat())
+        if checkpoint:
+            resultado.run_id = checkpoint.run_id
+            print(f"[Orquestador] Ejecución {checkpoint.run_id} "
+                  f"(si se corta: --resume {checkpoint.run_id})")
+        
+        traza = Traza(config.ciudad, resultado.run_id)
+        db_path = self.data_dir / f"{config.ciudad.lower()}.json"
+        usar_journal = self.config.get("consolidacion", {}).get("journal", True)
+        recursos = ExitStack()
+        try:
+            recursos.callback(desactivar, activar(traza))
+            recursos.enter_context(bloquear_archivo(ruta_bloqueo(db_path)))
+            consolidador = Consolidador(str(db_path), journal=usar_journal)
+        except BaseException:
+            recursos.close()
+            raise
+        
+        filtro = FiltroURLs(consolidador)
+        resultado.descartados_prefiltro = filtro.descartados
+        ejecucion = EjecucionCiudad(
+            config=config,
+            resultado=resultado,
+            consolidador=consolidador,
+            filtro=filtro,
+            consolidacion=ConsolidacionResult(solo_resumen=True),
+            saturacion=DetectorSaturacion(config.ciudad, self.config.get("busqueda", {})),
+            checkpoint=checkpoint,
+            traza=traza,
+            recursos=recursos,
+        )
+        
+        # Un único hilo filtra y consolida lo que publican las llamadas
+        capacidad = self.config.get("busqueda", {}).get("cola_consolidacion", CAPACIDAD_COLA)
+        ejecucion.pipeline = PipelineConsolidacion(
+            lambda *lote: self._consolidar_tarea(ejecucion, *lote), capacidad
+        )
+        ejecucion.pipeline.iniciar()
+        recursos.callback(ejecucion.pipeline.cerrar, propagar=False)
+        return ejecucion
+    
+    def _tarea(
+        self,
+        checkpoint: Optional[CheckpointBusqueda],
+        clave: str,
+        funcion: Callable[..., List[SearchResult]],
+        *args,
+        **kwargs
+    ) -> List[SearchResult]:
+        """
+        Resultados de una tarea de búsqueda: los del checkpoint si ya se hizo
+        en esta ejecución; si no, llama a la API (span "search" o
+        "extract_structured" con la API) y los guarda en el checkpoint.
+        """
+        if checkpoint and checkpoint.completada(clave):
+            return checkpoint.resultados(clave)
+        
+        api = getattr(getattr(funcion, "__self__", None), "nombre", None)
+        consulta = str(args[0] if args else "")[:120]
+        with span(funcion.__name__, api=api, consulta=consulta) as datos:
+            resultados = funcion(*args, **kwargs)
+            datos["resultados"] = len(resultados)
+            datos["bytes"] = tamano_payload(resultados)
+        if checkpoint:
+            checkpoint.registrar(clave, resultados)
+        return resultados
+    
+    def _plan(self, checkpoint: Optional[CheckpointBusqueda], clave: str, planificado: List[str]) -> List[str]:
+        """Lo planificado ahora, o lo que planificó la ejecución que se reanuda."""
+        return checkpoint.plan(clave, planificado) if checkpoint else planificado
+    
+    def _marcar_etapa(self, checkpoint: Optional[CheckpointBusqueda], etapa: str):
+        if checkpoint:
+            checkpoint.marcar_etapa(etapa)
+    
+    def _grupos_prompts(self, ciudad: str) -> Dict[str, List[str]]:
+        """Prompts de búsqueda de la ciudad por grupo, con uno genérico por defecto."""
+        return get_grupos_prompts(ciudad) or {
+            ciudad.lower(): [f"abogado extranjería {ciudad} contacto teléfono"]
+        }
+    
+    def _apis_busqueda(self, config: BusquedaConfig, grupos: Dict[str, List[str]]) -> List[str]:
+        """APIs de búsqueda habilitadas y disponibles, de más a menos nuevos por dólar."""
+        apis = [api for api in config.apis_habilitadas if api in self.adapters]
+        return self.planificador.ordenar_apis(config.ciudad, apis, grupos)
+    
+    def _urls_directorios(self, ciudad: str) -> List[str]:
+        """
+        URLs de directorios a scrapear: primero las de la ciudad, después
+        las generales, una por directorio para no pagar dos extracciones
+        del mismo sitio.
+        """
+        urls = URLS_DIRECTORIOS.get(ciudad.lower(), []) + URLS_DIRECTORIOS.get("generales", [])
+        return urls_por_dominio(urls, limite=3)  # Limitar scraping
+    
+    def _consolidar(
+        self,
+        ejecucion: EjecucionCiudad,
+        resultados: Iterable
+    ) -> int:
+        """
+        Consolida resultados acumulando contadores en ejecucion.consolidacion.
+        
+        Returns:
+            Registros nuevos agregados a la ciudad
+        """
+        # Convertir SearchResult a dict según se consumen
+        registros = (
+            r.to_dict() if isinstance(r, SearchResult) else r 
+            for r in resultados
+        )
+        
+        # Consolidar en streaming con filtrado verbose; el resultado solo
+        # guarda contadores e índices, no copias de cada registro
+        consolidacion = ejecucion.consolidacion
+        antes = consolidacion.total_nuevos
+        for _ in ejecucion.consolidador.procesar_stream(registros, consolidacion, verbose=True):
+            pass
+        return consolidacion.total_nuevos - antes
+    
+    def _consolidar_tarea(
+        self,
+        ejecucion: EjecucionCiudad,
+        origen: str,
+        consulta: str,
+        resultados: List[SearchResult]
+    ):
+        """
+        Filtra y consolida los resultados de una tarea y anota su rendimiento
+        en el planificador y en el detector de saturación. Las tareas que
+        se cargan del checkpoint al reanudar no se anotan otra vez. Corre en
+        el hilo consumidor del pipeline de la ejecución.
+        """
+        ejecucion.resultado.total_encontrados += len(resultados)
+        filtro = ejecucion.filtro
+        dominios = filtro.dominios_nuevos
+        with span("filtro", origen=origen, entrada=len(resultados)) as datos:
+            candidatos = list(filtro.filtrar(resultados))
+            datos["salida"] = len(candidatos)
+        with span("consolidar", origen=origen, entrada=len(candidatos)) as datos:
+            nuevos = self._consolidar(ejecucion, candidatos)
+            datos["nuevos"] = nuevos
+        dominios = filtro.dominios_nuevos - dominios
+        checkpoint = ejecucion.checkpoint
+        if checkpoint and checkpoint.reanudada(clave_tarea(origen, consulta)):
+            return
+        if origen in self.adapters:  # los directorios no se planifican
+            self.planificador.registrar(ejecucion.config.ciudad, origen, consulta, nuevos, dominios)
+        ejecucion.saturacion.registrar(origen, len(resultados), dominios)
+    
+    def _finalizar_busqueda(self, ejecucion: EjecucionCiudad):
+        """Guarda la ciudad y muestra el resumen de la consolidación."""
+        resultado, consolidacion = ejecucion.resultado, ejecucion.consolidacion
+        resultado.consolidacion = consolidacion
+        with span("guardar", registros=len(ejecucion.consolidador.registros)):
+            ejecucion.consolidador.guardar()
+        self.planificador.guardar()
+        
+        # Estadísticas
+        stats = ejecucion.consolidador.estadisticas()
+        print(f"\n[Resultado] Ciudad: {ejecucion.config.ciudad}")
+        print(f"  - Total en BD: {stats['total']}")
+        print(f"  - Descartados antes de consolidar: {sum(resultado.descartados_prefiltro.values())}")
+        print(f"  - Nuevos agregados: {consolidacion.total_nuevos}")
+        print(f"  - Actualizados: {len(consolidacion.actualizados)}")
+        print(f"  - Duplicados: {len(consolidacion.duplicados_ignorados)}")
+        print(f"  - Filtrados (rechazados): {len(consolidacion.filtrados)}")
+        
+        # Mostrar razones de filtrado si hay
+        if consolidacion.razones_filtrado:
+            print(f"\n[Filtrado] Razones:")
+            for razon, count in sorted(consolidacion.razones_filtrado.items(), key=lambda x: -x[1])[:5]:
+                print(f"  - {razon}: {count}")
+    
+    def _cerrar_busqueda(self, ejecucion: EjecucionCiudad, inicio: datetime):
+        """Anota la duración y los tiempos por etapa y exporta la traza."""
+        resultado, traza = ejecucion.resultado, ejecucion.traza
+        resultado.duracion_segundos = (datetime.now() - inicio).total_seconds()
+        resultado.motivo_parada = ejecucion.saturacion.motivo_ciudad
+        resultado.apis_saturadas = dict(ejecucion.saturacion.motivos)
+        resultado.trazas = traza.spans
+        resultado.tiempos_por_etapa = traza.resumen()
+        
+        if not self.config.get("trazas", {}).get("habilitadas", True):
+            return
+        try:
+            exportar_jsonl(traza, self.data_dir / TRAZAS_JSONL)
+            exportar_prometheus(traza, self.data_dir / METRICAS_PROMETHEUS, resultado.duracion_segundos)
+        except OSError as e:
+            print(f"[Orquestador] Error exportando trazas: {e}")
+    
     def _buscar_con_adapter(
         self, 
+        ejecucion: EjecucionCiudad,
         adapter: SearchAdapter, 
         prompts: List[str],
         max_total: int
-    ) -> List[SearchResult]:
-        """Ejecuta múltiples búsquedas con un adapter."""
-        resultados = []
+    ) -> int:
+        """
+        Ejecuta múltiples búsquedas con un adapter y pasa cada una al
+        consolidador al recibirla. Para antes si el adapter satura
+        (core/saturacion.py).
+        
+        Returns:
+            Resultados recibidos, max_total como mucho entre todas
+        """
+        total = 0
         
         for prompt in prompts:
-            if len(resultados) >= max_total:
+            if total >= max_total:
+                break
+            
+            if ejecucion.saturacion.parar(adapter.nombre):
                 break
             
             if not adapter.dentro_de_limite():
@@ -304,24 +726,61 @@ class Orquestador:
                 break
             
             try:
-                res = adapter.search(prompt, max_results=10)
-                resultados.extend(res)
+                res = self._tarea(
+                    ejecucion.checkpoint, clave_tarea(adapter.nombre, prompt),
+                    adapter.search, prompt, max_results=10
+                )[:max_total - total]
             except Exception as e:
                 print(f"  [{adapter.nombre}] Error en búsqueda: {e}")
+                continue
+            total += len(res)
+            ejecucion.pipeline.publicar(adapter.nombre, prompt, res)
+        
+        return total
+    
+    def reanudar(self, run_id: str) -> ResultadoBusqueda:
+        """
+        Continúa una ejecución cortada a partir de su checkpoint.
+        
+        Las tareas ya terminadas no se vuelven a pagar: se cargan del
+        checkpoint y solo se lanzan las que faltan antes de consolidar.
+        
+        Args:
+            run_id: Identificador de la ejecución (data/ejecuciones/<run_id>)
+            
+        Returns:
+            ResultadoBusqueda de la ejecución
+        """
+        checkpoint = CheckpointBusqueda.abrir(self.dir_ejecuciones, run_id)
+        config = BusquedaConfig(**checkpoint.config)
+        
+        if checkpoint.etapa == ETAPA_COMPLETADA:
+            print(f"[Orquestador] La ejecución {run_id} ya está completada")
+            return ResultadoBusqueda(ciudad=config.ciudad, fecha=datetime.now().isoformat(), run_id=run_id)
         
-        return resultados[:max_total]
+        print(f"[Orquestador] Reanudando {run_id} desde la etapa '{checkpoint.etapa}'")
+        return self.ejecutar_busqueda(config, checkpoint)
     
     def ejecutar_multiciudad(
         self, 
         ciudades: List[str],
-        paralelo: bool = False
+        paralelo: bool = False,
+        modo_async: bool = False,
+        max_ciudades: Optional[int] = None
     ) -> Dict[str, ResultadoBusqueda]:
         """
         Ejecuta búsqueda en múltiples ciudades.
         
+        En paralelo, cada ciudad usa su propio consolidador y checkpoint
+        (EjecucionCiudad); lo compartido entre hilos (adapters, limitadores,
+        presupuesto, planificador) está protegido con locks.
+        
         Args:
             ciudades: Lista de ciudades
             paralelo: Si ejecutar en paralelo
+            modo_async: Si cada ciudad lanza sus llamadas con asyncio
+            max_ciudades: Ciudades a la vez en paralelo (por defecto
+                busqueda.max_ciudades_paralelo)
             
         Returns:
             Dict de ciudad -> ResultadoBusqueda
@@ -329,11 +788,17 @@ class Orquestador:
         resultados = {}
         
         if paralelo:
-            with ThreadPoolExecutor(max_workers=3) as executor:
+            if max_ciudades is None:
+                max_ciudades = self.config.get("busqueda", {}).get(
+                    "max_ciudades_paralelo", MAX_CIUDADES_PARALELO
+                )
+            max_ciudades = max(1, min(max_ciudades, len(ciudades) or 1))
+            print(f"[Orquestador] {len(ciudades)} ciudades, {max_ciudades} a la vez")
+            with ThreadPoolExecutor(max_workers=max_ciudades) as executor:
                 futures = {
                     executor.submit(
                         self.ejecutar_busqueda,
-                        BusquedaConfig(ciudad=ciudad)
+                        BusquedaConfig(ciudad=ciudad, modo_async=modo_async)
                     ): ciudad
                     for ciudad in ciudades
                 }
@@ -346,11 +811,48 @@ class Orquestador:
                         print(f"Error en {ciudad}: {e}")
         else:
             for ciudad in ciudades:
-                config = BusquedaConfig(ciudad=ciudad)
+                config = BusquedaConfig(ciudad=ciudad, modo_async=modo_async)
                 resultados[ciudad] = self.ejecutar_busqueda(config)
         
+        if self.config.get("consolidacion", {}).get("vista_global", True):
+            self.actualizar_vista_global(list(resultados))
+        
         return resultados
     
+    def actualizar_vista_global(self, ciudades: List[str]):
+        """
+        Actualiza data/registros_optimizados.json tras buscar en varias ciudades.
+        
+        La primera vez parte del estado guardado en data/dedup_global.jsonz
+        (o de cero) y relee todas las ciudades; después solo reprocesa los
+        registros que han cambiado en las ciudades indicadas.
+        
+        Args:
+            ciudades: Ciudades cuyos archivos se han modificado
+        """
+        try:
+            if self.deduplicador is None:
+                self.deduplicador = DeduplicadorGlobal.desde_directorio(
+                    self.data_dir, estado=self.data_dir / ESTADO_PATH
+                )
+            else:
+                for ciudad in ciudades:
+                    archivo = self.data_dir / f"{ciudad.lower()}.json"
+                    if archivo.exists():
+                        data = cargar_archivo(archivo)
+                        self.deduplicador.actualizar_ciudad(
+                            archivo.stem.title(), data.get("registros", []), archivo.name
+                        )
+            
+            registros = self.deduplicador.vista_unificada()
+            stats = self.deduplicador.estadisticas()
+            guardar_vista(self.data_dir / "registros_optimizados.json", registros, stats)
+            self.deduplicador.guardar_estado(self.data_dir / ESTADO_PATH)
+            print(f"[Orquestador] Vista global: {stats['total_optimizado']} despachos "
+                  f"({stats['registros_con_multiple_ciudad']} en varias ciudades)")
+        except Exception as e:
+            print(f"[Orquestador] Error actualizando vista global: {e}")
+    
     def generar_reporte(self, resultados: Dict[str, ResultadoBusqueda]) -> str:
         """Genera reporte de texto de los resultados."""
         lineas = [
@@ -369,6 +871,9 @@ class Orquestador:
             lineas.append("-" * 40)
             lineas.append(f"  Encontrados: {res.total_encontrados}")
             
+            if res.descartados_prefiltro:
+                lineas.append(f"  Descartados (filtro URLs): {sum(res.descartados_prefiltro.values())}")
+            
             if res.consolidacion:
                 lineas.append(f"  Nuevos: {res.consolidacion.total_nuevos}")
                 lineas.append(f"  Actualizados: {len(res.consolidacion.actualizados)}")
@@ -377,6 +882,17 @@ class Orquestador:
             
             lineas.append(f"  Duración: {res.duracion_segundos:.1f}s")
             
+            if res.motivo_parada:
+                lineas.append(f"  Parada anticipada: {res.motivo_parada}")
+            elif res.apis_saturadas:
+                lineas.append(f"  Saturadas: {', '.join(res.apis_saturadas)}")
+            
+            if res.tiempos_por_etapa:
+                lineas.append("  Tiempo por etapa:")
+                for etapa, tiempos in list(res.tiempos_por_etapa.items())[:5]:
+                    lineas.append(f"    - {etapa}: {tiempos['segundos']:.1f}s "
+                                  f"({tiempos['llamadas']} llamadas, máx. {tiempos['max_segundos']:.1f}s)")
+            
             if res.resultados_por_api:
                 lineas.append("  Por API:")
                 for api, count in res.resultados_por_api.items():
@@ -411,6 +927,12 @@ def main():
     parser.add_argument("--ciudades", "-m", nargs="+", help="Múltiples ciudades")
     parser.add_argument("--config", help="Ruta al archivo de configuración")
     parser.add_argument("--paralelo", "-p", action="store_true", help="Ejecutar en paralelo")
+    parser.add_argument("--max-ciudades", type=int, metavar="N",
+                        help="Ciudades a la vez con --paralelo (busqueda.max_ciudades_paralelo)")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Reanudar una ejecución cortada (data/ejecuciones/RUN_ID)")
+    parser.add_argument("--async", "-a", dest="modo_async", action="store_true",
+                        help="Lanzar todas las llamadas de cada ciudad a la vez")
     
     args = parser.parse_args()
     
@@ -422,12 +944,18 @@ def main():
     print("=" * 60)
     print(f"APIs disponibles: {', '.join(orquestador.apis_disponibles())}")
     
-    if args.ciudades:
+    if args.resume:
+        # Continuar una ejecución cortada
+        resultado = orquestador.reanudar(args.resume)
+        resultados = {resultado.ciudad: resultado}
+    elif args.ciudades:
         # Múltiples ciudades
-        resultados = orquestador.ejecutar_multiciudad(args.ciudades, args.paralelo)
+        resultados = orquestador.ejecutar_multiciudad(
+            args.ciudades, args.paralelo, args.modo_async, args.max_ciudades
+        )
     else:
         # Una ciudad
-        config = BusquedaConfig(ciudad=args.ciudad)
+        config = BusquedaConfig(ciudad=args.ciudad, modo_async=args.modo_async)
         resultados = {args.ciudad: orquestador.ejecutar_busqueda(config)}
     
     # Mostrar reporte
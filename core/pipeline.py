@@ -0,0 +1,100 @@
+"""
+Pipeline productor/consumidor entre las APIs y la consolidación.
+
+Las llamadas a las APIs (productores) dejan los resultados de cada tarea en
+una cola acotada en cuanto vuelven, y un único hilo consumidor los filtra,
+deduplica y fusiona mientras siguen en vuelo las siguientes llamadas. Así
+el tiempo de CPU de la consolidación queda oculto tras la latencia de red,
+y como mucho hay `capacidad` lotes esperando a consolidarse: si el
+consumidor se queda atrás, los productores esperan.
+
+Solo hay un consumidor, así que el consolidador, el filtro de URLs y el
+detector de saturación de la ciudad nunca se tocan desde dos hilos.
+
+Uso:
+    with PipelineConsolidacion(consumir) as pipeline:
+        pipeline.publicar(origen, consulta, resultados)
+    # al salir del with ya está todo consolidado
+"""
+import contextvars
+import queue
+import threading
+from typing import Any, Callable, List, Optional
+
+
+CAPACIDAD_COLA = 8  # lotes (resultados de una tarea) esperando a consolidarse
+
+_FIN = object()
+
+
+class PipelineConsolidacion:
+    """Cola acotada de lotes (origen, consulta, resultados) con un hilo consumidor."""
+
+    def __init__(self, consumir: Callable[[str, str, List[Any]], None], capacidad: int = CAPACIDAD_COLA):
+        """
+        Args:
+            consumir: Función que consolida un lote; corre en el hilo consumidor
+            capacidad: Lotes en cola como mucho antes de frenar a los productores
+        """
+        self._consumir = consumir
+        self._cola: "queue.Queue" = queue.Queue(maxsize=max(1, capacidad))
+        self._hilo: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        self.lotes = 0
+
+    def __enter__(self) -> "PipelineConsolidacion":
+        self.iniciar()
+        return self
+
+    def __exit__(self, tipo, valor, traza) -> bool:
+        # Con una excepción en los productores no se tapa con la del consumidor
+        self.cerrar(propagar=tipo is None)
+        return False
+
+    def iniciar(self):
+        """Arranca el consumidor en el contexto actual (traza activa incluida)."""
+        contexto = contextvars.copy_context()
+        self._hilo = threading.Thread(
+            target=contexto.run, args=(self._bucle,), name="consolidacion", daemon=True
+        )
+        self._hilo.start()
+
+    def publicar(self, origen: str, consulta: str, resultados: List[Any]):
+        """
+        Encola los resultados de una tarea. Espera si la cola está llena.
+
+        Raises:
+            La excepción del consumidor, si ha fallado (no tiene sentido
+            seguir pagando llamadas que no se van a consolidar)
+        """
+        if self.error is not None:
+            raise self.error
+        self._cola.put((origen, consulta, resultados))
+
+    def cerrar(self, propagar: bool = True):
+        """
+        Espera a que se consolide todo lo publicado y para el consumidor.
+
+        Args:
+            propagar: Relanzar la excepción del consumidor si la hubo
+        """
+        if self._hilo is None:
+            return
+        self._cola.put(_FIN)
+        self._hilo.join()
+        self._hilo = None
+        if propagar and self.error is not None:
+            raise self.error
+
+    def _bucle(self):
+        while True:
+            lote = self._cola.get()
+            if lote is _FIN:
+                return
+            if self.error is not None:
+                continue  # vaciar la cola para no dejar productores esperando
+            try:
+                self._consumir(*lote)
+                self.lotes += 1
+            except BaseException as e:
+                self.error = e
@@ -0,0 +1,245 @@
+"""
+Planificador de consultas guiado por rendimiento.
+
+Aprende, por ciudad y API, cuántos registros nuevos aporta cada prompt de
+PROMPTS_BUSQUEDA y decide qué consultas lanzar en la siguiente ejecución:
+
+- Los prompts se ordenan por rendimiento esperado (nuevos por consulta).
+  Los que nunca se han lanzado heredan la media de su grupo (clave de
+  PROMPTS_BUSQUEDA), y los de grupos sin historial parten de un valor
+  optimista, así que se exploran antes que los ya agotados. A igualdad de
+  rendimiento van antes los prompts menos lanzados y se alternan los grupos.
+- Las APIs se ordenan por nuevos esperados por dólar (COSTOS_API).
+- Si las últimas consultas de una API en una ciudad no han aportado nada,
+  la ciudad está saturada para esa API y solo se lanza una consulta de
+  sondeo.
+
+El historial se guarda en data/planificador/rendimiento_consultas.json:
+
+    {"ciudades": {"madrid": {"tavily": {
+        "recientes": [2, 0, 0],
+        "ultima": "2026-...",
+        "prompts": {"<prompt>": {"grupo": "madrid_centro", "consultas": 3,
+                                 "nuevos": 5, "dominios": 4, "costo": 0.003,
+                                 "media": 1.2, "ultima": "2026-..."}}}}}}
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from utils.api_tracker import costo_consulta
+
+
+RENDIMIENTO_INICIAL = 3.0  # nuevos/consulta supuestos para un grupo sin historial
+ALFA = 0.5                 # peso de la última consulta en la media móvil
+VENTANA_SATURACION = 6     # consultas seguidas sin nuevos para dar una API por saturada
+DIAS_REEXPLORAR = 30       # pasado este tiempo el historial de un prompt deja de penalizarlo
+
+
+class PlanificadorConsultas:
+    """Elige qué prompts lanzar por API según el rendimiento de ejecuciones anteriores."""
+
+    def __init__(self, path: Union[str, Path], config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            path: Archivo JSON con el historial de rendimiento
+            config: Sección "busqueda" de la configuración
+                (max_queries_por_api, ventana_saturacion)
+        """
+        config = config or {}
+        self.path = Path(path)
+        self.max_consultas = config.get("max_queries_por_api", 5)
+        self.ventana_saturacion = config.get("ventana_saturacion", VENTANA_SATURACION)
+        self.datos = self._cargar()
+        self._grupo_prompt: Dict[str, str] = {}
+        self._lock = threading.Lock()  # varias ciudades en paralelo
+
+    def _cargar(self) -> Dict[str, Any]:
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[Planificador] Error cargando historial: {e}")
+        return {"ciudades": {}}
+
+    def guardar(self):
+        """
+        Escribe el historial (archivo temporal + os.replace). El lock cubre
+        también la escritura: dos ciudades que terminan a la vez no
+        comparten el archivo temporal.
+        """
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.datos, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+
+    def _stats_api(self, ciudad: str, api: str) -> Dict[str, Any]:
+        ciudades = self.datos.setdefault("ciudades", {})
+        return ciudades.setdefault(ciudad.lower(), {}).setdefault(api, {"recientes": [], "prompts": {}})
+
+    def planificar(
+        self,
+        ciudad: str,
+        api: str,
+        grupos: Dict[str, List[str]],
+        limite: Optional[int] = None
+    ) -> List[str]:
+        """
+        Prompts a lanzar con una API, de mayor a menor rendimiento esperado.
+
+        Args:
+            ciudad: Ciudad de la búsqueda
+            api: Nombre del adapter
+            grupos: Prompts de la ciudad por clave de PROMPTS_BUSQUEDA
+            limite: Máximo de consultas (por defecto busqueda.max_queries_por_api)
+
+        Returns:
+            Lista de prompts (uno solo si la API está saturada en la ciudad)
+        """
+        limite = self.max_consultas if limite is None else limite
+        if self.saturada(ciudad, api):
+            print(f"[Planificador] {ciudad}/{api}: sin nuevos en las últimas "
+                  f"{self.ventana_saturacion} consultas, solo una de sondeo")
+            limite = min(limite, 1)
+        return self._ordenar_prompts(ciudad, api, grupos)[:limite]
+
+    def ordenar_apis(self, ciudad: str, apis: List[str], grupos: Dict[str, List[str]]) -> List[str]:
+        """
+        APIs de más a menos nuevos esperados por dólar.
+
+        El rendimiento de cada API es la media esperada de las consultas que
+        se le planificarían. Las APIs sin costo conocido van primero; a
+        igualdad se respeta el orden recibido.
+        """
+        def por_dolar(api: str) -> float:
+            consultas = self._ordenar_prompts(ciudad, api, grupos)[:self.max_consultas]
+            if not consultas:
+                return 0.0
+            with self._lock:
+                stats = self._stats_api(ciudad, api)
+                esperado = sum(
+                    self._esperado(stats, p, self._grupo_prompt.get(p)) for p in consultas
+                ) / len(consultas)
+            costo = costo_consulta(api)
+            return esperado / costo if costo else float("inf")
+
+        return sorted(apis, key=lambda api: -por_dolar(api))
+
+    def _ordenar_prompts(self, ciudad: str, api: str, grupos: Dict[str, List[str]]) -> List[str]:
+        """
+        Todos los prompts de mayor a menor rendimiento esperado. A igualdad
+        van antes los menos lanzados y se alternan los grupos.
+        """
+        with self._lock:
+            stats = self._stats_api(ciudad, api)
+            candidatos = {}
+            for orden_grupo, (grupo, prompts) in enumerate(grupos.items()):
+                for posicion, prompt in enumerate(prompts):
+                    if prompt not in candidatos:
+                        self._grupo_prompt[prompt] = grupo
+                        consultas = stats["prompts"].get(prompt, {}).get("consultas", 0)
+                        candidatos[prompt] = (
+                            -self._esperado(stats, prompt, grupo), consultas, posicion, orden_grupo
+                        )
+        return sorted(candidatos, key=candidatos.get)
+
+    def registrar(self, ciudad: str, api: str, consulta: str, nuevos: int, dominios: int = 0):
+        """
+        Anota el rendimiento de una consulta ya consolidada.
+
+        Args:
+            ciudad: Ciudad de la búsqueda
+            api: Nombre del adapter
+            consulta: Prompt lanzado
+            nuevos: Registros nuevos que ha aportado a la ciudad
+            dominios: Dominios nuevos que ha aportado
+        """
+        ahora = datetime.now().isoformat()
+        with self._lock:
+            stats = self._stats_api(ciudad, api)
+            prompt = stats["prompts"].setdefault(consulta, {
+                "grupo": self._grupo_prompt.get(consulta),
+                "consultas": 0, "nuevos": 0, "dominios": 0, "costo": 0.0, "media": float(nuevos),
+            })
+            if prompt["consultas"]:
+                prompt["media"] = (1 - ALFA) * prompt["media"] + ALFA * nuevos
+            prompt["consultas"] += 1
+            prompt["nuevos"] += nuevos
+            prompt["dominios"] += dominios
+            prompt["costo"] = round(prompt["costo"] + costo_consulta(api), 6)
+            prompt["ultima"] = ahora
+
+            stats["recientes"] = (stats["recientes"] + [nuevos])[-self.ventana_saturacion:]
+            stats["ultima"] = ahora
+
+    def saturada(self, ciudad: str, api: str) -> bool:
+        """True si las últimas consultas de la API en la ciudad no aportaron nada."""
+        with self._lock:
+            return self._saturada(self._stats_api(ciudad, api))
+
+    def resumen(self, ciudad: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Rendimiento acumulado por API en una ciudad.
+
+        Returns:
+            Dict api -> {consultas, nuevos, dominios, costo,
+            nuevos_por_consulta, nuevos_por_usd, saturada}
+        """
+        resumen = {}
+        with self._lock:
+            for api, stats in self.datos.get("ciudades", {}).get(ciudad.lower(), {}).items():
+                prompts = stats["prompts"].values()
+                consultas = sum(p["consultas"] for p in prompts)
+                nuevos = sum(p["nuevos"] for p in prompts)
+                costo = sum(p["costo"] for p in prompts)
+                resumen[api] = {
+                    "consultas": consultas,
+                    "nuevos": nuevos,
+                    "dominios": sum(p["dominios"] for p in prompts),
+                    "costo": round(costo, 4),
+                    "nuevos_por_consulta": round(nuevos / consultas, 2) if consultas else None,
+                    "nuevos_por_usd": round(nuevos / costo, 1) if costo else None,
+                    "saturada": self._saturada(stats),
+                }
+        return resumen
+
+    def _esperado(self, stats: Dict[str, Any], prompt: str, grupo: Optional[str]) -> float:
+        """Nuevos por consulta esperados, suavizados hacia la media del grupo."""
+        base = self._media_grupo(stats, grupo)
+        prompt_stats = stats["prompts"].get(prompt)
+        if not prompt_stats or _caducado(prompt_stats.get("ultima")):
+            return base
+        n = prompt_stats["consultas"]
+        return (prompt_stats["media"] * n + base) / (n + 1)
+
+    @staticmethod
+    def _media_grupo(stats: Dict[str, Any], grupo: Optional[str]) -> float:
+        medias = [
+            p["media"] for p in stats["prompts"].values()
+            if p.get("grupo") == grupo and not _caducado(p.get("ultima"))
+        ]
+        return sum(medias) / len(medias) if medias else RENDIMIENTO_INICIAL
+
+    def _saturada(self, stats: Dict[str, Any]) -> bool:
+        recientes = stats["recientes"]
+        return (
+            len(recientes) >= self.ventana_saturacion
+            and not any(recientes)
+            and not _caducado(stats.get("ultima"))
+        )
+
+
+def _caducado(fecha: Optional[str]) -> bool:
+    """True si la fecha ISO es anterior a DIAS_REEXPLORAR días."""
+    if not fecha:
+        return False
+    try:
+        return datetime.now() - datetime.fromisoformat(fecha) > timedelta(days=DIAS_REEXPLORAR)
+    except ValueError:
+        return False
@@ -0,0 +1,109 @@
+"""
+Parada anticipada de una búsqueda cuando la ciudad está saturada.
+
+Tras consolidar cada consulta, el orquestador anota cuántos resultados
+devolvió y cuántos dominios nuevos aportó (FiltroURLs.dominios_nuevos: ni
+estaban en la base de la ciudad ni habían salido antes en la búsqueda).
+Sobre las últimas consultas se calcula la proporción de dominios nuevos:
+
+- Por API (o "directorio", "google_places"): si en sus últimas
+  busqueda.ventana_dominios consultas la proporción queda por debajo de
+  busqueda.umbral_dominios_nuevos, no se le lanzan más consultas.
+- Por ciudad: lo mismo sobre las últimas busqueda.ventana_dominios_ciudad
+  consultas de cualquier origen; entonces se corta toda la búsqueda
+  (APIs que faltan, Places y directorios) y se consolida lo ya recibido.
+
+El motivo de cada parada queda en ResultadoBusqueda.motivo_parada y
+ResultadoBusqueda.apis_saturadas. Se desactiva con
+busqueda.parada_anticipada: false.
+
+Complementa a PlanificadorConsultas, que entre ejecuciones reduce a una
+consulta de sondeo las APIs que no aportaron nada la última vez.
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+UMBRAL_DOMINIOS_NUEVOS = 0.1  # proporción mínima de dominios nuevos por resultado
+VENTANA_CONSULTAS = 3         # consultas de una API que se miran
+VENTANA_CONSULTAS_CIUDAD = 6  # consultas de la ciudad (cualquier origen) que se miran
+
+
+class DetectorSaturacion:
+    """Proporción de dominios nuevos en las últimas consultas, por API y por ciudad."""
+
+    def __init__(self, ciudad: str, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            ciudad: Ciudad de la búsqueda (solo para los mensajes)
+            config: Sección "busqueda" de la configuración (parada_anticipada,
+                umbral_dominios_nuevos, ventana_dominios, ventana_dominios_ciudad)
+        """
+        config = config or {}
+        self.ciudad = ciudad
+        self.habilitado = config.get("parada_anticipada", True)
+        self.umbral = config.get("umbral_dominios_nuevos", UMBRAL_DOMINIOS_NUEVOS)
+        self.ventana = max(1, config.get("ventana_dominios", VENTANA_CONSULTAS))
+        self.ventana_ciudad = max(1, config.get("ventana_dominios_ciudad", VENTANA_CONSULTAS_CIUDAD))
+
+        # (resultados, dominios nuevos) de cada consulta reciente
+        self._por_origen: Dict[str, Deque[Tuple[int, int]]] = {}
+        self._ciudad: Deque[Tuple[int, int]] = deque(maxlen=self.ventana_ciudad)
+
+        self.motivos: Dict[str, str] = {}  # origen -> motivo de su parada
+        self.motivo_ciudad: Optional[str] = None
+        # Registra el consumidor del pipeline; consultan los productores
+        self._lock = threading.Lock()
+
+    def registrar(self, origen: str, resultados: int, dominios_nuevos: int):
+        """
+        Anota una consulta ya filtrada y comprueba si su origen o la ciudad
+        se han saturado.
+
+        Args:
+            origen: API, "google_places" o "directorio"
+            resultados: Resultados que devolvió la consulta
+            dominios_nuevos: Dominios nuevos que aportó
+        """
+        if not self.habilitado:
+            return
+
+        with self._lock:
+            self._registrar(origen, resultados, dominios_nuevos)
+
+    def _registrar(self, origen: str, resultados: int, dominios_nuevos: int):
+        ventana = self._por_origen.setdefault(origen, deque(maxlen=self.ventana))
+        ventana.append((resultados, dominios_nuevos))
+        self._ciudad.append((resultados, dominios_nuevos))
+
+        if origen not in self.motivos:
+            motivo = self._motivo(ventana)
+            if motivo:
+                self.motivos[origen] = motivo
+                print(f"[Saturación] {self.ciudad}/{origen}: {motivo}, sin más consultas")
+
+        if self.motivo_ciudad is None:
+            motivo = self._motivo(self._ciudad)
+            if motivo:
+                self.motivo_ciudad = f"ciudad saturada: {motivo}"
+                print(f"[Saturación] {self.ciudad}: {motivo}, se corta la búsqueda")
+
+    def parar(self, origen: Optional[str] = None) -> bool:
+        """True si no hay que lanzar más consultas del origen (o de ninguno)."""
+        if not self.habilitado:
+            return False
+        with self._lock:
+            return self.motivo_ciudad is not None or (origen is not None and origen in self.motivos)
+
+    def _motivo(self, ventana: Deque[Tuple[int, int]]) -> Optional[str]:
+        """Descripción de la saturación si la ventana está llena y no llega al umbral."""
+        if len(ventana) < ventana.maxlen:
+            return None
+        resultados = sum(r for r, _ in ventana)
+        nuevos = sum(n for _, n in ventana)
+        proporcion = nuevos / resultados if resultados else 0.0
+        if proporcion >= self.umbral:
+            return None
+        return (f"{nuevos} dominios nuevos en {resultados} resultados de las últimas "
+                f"{len(ventana)} consultas ({proporcion:.0%} < {self.umbral:.0%})")
@@ -7,6 +7,8 @@ import json
 from pathlib import Path
 from datetime import datetime
 
+from utils.database import cargar_archivo
+
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 
 st.title("📊 Dashboard")
@@ -26,8 +28,7 @@ def cargar_todos_registros():
             continue
         
         try:
-            with open(archivo, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = cargar_archivo(archivo)
             
             for r in data.get("registros", []):
                 r["_ciudad"] = archivo.stem.title()
@@ -3,10 +3,16 @@ Página de búsqueda con múltiples APIs.
 """
 import streamlit as st
 import os
+import sys
 import json
+import subprocess
+import time
+from dataclasses import asdict
 from pathlib import Path
 from datetime import datetime
 
+from core.cola_trabajos import ColaTrabajos, leer_log, PENDIENTE, EJECUTANDO, COMPLETADO, ERROR
+
 st.set_page_config(page_title="Buscar", page_icon="🔍", layout="wide")
 
 st.title("🔍 Nueva Búsqueda")
@@ -27,11 +33,9 @@ def verificar_apis():
     }
 
 
-# Estado de sesión
-if "busqueda_resultados" not in st.session_state:
-    st.session_state.busqueda_resultados = []
-if "busqueda_ejecutando" not in st.session_state:
-    st.session_state.busqueda_ejecutando = False
+# Las búsquedas se ejecutan en el trabajador (scripts/trabajador.py);
+# la página solo encola y consulta la cola
+cola = ColaTrabajos()
 
 # Sidebar - Configuración
 with st.sidebar:
@@ -66,7 +70,7 @@ with st.sidebar:
         scraping_profundo = st.checkbox("Scraping profundo", value=True)
 
 # Contenido principal
-tab1, tab2, tab3 = st.tabs(["🎯 Búsqueda Rápida", "🔧 Búsqueda Manual", "📜 Historial"])
+tab1, tab_trabajos, tab2, tab3 = st.tabs(["🎯 Búsqueda Rápida", "📋 Trabajos", "🔧 Búsqueda Manual", "📜 Historial"])
 
 with tab1:
     st.subheader("Búsqueda Automática")
@@ -91,100 +95,90 @@ with tab1:
         if not apis_seleccionadas:
             st.error("Selecciona al menos una API")
         else:
-            st.session_state.busqueda_ejecutando = True
+            try:
+                # Importar orquestador
+                from core.orquestador import BusquedaConfig
+                
+                # Crear configuración
+                config = BusquedaConfig(
+                    ciudad=ciudad,
+                    zonas=zonas if zonas else [],
+                    apis_habilitadas=apis_seleccionadas,
+                    max_resultados_por_api=max_resultados,
+                    usar_places=usar_places,
+                    scraping_profundo=scraping_profundo
+                )
+                
+                # Encolar: la ejecuta el trabajador, no esta página
+                trabajo_id = cola.encolar(asdict(config))
+                st.success(f"Búsqueda en {ciudad} encolada (trabajo #{trabajo_id}). "
+                           "Sigue su progreso en la pestaña Trabajos.")
+                
+            except ImportError as e:
+                st.error(f"Error importando módulos: {e}")
+                st.info("Asegúrate de tener todas las dependencias instaladas.")
+            except Exception as e:
+                st.error(f"Error encolando búsqueda: {e}")
+
+with tab_trabajos:
+    st.subheader("Cola de Búsquedas")
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        activos = cola.trabajadores_activos()
+        if activos:
+            st.caption(f"✅ {activos} trabajador(es) activo(s)")
+        else:
+            st.warning("No hay ningún trabajador activo: las búsquedas encoladas esperarán.")
+    with col2:
+        if not activos and st.button("▶️ Iniciar trabajador"):
+            # Proceso independiente: sigue aunque se cierre el navegador
+            raiz = Path(__file__).parent.parent
+            subprocess.Popen(
+                [sys.executable, str(raiz / "scripts" / "trabajador.py")],
+                cwd=raiz,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            time.sleep(1)
+            st.rerun()
+    with col3:
+        auto_refrescar = st.checkbox("Actualizar cada 3 s", value=True)
+    
+    trabajos = cola.listar(30)
+    if not trabajos:
+        st.info("No hay trabajos. Encola una búsqueda desde la pestaña Búsqueda Rápida.")
+    
+    iconos = {PENDIENTE: "⏳", EJECUTANDO: "🔄", COMPLETADO: "✅", ERROR: "❌"}
+    for t in trabajos:
+        icono = iconos.get(t["estado"], "🚫")
+        with st.expander(f"{icono} #{t['id']} {t['ciudad']} - {t['estado']}", expanded=t["estado"] == EJECUTANDO):
+            if t["progreso"]:
+                st.caption(t["progreso"])
             
-            with st.spinner(f"Buscando en {ciudad}..."):
-                try:
-                    # Importar orquestador
-                    from core.orquestador import Orquestador, BusquedaConfig
-                    
-                    # Crear configuración
-                    config = BusquedaConfig(
-                        ciudad=ciudad,
-                        zonas=zonas if zonas else [],
-                        apis_habilitadas=apis_seleccionadas,
-                        max_resultados_por_api=max_resultados,
-                        usar_places=usar_places,
-                        scraping_profundo=scraping_profundo
-                    )
-                    
-                    # Ejecutar
-                    orquestador = Orquestador()
-                    resultado = orquestador.ejecutar_busqueda(config)
-                    
-                    # Mostrar resultados
-                    st.success(f"Búsqueda completada en {resultado.duracion_segundos:.1f}s")
-                    
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Encontrados", resultado.total_encontrados)
-                    with col2:
-                        if resultado.consolidacion:
-                            st.metric("Nuevos", resultado.consolidacion.total_nuevos)
-                    with col3:
-                        if resultado.consolidacion:
-                            st.metric("Duplicados", len(resultado.consolidacion.duplicados_ignorados))
-                    
-                    # Detalle por API
-                    if resultado.resultados_por_api:
-                        st.subheader("Por API")
-                        for api, count in resultado.resultados_por_api.items():
-                            st.write(f"- {api}: {count} resultados")
-                    
-                    # Errores
-                    if resultado.errores:
-                        with st.expander("⚠️ Errores"):
-                            for error in resultado.errores:
-                                st.warning(error)
-                    
-                    # Guardar en historial
-                    historial_path = Path("data/historial_busquedas.json")
-                    historial_path.parent.mkdir(exist_ok=True)
-                    
-                    # Cargar historial existente
-                    if historial_path.exists():
-                        try:
-                            with open(historial_path, "r", encoding="utf-8") as f:
-                                historial = json.load(f)
-                        except:
-                            historial = []
-                    else:
-                        historial = []
-                    
-                    # Agregar nueva búsqueda
-                    entrada_historial = {
-                        "fecha": resultado.fecha,
-                        "ciudad": ciudad,
-                        "zonas": zonas,
-                        "apis_usadas": apis_seleccionadas,
-                        "total_encontrados": resultado.total_encontrados,
-                        "nuevos": resultado.consolidacion.total_nuevos if resultado.consolidacion else 0,
-                        "actualizados": len(resultado.consolidacion.actualizados) if resultado.consolidacion else 0,
-                        "duplicados": len(resultado.consolidacion.duplicados_ignorados) if resultado.consolidacion else 0,
-                        "filtrados": len(resultado.consolidacion.filtrados) if resultado.consolidacion else 0,
-                        "duracion_segundos": round(resultado.duracion_segundos, 2),
-                        "resultados_por_api": resultado.resultados_por_api,
-                        "max_resultados_por_api": max_resultados,
-                        "usar_places": usar_places,
-                        "scraping_profundo": scraping_profundo
-                    }
-                    
-                    historial.append(entrada_historial)
-                    
-                    # Mantener solo las últimas 100 búsquedas
-                    historial = historial[-100:]
-                    
-                    # Guardar
-                    with open(historial_path, "w", encoding="utf-8") as f:
-                        json.dump(historial, f, ensure_ascii=False, indent=2)
-                                
-                except ImportError as e:
-                    st.error(f"Error importando módulos: {e}")
-                    st.info("Asegúrate de tener todas las dependencias instaladas.")
-                except Exception as e:
-                    st.error(f"Error en búsqueda: {e}")
-                finally:
-                    st.session_state.busqueda_ejecutando = False
+            resumen = t.get("resultado")
+            if resumen:
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Encontrados", resumen["total_encontrados"])
+                col2.metric("Nuevos", resumen["nuevos"])
+                col3.metric("Duplicados", resumen["duplicados"])
+                col4.metric("Duración", f"{resumen['duracion_segundos']:.0f}s")
+                for api, count in resumen.get("resultados_por_api", {}).items():
+                    st.write(f"- {api}: {count} resultados")
+                for error in resumen.get("errores", []):
+                    st.warning(error)
+            if t.get("error"):
+                st.error(t["error"])
+            
+            if t["estado"] == PENDIENTE:
+                if st.button("Cancelar", key=f"cancelar_{t['id']}"):
+                    cola.cancelar(t["id"])
+                    st.rerun()
+            elif t["estado"] != "cancelado":
+                log = leer_log(t["id"])
+                if log:
+                    st.code(log, language=None)
 
 with tab2:
     st.subheader("Búsqueda Manual")
@@ -293,3 +287,8 @@ with tab3:
             st.error(f"Error cargando historial: {e}")
     else:
         st.info("No hay búsquedas registradas aún. Ejecuta una búsqueda para comenzar.")
+
+# Sondeo de la cola mientras haya trabajos en marcha
+if auto_refrescar and any(t["estado"] in (PENDIENTE, EJECUTANDO) for t in trabajos):
+    time.sleep(3)
+    st.rerun()
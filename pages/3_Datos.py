@@ -15,6 +15,9 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+from utils.database import ArchivoModificado, cargar_archivo, guardar_archivo
+from utils.telefonos import canonicalizar_telefonos, claves_telefonos, formatear_telefono
+
 st.set_page_config(page_title="Gestión de Datos", page_icon="📊", layout="wide")
 
 st.title("📊 Gestión de Base de Datos")
@@ -25,8 +28,7 @@ def cargar_datos_ciudad(ciudad: str):
     """Carga datos de una ciudad."""
     archivo = Path("data") / f"{ciudad.lower()}.json"
     if archivo.exists():
-        with open(archivo, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return cargar_archivo(archivo)
     return {"metadata": {}, "registros": []}
 
 
@@ -35,8 +37,12 @@ def guardar_datos_ciudad(ciudad: str, data: dict):
     archivo = Path("data") / f"{ciudad.lower()}.json"
     data["metadata"]["fecha_actualizacion"] = datetime.now().isoformat()
     data["metadata"]["total_registros"] = len(data.get("registros", []))
-    with open(archivo, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    try:
+        guardar_archivo(archivo, data)
+    except ArchivoModificado as e:
+        # Una búsqueda u otra pestaña ha escrito la ciudad: no pisar sus cambios
+        st.error(f"No se ha guardado: {e}. Recarga la página y repite el cambio.")
+        st.stop()
 
 
 def listar_ciudades():
@@ -143,16 +149,6 @@ def extraer_dominio(url: str) -> str:
     return url.split("/")[0]
 
 
-def normalizar_telefono(tel: str) -> str:
-    """Normaliza teléfono para comparación."""
-    if not tel:
-        return ""
-    limpio = re.sub(r'[^\d]', '', tel)
-    if len(limpio) >= 9:
-        return limpio[-9:]  # Últimos 9 dígitos
-    return limpio
-
-
 def fusionar_registros(r1: dict, r2: dict) -> dict:
     """Fusiona dos registros, combinando sus datos."""
     fusionado = r1.copy()
@@ -164,13 +160,7 @@ def fusionar_registros(r1: dict, r2: dict) -> dict:
         tels1 = [tels1]
     if isinstance(tels2, str):
         tels2 = [tels2]
-    
-    tels_norm = {}
-    for t in tels1 + tels2:
-        tn = normalizar_telefono(t)
-        if tn and tn not in tels_norm:
-            tels_norm[tn] = t
-    fusionado["telefono"] = list(tels_norm.values())
+    fusionado["telefono"] = canonicalizar_telefonos(tels1 + tels2)
     
     # Combinar especialidades
     esp1 = r1.get("especialidades", [])
@@ -200,17 +190,9 @@ def detectar_grupos(registros: list) -> dict:
                 grupos_web[dominio] = []
             grupos_web[dominio].append(i)
         
-        # Por teléfono
-        tels = r.get("telefono", [])
-        if isinstance(tels, str):
-            tels = [tels]
-        for tel in tels:
-            tel_norm = normalizar_telefono(tel)
-            if tel_norm:
-                if tel_norm not in grupos_tel:
-                    grupos_tel[tel_norm] = []
-                if i not in grupos_tel[tel_norm]:
-                    grupos_tel[tel_norm].append(i)
+        # Por teléfono (clave E.164 entera)
+        for clave in claves_telefonos(r.get("telefono")):
+            grupos_tel.setdefault(clave, []).append(i)
     
     # Solo grupos con más de 1 registro
     grupos_web = {k: v for k, v in grupos_web.items() if len(v) > 1}
@@ -712,8 +694,8 @@ with tab3:
     st.markdown("### 📞 Mismo Teléfono")
     
     if grupos["por_telefono"]:
-        for tel, indices in list(grupos["por_telefono"].items())[:20]:
-            with st.expander(f"**{tel}** ({len(indices)} registros)"):
+        for clave, indices in list(grupos["por_telefono"].items())[:20]:
+            with st.expander(f"**{formatear_telefono(clave)}** ({len(indices)} registros)"):
                 for idx in indices:
                     r = registros[idx]
                     st.write(f"• {r.get('nombre', 'Sin nombre')[:50]} | {r.get('_ciudad')}")
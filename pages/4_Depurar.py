@@ -6,6 +6,9 @@ import json
 from pathlib import Path
 from datetime import datetime
 
+from utils.database import ArchivoModificado, cargar_archivo, guardar_archivo
+from utils.telefonos import canonicalizar_telefonos, clave_telefono
+
 st.set_page_config(page_title="Depurar Datos", page_icon="🔧", layout="wide")
 
 st.title("🔧 Depurar y Enriquecer Datos")
@@ -14,6 +17,7 @@ st.caption("Gestiona duplicados y completa información faltante")
 # Importar consolidador para detección de duplicados
 try:
     from core.consolidador import Consolidador
+    from core.agrupador import GrupoDuplicados
     CONSOLIDADOR_DISPONIBLE = True
 except ImportError:
     CONSOLIDADOR_DISPONIBLE = False
@@ -30,8 +34,7 @@ def cargar_datos_ciudad(ciudad: str):
     """Carga datos de una ciudad."""
     archivo = Path("data") / f"{ciudad.lower()}.json"
     if archivo.exists():
-        with open(archivo, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return cargar_archivo(archivo)
     return {"metadata": {}, "registros": []}
 
 
@@ -39,8 +42,12 @@ def guardar_datos_ciudad(ciudad: str, data: dict):
     """Guarda datos de una ciudad."""
     archivo = Path("data") / f"{ciudad.lower()}.json"
     data["metadata"]["fecha_actualizacion"] = datetime.now().isoformat()
-    with open(archivo, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    try:
+        guardar_archivo(archivo, data)
+    except ArchivoModificado as e:
+        # Una búsqueda u otra pestaña ha escrito la ciudad: no pisar sus cambios
+        st.error(f"No se ha guardado: {e}. Recarga la página y repite el cambio.")
+        st.stop()
 
 
 def listar_ciudades():
@@ -55,205 +62,56 @@ def listar_ciudades():
     return sorted(ciudades)
 
 
-def normalizar_telefono(tel: str) -> str:
-    """Normaliza teléfono para comparación."""
-    if not tel:
-        return ""
-    limpio = "".join(c for c in tel if c.isdigit() or c == "+")
-    if limpio.startswith("34") and not limpio.startswith("+"):
-        limpio = "+" + limpio
-    elif limpio and limpio[0] in "6789":
-        limpio = "+34" + limpio
-    return limpio
-
-
-def calcular_similitud_nombre(n1: str, n2: str) -> float:
-    """Calcula similitud entre nombres."""
-    if not n1 or not n2:
-        return 0.0
-    
-    n1 = n1.lower().strip()
-    n2 = n2.lower().strip()
-    
-    if n1 == n2:
-        return 100.0
-    
-    try:
-        from rapidfuzz import fuzz
-        return max(
-            fuzz.ratio(n1, n2),
-            fuzz.partial_ratio(n1, n2),
-            fuzz.token_sort_ratio(n1, n2)
-        )
-    except ImportError:
-        # Fallback simple
-        palabras1 = set(n1.split())
-        palabras2 = set(n2.split())
-        if not palabras1 or not palabras2:
-            return 0.0
-        comunes = palabras1 & palabras2
-        total = palabras1 | palabras2
-        return (len(comunes) / len(total)) * 100
-
-
-def extraer_dominio(url: str) -> str:
-    """Extrae dominio de URL."""
-    if not url:
-        return ""
-    url = url.lower().replace("https://", "").replace("http://", "").replace("www.", "")
-    return url.split("/")[0]
-
-
-def detectar_posibles_duplicados(registros: list, umbral_nombre: float = 75) -> list:
+def detectar_duplicados(registros: list, umbral_nombre: float = 75):
     """
-    Detecta pares de posibles duplicados.
+    Agrupa posibles duplicados con el motor del consolidador.
     
     Returns:
-        Lista de tuplas: (idx1, idx2, registro1, registro2, razon, similitud)
+        (consolidador, grupos, pares_nombre). grupos son componentes conexas
+        (mismo email, web o teléfono con nombre parecido) con un registro
+        fusionado sugerido; pares_nombre son (i, j, similitud) con nombre
+        igual o parecido fuera de esos grupos, para revisar a mano.
     """
-    duplicados = []
-    n = len(registros)
-    
-    # Índices para búsqueda rápida
-    indice_telefono = {}
-    indice_email = {}
-    indice_dominio = {}
-    
-    for i, r in enumerate(registros):
-        # Teléfonos
-        tels = r.get("telefono", [])
-        if isinstance(tels, str):
-            tels = [tels]
-        for tel in tels:
-            tel_norm = normalizar_telefono(tel)
-            if tel_norm:
-                if tel_norm not in indice_telefono:
-                    indice_telefono[tel_norm] = []
-                indice_telefono[tel_norm].append(i)
-        
-        # Email
-        email = (r.get("email") or "").lower()
-        if email:
-            if email not in indice_email:
-                indice_email[email] = []
-            indice_email[email].append(i)
-        
-        # Dominio web
-        dom = extraer_dominio(r.get("web", ""))
-        if dom:
-            if dom not in indice_dominio:
-                indice_dominio[dom] = []
-            indice_dominio[dom].append(i)
-    
-    pares_vistos = set()
-    
-    # Duplicados por teléfono
-    for tel, indices in indice_telefono.items():
-        if len(indices) > 1:
-            for i in range(len(indices)):
-                for j in range(i + 1, len(indices)):
-                    idx1, idx2 = indices[i], indices[j]
-                    par = tuple(sorted([idx1, idx2]))
-                    if par not in pares_vistos:
-                        pares_vistos.add(par)
-                        duplicados.append((
-                            idx1, idx2,
-                            registros[idx1], registros[idx2],
-                            f"Mismo teléfono: {tel}",
-                            100
-                        ))
-    
-    # Duplicados por email
-    for email, indices in indice_email.items():
-        if len(indices) > 1:
-            for i in range(len(indices)):
-                for j in range(i + 1, len(indices)):
-                    idx1, idx2 = indices[i], indices[j]
-                    par = tuple(sorted([idx1, idx2]))
-                    if par not in pares_vistos:
-                        pares_vistos.add(par)
-                        duplicados.append((
-                            idx1, idx2,
-                            registros[idx1], registros[idx2],
-                            f"Mismo email: {email}",
-                            100
-                        ))
-    
-    # Duplicados por dominio web
-    for dom, indices in indice_dominio.items():
-        if len(indices) > 1:
-            for i in range(len(indices)):
-                for j in range(i + 1, len(indices)):
-                    idx1, idx2 = indices[i], indices[j]
-                    par = tuple(sorted([idx1, idx2]))
-                    if par not in pares_vistos:
-                        pares_vistos.add(par)
-                        duplicados.append((
-                            idx1, idx2,
-                            registros[idx1], registros[idx2],
-                            f"Mismo dominio: {dom}",
-                            95
-                        ))
-    
-    # Duplicados por nombre similar (más lento, limitar)
-    if n < 500:  # Solo para bases pequeñas
-        for i in range(n):
-            for j in range(i + 1, n):
-                par = tuple(sorted([i, j]))
-                if par in pares_vistos:
-                    continue
-                
-                n1 = registros[i].get("nombre", "")
-                n2 = registros[j].get("nombre", "")
-                
-                similitud = calcular_similitud_nombre(n1, n2)
-                if similitud >= umbral_nombre:
-                    pares_vistos.add(par)
-                    duplicados.append((
-                        i, j,
-                        registros[i], registros[j],
-                        f"Nombre similar ({similitud:.0f}%)",
-                        similitud
-                    ))
-    
-    # Ordenar por similitud descendente
-    duplicados.sort(key=lambda x: -x[5])
-    
-    return duplicados
-
-
-def fusionar_registros(r1: dict, r2: dict) -> dict:
-    """Fusiona dos registros, combinando sus datos."""
-    fusionado = r1.copy()
-    
-    # Combinar teléfonos
-    tels1 = r1.get("telefono", [])
-    tels2 = r2.get("telefono", [])
-    if isinstance(tels1, str):
-        tels1 = [tels1]
-    if isinstance(tels2, str):
-        tels2 = [tels2]
-    
-    tels_norm = {}
-    for t in tels1 + tels2:
-        tn = normalizar_telefono(t)
-        if tn and tn not in tels_norm:
-            tels_norm[tn] = t
-    fusionado["telefono"] = list(tels_norm.values())
-    
-    # Combinar especialidades
-    esp1 = r1.get("especialidades", [])
-    esp2 = r2.get("especialidades", [])
-    fusionado["especialidades"] = list(set(esp1 + esp2))
-    
-    # Completar campos vacíos
-    for campo in ["email", "web", "direccion", "ciudad", "distrito", "horario"]:
-        if not r1.get(campo) and r2.get(campo):
-            fusionado[campo] = r2[campo]
-    
-    fusionado["fecha_actualizacion"] = datetime.now().isoformat()
-    
-    return fusionado
+    consolidador = Consolidador()
+    consolidador.cargar_registros(registros)
+    grupos = consolidador.agrupar_duplicados()
+    pares_nombre = consolidador.pares_nombre_similar(umbral_nombre, grupos)
+    return consolidador, grupos, pares_nombre
+
+
+def guardar_fusion(consolidador, mensaje: str):
+    """Guarda la ciudad tras fusionar duplicados y vuelve a analizar."""
+    data["registros"] = consolidador.registros
+    guardar_datos_ciudad(ciudad_sel, data)
+    st.success(mensaje)
+    st.session_state["buscar_duplicados"] = False
+    st.session_state["grupos_descartados"] = set()  # los índices ya no valen
+    st.rerun()
+
+
+def mantener_registro(consolidador, indices: list, conservar: int):
+    """Conserva un registro tal cual y elimina el resto de los indicados (sin fusionar)."""
+    otros = [idx for idx in indices if idx != conservar]
+    consolidador.deduplicar([GrupoDuplicados(
+        indices=[conservar] + otros, sugerido=consolidador.registros[conservar]
+    )])
+    eliminados = ", ".join(chr(ord("A") + indices.index(idx)) for idx in otros)
+    guardar_fusion(consolidador, f"Registro {eliminados} eliminado")
+
+
+def mostrar_resumen_registro(registro: dict):
+    """Nombre y datos de contacto de un registro."""
+    st.write(f"**{registro.get('nombre', 'Sin nombre')}**")
+    
+    tels = registro.get("telefono", [])
+    if tels:
+        st.write(f"Tel: {', '.join(tels) if isinstance(tels, list) else tels}")
+    if registro.get("email"):
+        st.write(f"Email: {registro['email']}")
+    if registro.get("web"):
+        st.write(f"Web: {registro['web'][:40]}...")
+    if registro.get("direccion"):
+        st.caption(f"Dir: {registro['direccion'][:50]}...")
 
 
 def enriquecer_con_firecrawl(registro: dict) -> dict:
@@ -287,14 +145,12 @@ def enriquecer_con_firecrawl(registro: dict) -> dict:
                 # Actualizar registro con datos nuevos (sin sobrescribir existentes)
                 actualizado = registro.copy()
                 
-                # Teléfonos: añadir nuevos
-                tels_existentes = set(normalizar_telefono(t) for t in registro.get("telefono", []))
-                tels_nuevos = datos_nuevos.get("telefono", [])
-                for tel in tels_nuevos:
-                    if normalizar_telefono(tel) not in tels_existentes:
-                        if "telefono" not in actualizado:
-                            actualizado["telefono"] = []
-                        actualizado["telefono"].append(tel)
+                # Teléfonos: añadir nuevos (sin repetidos por clave)
+                tels_nuevos = [t for t in datos_nuevos.get("telefono", []) if clave_telefono(t)]
+                if tels_nuevos:
+                    actualizado["telefono"] = canonicalizar_telefonos(
+                        (registro.get("telefono") or []) + tels_nuevos
+                    )
                 
                 # Campos simples: completar si vacío
                 for campo in ["email", "direccion", "horario"]:
@@ -365,92 +221,100 @@ with tab1:
         if st.button("🔍 Buscar Duplicados", type="primary"):
             st.session_state["buscar_duplicados"] = True
     
-    if st.session_state.get("buscar_duplicados"):
+    if st.session_state.get("buscar_duplicados") and not CONSOLIDADOR_DISPONIBLE:
+        st.error("Consolidador no disponible")
+    elif st.session_state.get("buscar_duplicados"):
         with st.spinner("Analizando registros..."):
-            duplicados = detectar_posibles_duplicados(registros, umbral)
+            consolidador, grupos, pares_nombre = detectar_duplicados(registros, umbral)
         
-        if not duplicados:
+        descartados = st.session_state.setdefault("grupos_descartados", set())
+        grupos = [g for g in grupos if tuple(g.indices) not in descartados]
+        
+        if not grupos and not pares_nombre:
             st.success("No se encontraron duplicados potenciales")
-        else:
-            st.warning(f"Se encontraron {len(duplicados)} pares de posibles duplicados")
+        
+        if grupos:
+            total_sobrantes = sum(len(g.indices) - 1 for g in grupos)
+            st.warning(
+                f"Se encontraron {len(grupos)} grupos de duplicados "
+                f"({total_sobrantes} registros sobrantes)"
+            )
             
-            # Guardar en session_state para persistencia
-            if "duplicados_pendientes" not in st.session_state:
-                st.session_state["duplicados_pendientes"] = duplicados
+            if st.button("🔗 Fusionar todos los grupos", type="primary",
+                         help="Fusiona cada grupo en un registro y guarda una sola vez"):
+                eliminados = consolidador.deduplicar(grupos)
+                guardar_fusion(consolidador, f"{eliminados} registros fusionados")
             
-            # Mostrar cada par
-            for i, (idx1, idx2, r1, r2, razon, similitud) in enumerate(duplicados[:20]):
-                with st.expander(f"Par #{i+1}: {razon}", expanded=(i < 3)):
-                    col1, col2 = st.columns(2)
+            # Mostrar cada grupo
+            for i, grupo in enumerate(grupos[:20]):
+                titulo = f"Grupo #{i+1}: {len(grupo.indices)} registros ({grupo.razon})"
+                with st.expander(titulo, expanded=(i < 3)):
+                    for k, idx in enumerate(grupo.indices):
+                        with st.container(border=True):
+                            st.markdown(f"**Registro {chr(ord('A') + k)}**")
+                            mostrar_resumen_registro(registros[idx])
+                    
+                    st.markdown("**Registro fusionado sugerido**")
+                    mostrar_resumen_registro(grupo.sugerido)
+                    
+                    # Acciones
+                    st.divider()
+                    columnas = st.columns(len(grupo.indices) + 2)
+                    
+                    with columnas[0]:
+                        if st.button("🔗 Fusionar grupo", key=f"fusionar_{i}", help="Combina todos los registros del grupo"):
+                            consolidador.deduplicar([grupo])
+                            guardar_fusion(consolidador, "Registros fusionados")
                     
+                    for k, idx in enumerate(grupo.indices):
+                        letra = chr(ord("A") + k)
+                        with columnas[k + 1]:
+                            if st.button(f"✅ Mantener {letra}", key=f"keep_{i}_{k}",
+                                         help="Elimina los demás registros del grupo"):
+                                mantener_registro(consolidador, grupo.indices, idx)
+                    
+                    with columnas[-1]:
+                        if st.button("⏭️ No son duplicados", key=f"skip_{i}", help="Mantiene todos"):
+                            descartados.add(tuple(grupo.indices))
+                            st.rerun()
+            
+            if len(grupos) > 20:
+                st.info(f"Mostrando 20 de {len(grupos)} grupos. 'Fusionar todos' los incluye todos.")
+        
+        if pares_nombre:
+            st.divider()
+            st.subheader(f"Nombres similares ({len(pares_nombre)} pares)")
+            st.caption("Sin datos de contacto en común (aunque el nombre sea idéntico): revisar antes de fusionar")
+            
+            for i, (idx1, idx2, similitud) in enumerate(pares_nombre[:20]):
+                with st.expander(f"Par #{i+1}: Nombre similar ({similitud:.0f}%)"):
+                    col1, col2 = st.columns(2)
                     with col1:
                         st.markdown("**Registro A**")
-                        st.write(f"**{r1.get('nombre', 'Sin nombre')}**")
-                        
-                        tels = r1.get("telefono", [])
-                        if tels:
-                            st.write(f"Tel: {', '.join(tels) if isinstance(tels, list) else tels}")
-                        if r1.get("email"):
-                            st.write(f"Email: {r1['email']}")
-                        if r1.get("web"):
-                            st.write(f"Web: {r1['web'][:40]}...")
-                        if r1.get("direccion"):
-                            st.caption(f"Dir: {r1['direccion'][:50]}...")
-                    
+                        mostrar_resumen_registro(registros[idx1])
                     with col2:
                         st.markdown("**Registro B**")
-                        st.write(f"**{r2.get('nombre', 'Sin nombre')}**")
-                        
-                        tels = r2.get("telefono", [])
-                        if tels:
-                            st.write(f"Tel: {', '.join(tels) if isinstance(tels, list) else tels}")
-                        if r2.get("email"):
-                            st.write(f"Email: {r2['email']}")
-                        if r2.get("web"):
-                            st.write(f"Web: {r2['web'][:40]}...")
-                        if r2.get("direccion"):
-                            st.caption(f"Dir: {r2['direccion'][:50]}...")
+                        mostrar_resumen_registro(registros[idx2])
                     
-                    # Acciones
                     st.divider()
                     accion_col1, accion_col2, accion_col3, accion_col4 = st.columns(4)
                     
                     with accion_col1:
-                        if st.button("🔗 Fusionar", key=f"fusionar_{i}", help="Combina ambos registros"):
-                            fusionado = fusionar_registros(r1, r2)
-                            # Eliminar el segundo, actualizar el primero
-                            registros[idx1] = fusionado
-                            registros.pop(idx2)
-                            data["registros"] = registros
-                            guardar_datos_ciudad(ciudad_sel, data)
-                            st.success("Registros fusionados")
-                            st.session_state["buscar_duplicados"] = False
-                            st.rerun()
+                        if st.button("🔗 Fusionar", key=f"fusionar_par_{i}", help="Combina ambos registros"):
+                            consolidador.deduplicar([GrupoDuplicados(indices=[idx1, idx2])])
+                            guardar_fusion(consolidador, "Registros fusionados")
                     
                     with accion_col2:
-                        if st.button("✅ Mantener A", key=f"keep_a_{i}", help="Elimina B"):
-                            registros.pop(idx2)
-                            data["registros"] = registros
-                            guardar_datos_ciudad(ciudad_sel, data)
-                            st.success("Registro B eliminado")
-                            st.session_state["buscar_duplicados"] = False
-                            st.rerun()
+                        if st.button("✅ Mantener A", key=f"keep_a_par_{i}", help="Elimina B"):
+                            mantener_registro(consolidador, [idx1, idx2], idx1)
                     
                     with accion_col3:
-                        if st.button("✅ Mantener B", key=f"keep_b_{i}", help="Elimina A"):
-                            registros.pop(idx1)
-                            data["registros"] = registros
-                            guardar_datos_ciudad(ciudad_sel, data)
-                            st.success("Registro A eliminado")
-                            st.session_state["buscar_duplicados"] = False
-                            st.rerun()
+                        if st.button("✅ Mantener B", key=f"keep_b_par_{i}", help="Elimina A"):
+                            mantener_registro(consolidador, [idx1, idx2], idx2)
                     
                     with accion_col4:
-                        if st.button("⏭️ No son duplicados", key=f"skip_{i}", help="Mantiene ambos"):
+                        if st.button("⏭️ No son duplicados", key=f"skip_par_{i}", help="Mantiene ambos"):
                             st.info("Registros marcados como diferentes")
-            
-            if len(duplicados) > 20:
-                st.info(f"Mostrando 20 de {len(duplicados)} pares. Resuelve estos primero.")
 
 
 # === TAB 2: ENRIQUECER DATOS ===
@@ -9,6 +9,8 @@ import re
 from pathlib import Path
 from datetime import datetime
 
+from utils.database import ArchivoModificado, cargar_archivo, guardar_archivo
+
 st.set_page_config(page_title="Enriquecer Datos", page_icon="📥", layout="wide")
 
 st.title("📥 Enriquecer Datos")
@@ -20,8 +22,7 @@ def cargar_datos_ciudad(ciudad: str):
     """Carga datos de una ciudad."""
     archivo = Path("data") / f"{ciudad.lower()}.json"
     if archivo.exists():
-        with open(archivo, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return cargar_archivo(archivo)
     return {"metadata": {}, "registros": []}
 
 
@@ -30,8 +31,12 @@ def guardar_datos_ciudad(ciudad: str, data: dict):
     archivo = Path("data") / f"{ciudad.lower()}.json"
     data["metadata"]["fecha_actualizacion"] = datetime.now().isoformat()
     data["metadata"]["total_registros"] = len(data.get("registros", []))
-    with open(archivo, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    try:
+        guardar_archivo(archivo, data)
+    except ArchivoModificado as e:
+        # Una búsqueda u otra pestaña ha escrito la ciudad: no pisar sus cambios
+        st.error(f"No se ha guardado: {e}. Recarga la página y repite el cambio.")
+        st.stop()
 
 
 def listar_ciudades():
@@ -159,15 +164,11 @@ def enriquecer_con_tavily(url: str, nombre: str) -> dict:
 
 
 def enriquecer_con_requests(url: str) -> dict:
-    """Scrapeo básico con requests (sin API)."""
+    """Scrapeo básico con requests (sin API), reutilizando conexiones entre URLs."""
     try:
-        import requests
-        
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
+        from utils.http import get_sesion
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_sesion("web").get(url, timeout=10)
         
         if response.status_code == 200:
             return extraer_datos_de_html(response.text)
@@ -8,6 +8,8 @@ from pathlib import Path
 from datetime import datetime
 import io
 
+from utils.database import cargar_archivo
+
 st.set_page_config(page_title="Exportar", page_icon="📥", layout="wide")
 
 st.title("📥 Exportar Datos")
@@ -18,8 +20,7 @@ def cargar_datos_ciudad(ciudad: str):
     """Carga datos de una ciudad."""
     archivo = Path("data") / f"{ciudad.lower()}.json"
     if archivo.exists():
-        with open(archivo, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return cargar_archivo(archivo)
     return {"metadata": {}, "registros": []}
 
 
@@ -464,16 +464,22 @@ QUERIES_PLACES = {
 
 def get_prompts_ciudad(ciudad: str) -> list:
     """Obtiene todos los prompts para una ciudad."""
-    ciudad_lower = ciudad.lower()
     prompts = []
-    
-    for key, value in PROMPTS_BUSQUEDA.items():
-        if ciudad_lower in key:
-            prompts.extend(value)
-    
+    for value in get_grupos_prompts(ciudad).values():
+        prompts.extend(value)
     return prompts
 
 
+def get_grupos_prompts(ciudad: str) -> dict:
+    """Prompts de una ciudad agrupados por clave de PROMPTS_BUSQUEDA."""
+    ciudad_lower = ciudad.lower()
+    return {
+        key: value
+        for key, value in PROMPTS_BUSQUEDA.items()
+        if ciudad_lower in key
+    }
+
+
 def get_urls_ciudad(ciudad: str) -> list:
     """Obtiene URLs de directorios para una ciudad."""
     ciudad_lower = ciudad.lower()
@@ -3,6 +3,8 @@ Schemas y validación de datos.
 """
 from typing import List, Optional, Dict, Any
 
+from utils.telefonos import canonicalizar_telefonos
+
 # =============================================================================
 # Schema de registro estandarizado
 # =============================================================================
@@ -138,7 +140,7 @@ def normalizar_registro(registro: Dict[str, Any]) -> Dict[str, Any]:
     telefonos = registro.get("telefono", registro.get("telefonos", []))
     if isinstance(telefonos, str):
         telefonos = [telefonos] if telefonos else []
-    normalizado["telefono"] = [normalizar_telefono(t) for t in telefonos if t]
+    normalizado["telefono"] = canonicalizar_telefonos(telefonos)
     
     # Email
     email = registro.get("email", "")
@@ -193,28 +195,6 @@ def normalizar_registro(registro: Dict[str, Any]) -> Dict[str, Any]:
     return normalizado
 
 
-def normalizar_telefono(telefono: str) -> str:
-    """Normaliza un teléfono español al formato estándar."""
-    if not telefono:
-        return ""
-    
-    # Eliminar espacios, guiones, paréntesis, puntos
-    limpio = "".join(c for c in telefono if c.isdigit() or c == "+")
-    
-    # Si empieza con 34 sin +, añadir +
-    if limpio.startswith("34") and not limpio.startswith("+"):
-        limpio = "+" + limpio
-    # Si empieza con 6, 7, 8 o 9 (móvil o fijo español), añadir +34
-    elif limpio and limpio[0] in "6789":
-        limpio = "+34" + limpio
-    
-    # Formato: +34 XXX XXX XXX
-    if limpio.startswith("+34") and len(limpio) == 12:
-        return f"{limpio[:3]} {limpio[3:6]} {limpio[6:9]} {limpio[9:]}"
-    
-    return limpio
-
-
 def es_registro_valido(registro: Dict[str, Any]) -> bool:
     """Verifica rápidamente si un registro es válido."""
     if not registro.get("nombre"):
@@ -1,6 +1,7 @@
 """
 Script para ejecutar búsquedas en una ciudad específica.
 Uso: py scripts/buscar_ciudad.py <ciudad> [rondas]
+     py scripts/buscar_ciudad.py --resume [RUN_ID]
 """
 import sys
 import os
@@ -11,15 +12,38 @@ sys.stdout.reconfigure(encoding='utf-8')
 # Añadir el directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from core.checkpoint import listar_ejecuciones
 from core.orquestador import Orquestador, BusquedaConfig
+from utils.cache_consultas import get_cache
+
+
+def reanudar(run_id: str = None):
+    """Continúa una ejecución cortada, o lista las pendientes si no se indica."""
+    orq = Orquestador()
+    
+    if not run_id:
+        pendientes = listar_ejecuciones(orq.dir_ejecuciones, pendientes=True)
+        if not pendientes:
+            print("No hay ejecuciones pendientes")
+        for e in pendientes:
+            print(f"{e['run_id']}  {e['ciudad']}  etapa={e['etapa']}  {e['creado'][:16]}")
+        return
+    
+    resultado = orq.reanudar(run_id)
+    print(orq.generar_reporte({resultado.ciudad: resultado}))
 
 
 def main():
     if len(sys.argv) < 2:
         print("Uso: py scripts/buscar_ciudad.py <ciudad> [rondas]")
+        print("     py scripts/buscar_ciudad.py --resume [RUN_ID]")
         print("Ejemplo: py scripts/buscar_ciudad.py Barcelona 3")
         sys.exit(1)
     
+    if sys.argv[1] == "--resume":
+        reanudar(sys.argv[2] if len(sys.argv) > 2 else None)
+        return
+    
     ciudad = sys.argv[1]
     rondas = int(sys.argv[2]) if len(sys.argv) > 2 else 2
     
@@ -40,6 +64,11 @@ def main():
             scraping_profundo=True
         )
         resultado = orq.ejecutar_busqueda(config)
+        
+        # Si ya solo salen dominios conocidos, otra ronda no aportaría nada
+        if resultado.motivo_parada:
+            print(f"\nSin más rondas ({resultado.motivo_parada})")
+            break
     
     print("")
     print("=== RESULTADO FINAL ===")
@@ -49,6 +78,10 @@ def main():
         print(f"Duplicados: {len(resultado.consolidacion.duplicados_ignorados)}")
         print(f"Filtrados: {len(resultado.consolidacion.filtrados)}")
     print(f"Total procesados: {resultado.total_encontrados}")
+    
+    # Las rondas repiten prompts: lo que sale de la caché no se paga
+    for api, stats in sorted(get_cache().estadisticas().items()):
+        print(f"Caché {api}: {stats['aciertos']} aciertos, {stats['fallos']} fallos")
 
 
 if __name__ == "__main__":
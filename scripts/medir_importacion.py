@@ -0,0 +1,89 @@
+"""
+Comprueba que importar el orquestador sigue siendo rápido.
+Uso: py scripts/medir_importacion.py [--presupuesto 0.5] [--repeticiones 5] [--detalle]
+
+Importa core.orquestador en un proceso nuevo varias veces y falla (código 1)
+si la mediana supera el presupuesto o si al importar se ha cargado algún
+SDK de API: esos solo se cargan cuando una búsqueda usa el adapter
+(adapters/registro.py). tests/test_importacion.py hace la misma comprobación.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Configurar encoding para Windows
+sys.stdout.reconfigure(encoding='utf-8')
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRESUPUESTO_SEGUNDOS = 0.5
+MODULOS_PROHIBIDOS = ["firecrawl", "tavily", "openai", "requests", "streamlit", "numpy"]
+
+_MEDIR = """
+import importlib, json, sys, time
+inicio = time.perf_counter()
+for modulo in %r:
+    importlib.import_module(modulo)
+duracion = time.perf_counter() - inicio
+print(json.dumps({"segundos": duracion, "modulos": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def medir(modulos=("core.orquestador",)) -> dict:
+    """Importa los módulos en un intérprete nuevo y devuelve tiempo y SDKs cargados."""
+    salida = subprocess.run(
+        [sys.executable, "-c", _MEDIR % (list(modulos), MODULOS_PROHIBIDOS)],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def detalle(top: int = 15):
+    """Módulos que más tardan en importarse (python -X importtime)."""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import core.orquestador"],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    filas = []
+    for linea in salida.stderr.splitlines():
+        partes = linea.split("|")
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        filas.append((int(partes[1]), partes[2].strip()))
+    print("\nMódulos más lentos (acumulado):")
+    for microsegundos, modulo in sorted(filas, reverse=True)[:top]:
+        print(f"  {microsegundos / 1000:8.1f} ms  {modulo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación del orquestador")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_SEGUNDOS,
+                        help="Segundos como mucho (mediana)")
+    parser.add_argument("--repeticiones", "-n", type=int, default=5)
+    parser.add_argument("--detalle", action="store_true", help="Listar los módulos más lentos")
+    args = parser.parse_args()
+
+    medidas = [medir() for _ in range(max(1, args.repeticiones))]
+    mediana = statistics.median(m["segundos"] for m in medidas)
+    cargados = sorted({modulo for m in medidas for modulo in m["modulos"]})
+
+    print(f"import core.orquestador: {mediana:.3f} s (mediana de {len(medidas)}, "
+          f"presupuesto {args.presupuesto:.3f} s)")
+    if args.detalle:
+        detalle()
+
+    errores = []
+    if mediana > args.presupuesto:
+        errores.append(f"supera el presupuesto en {mediana - args.presupuesto:.3f} s")
+    if cargados:
+        errores.append(f"carga al importar: {', '.join(cargados)}")
+    for error in errores:
+        print(f"ERROR: {error}")
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Mide el arranque del Consolidador con y sin el sidecar de índices.
+Uso: py scripts/medir_indices.py [--registros 20000] [--repeticiones 3]
+
+Genera una ciudad sintética en un directorio temporal y compara la carga
+en frío (sin <ciudad>.indices.jsonz: se reconstruyen los índices) con la
+carga en caliente (índices leídos del sidecar que deja guardar()).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Configurar encoding para Windows
+sys.stdout.reconfigure(encoding='utf-8')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.consolidador import SUFIJO_INDICES, Consolidador  # noqa: E402
+
+
+def registros_sinteticos(total: int) -> list:
+    """Despachos con nombre, teléfono, email y web distintos."""
+    return [
+        {
+            "nombre": f"Despacho {i} Abogados Extranjería",
+            "telefono": [f"+34 91{i % 10000000:07d}"],
+            "email": f"info{i}@despacho{i}.es",
+            "web": f"https://despacho{i}.es",
+            "ciudad": "Madrid",
+        }
+        for i in range(total)
+    ]
+
+
+def medir_carga(path: Path, repeticiones: int) -> float:
+    """Mediana en segundos de Consolidador(path)."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        Consolidador(str(path))
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque del Consolidador con y sin sidecar")
+    parser.add_argument("--registros", type=int, default=20000)
+    parser.add_argument("--repeticiones", "-n", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        path = Path(directorio) / "madrid.json"
+        path.write_text(
+            json.dumps({"metadata": {}, "registros": registros_sinteticos(args.registros)}),
+            encoding="utf-8"
+        )
+        sidecar = path.with_name(path.stem + SUFIJO_INDICES)
+
+        frio = medir_carga(path, args.repeticiones)
+        Consolidador(str(path)).guardar()
+        caliente = medir_carga(path, args.repeticiones)
+
+    print(f"{args.registros} registros, sidecar de {sidecar.name}")
+    print(f"  en frío (reconstruye índices): {frio:.3f} s")
+    print(f"  en caliente (sidecar):         {caliente:.3f} s  ({frio / caliente:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,13 @@ import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
 import json
+import os
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import cargar_archivo
+
 print('=' * 60)
 print('RESUMEN FINAL - 10 PRINCIPALES CIUDADES DE ESPAÑA')
 print('=' * 60)
@@ -19,8 +24,7 @@ for archivo in sorted(data_dir.glob('*.json')):
         continue
     
     try:
-        with open(archivo, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = cargar_archivo(archivo)
         
         registros = data.get('registros', [])
         n = len(registros)
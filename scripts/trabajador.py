@@ -0,0 +1,55 @@
+"""
+Trabajador de la cola de búsquedas (data/cola_trabajos.sqlite).
+Uso: py scripts/trabajador.py [--paralelo N] [--hasta-vaciar]
+     py scripts/trabajador.py --encolar Madrid Barcelona ...
+     py scripts/trabajador.py --estado
+"""
+import argparse
+import os
+import sys
+from dataclasses import asdict
+
+# Configurar encoding para Windows
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cola_trabajos import ColaTrabajos, Trabajador
+
+
+def encolar(cola: ColaTrabajos, ciudades: list):
+    """Añade una búsqueda por ciudad con la configuración por defecto."""
+    from core.orquestador import BusquedaConfig
+    
+    for ciudad in ciudades:
+        trabajo_id = cola.encolar(asdict(BusquedaConfig(ciudad=ciudad)))
+        print(f"Trabajo {trabajo_id}: {ciudad}")
+
+
+def estado(cola: ColaTrabajos):
+    """Lista los últimos trabajos."""
+    print(f"Trabajadores activos: {cola.trabajadores_activos()}")
+    for t in cola.listar(20):
+        print(f"#{t['id']:<4} {t['ciudad']:<12} {t['estado']:<11} {t['progreso'][:70]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trabajador de la cola de búsquedas")
+    parser.add_argument("--paralelo", "-p", type=int, default=2, help="Trabajos a la vez")
+    parser.add_argument("--hasta-vaciar", action="store_true", help="Terminar cuando no queden pendientes")
+    parser.add_argument("--encolar", nargs="+", metavar="CIUDAD", help="Encolar búsquedas y salir")
+    parser.add_argument("--estado", action="store_true", help="Mostrar la cola y salir")
+    args = parser.parse_args()
+    
+    cola = ColaTrabajos()
+    if args.encolar:
+        encolar(cola, args.encolar)
+    elif args.estado:
+        estado(cola)
+    else:
+        Trabajador(cola, max_paralelo=args.paralelo).ejecutar(continuo=not args.hasta_vaciar)
+
+
+if __name__ == "__main__":
+    main()
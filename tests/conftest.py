@@ -0,0 +1,46 @@
+"""Fixtures compartidas de las pruebas."""
+import json
+
+import pytest
+
+from utils import api_tracker, cache_consultas, database, http, limitador, presupuesto
+from utils.api_tracker import APITracker
+from utils.cache_consultas import CacheConsultas
+
+
+CONFIG_PRUEBA = {
+    "apis": {
+        "firecrawl": {"habilitado": True, "cache_ttl_horas": 168, "limite_mensual": 50},
+        "google_places": {"delay_entre_requests_ms": 100, "max_paralelo": 10, "rafaga": 20},
+        "google_search": {"limite_diario": 7},
+    },
+    "busqueda": {"delay_entre_requests_ms": 1000, "max_paralelo": 3, "cache_ttl_horas": 24},
+    "http": {"pool_conexiones": 4, "reintentos": 5, "backoff_segundos": 0.25, "jitter_segundos": 0},
+}
+
+
+@pytest.fixture
+def config_agentes(tmp_path, monkeypatch):
+    """
+    data/config_agentes.json de prueba, con los singletons del proceso
+    (limitadores, caché, presupuesto, sesiones HTTP) aislados: se restauran
+    al terminar la prueba.
+    """
+    ruta = tmp_path / "config_agentes.json"
+    ruta.write_text(json.dumps(CONFIG_PRUEBA), encoding="utf-8")
+    monkeypatch.setattr(database, "CONFIG_AGENTES", ruta)
+    monkeypatch.setattr(limitador, "_config", None)
+    monkeypatch.setattr(limitador, "_limitadores", {})
+    monkeypatch.setattr(presupuesto, "_config", None)
+    monkeypatch.setattr(http, "_config", None)
+    monkeypatch.setattr(http, "_sesiones", {})
+    monkeypatch.setattr(cache_consultas, "_cache", CacheConsultas(tmp_path / "cache.sqlite", config={}))
+    return CONFIG_PRUEBA
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    """Tracker de uso sobre un api_usage.json temporal (nunca data/api_usage.json)."""
+    tracker = APITracker(str(tmp_path / "api_usage.json"))
+    monkeypatch.setattr(api_tracker, "_tracker", tracker)
+    return tracker
@@ -0,0 +1,57 @@
+"""Pruebas de core/agrupador.py y de Consolidador.deduplicar."""
+from core.agrupador import UnionFind, agrupar, pares_nombre_similar
+from core.consolidador import Consolidador, similitud_nombres
+
+
+def test_union_find():
+    uf = UnionFind(range(5))
+    assert uf.unir(0, 1) and uf.unir(3, 4) and uf.unir(1, 4)
+    assert not uf.unir(0, 3)
+    assert sorted(sorted(g) for g in uf.grupos().values()) == [[0, 1, 3, 4], [2]]
+
+
+def test_duplicados_transitivos_en_un_grupo():
+    nombres = ["garcia abogados", "garcia abogado", "bufete garcia", "perez"]
+    cubos = [("tel:34912345678", [0, 1]), ("dom:garcia.es", [1, 2]), ("email:info@perez.es", [3])]
+
+    grupos = agrupar(4, cubos, nombres, similitud_nombres)
+    assert len(grupos) == 1
+    assert grupos[0].indices == [0, 1, 2]
+    assert grupos[0].senales == {"tel", "dom"}
+    assert grupos[0].razon == "Mismo dominio, Mismo teléfono"
+
+
+def test_telefono_compartido_exige_nombre_parecido():
+    nombres = ["colegio de abogados", "martinez extranjeria", "martinez extranjeria sl"]
+    cubos = [("tel:34915550000", [0, 1, 2])]
+
+    grupos = agrupar(3, cubos, nombres, similitud_nombres)
+    assert [g.indices for g in grupos] == [[1, 2]]
+
+
+def test_el_nombre_no_une_pero_sale_para_revisar():
+    nombres = ["derecho de extranjeria", "derecho de extranjeria", "lopez", "lopez"]
+    grupos = agrupar(4, [("email:a@lopez.es", [2, 3])], nombres, similitud_nombres)
+    assert [g.indices for g in grupos] == [[2, 3]]
+
+    pares = pares_nombre_similar(nombres, similitud_nombres, 85, grupos)
+    assert pares == [(0, 1, 100.0)]
+
+
+def test_deduplicar_fusiona_cada_grupo_en_el_primero(tmp_path):
+    consolidador = Consolidador(str(tmp_path / "madrid.json"))
+    consolidador.cargar_registros([
+        {"nombre": "García Abogados", "telefono": ["+34 912 345 678"], "web": "https://garcia.es"},
+        {"nombre": "Pérez Extranjería", "telefono": ["+34 933 000 111"], "web": "https://perez.es"},
+        {"nombre": "García Abogado", "telefono": ["+34 912 345 678"], "email": "info@garcia.es",
+         "web": "https://abogadosgarcia.es"},
+        {"nombre": "Bufete García", "web": "https://www.abogadosgarcia.es/contacto", "direccion": "Gran Vía 1"},
+    ])
+
+    assert [g.indices for g in consolidador.agrupar_duplicados()] == [[0, 2, 3]]
+    assert consolidador.deduplicar() == 2
+    assert [r["nombre"] for r in consolidador.registros] == ["García Abogados", "Pérez Extranjería"]
+    fusionado = consolidador.registros[0]
+    assert fusionado["email"] == "info@garcia.es"
+    assert fusionado["direccion"] == "Gran Vía 1"
+    assert consolidador.buscar_duplicado({"nombre": "X", "email": "info@garcia.es"}) == (True, 0, "email")
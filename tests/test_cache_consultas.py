@@ -0,0 +1,88 @@
+"""Pruebas de utils/cache_consultas.py y de la caché de los adapters."""
+import threading
+import time
+
+import pytest
+
+from adapters.base import SearchAdapter, SearchResult
+from utils import cache_consultas
+from utils.cache_consultas import CacheConsultas, get_cache
+
+
+class AdapterContado(SearchAdapter):
+    """Cuenta las llamadas reales a la API."""
+
+    def __init__(self, vacio=False):
+        super().__init__("clave")
+        self.nombre = "tavily"
+        self.vacio = vacio
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def search(self, query, max_results=10, **kwargs):
+        with self._lock:
+            self.llamadas += 1
+        time.sleep(0.02)
+        if self.vacio:
+            return []
+        return [SearchResult(nombre=f"Despacho {query}", telefono=["+34 912 345 678"], web="https://d.es")]
+
+
+@pytest.mark.usefixtures("config_agentes")
+def test_segunda_consulta_sale_de_la_cache():
+    adapter = AdapterContado()
+    primera = adapter.search("Abogados  Madrid")
+    segunda = adapter.search("abogados madrid", 10)
+
+    assert adapter.llamadas == 1
+    assert [r.to_dict() for r in segunda] == [r.to_dict() for r in primera]
+    assert get_cache().estadisticas()["tavily"] == {"aciertos": 1, "fallos": 1, "entradas": 1}
+
+    adapter.search("abogados madrid", max_results=20)
+    assert adapter.llamadas == 2
+
+
+@pytest.mark.usefixtures("config_agentes")
+def test_respuesta_vacia_no_se_guarda():
+    adapter = AdapterContado(vacio=True)
+    adapter.search("abogados madrid")
+    adapter.search("abogados madrid")
+    assert adapter.llamadas == 2
+
+
+@pytest.mark.usefixtures("config_agentes")
+def test_consultas_iguales_a_la_vez_llaman_una_vez():
+    adapter = AdapterContado()
+    hilos = [threading.Thread(target=adapter.search, args=("abogados sevilla",)) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert adapter.llamadas == 1
+
+
+def test_caduca_segun_el_ttl_de_la_api(tmp_path, monkeypatch):
+    cache = CacheConsultas(tmp_path / "cache.sqlite", config={
+        "busqueda": {"cache_ttl_horas": 1},
+        "apis": {"firecrawl": {"cache_ttl_horas": 48}, "google_places": {"cache_ttl_horas": 0}},
+    })
+    ahora = time.time()
+    for api in ("tavily", "firecrawl", "google_places"):
+        cache.guardar(api, "search", api, {"query": "q"}, [{"nombre": "x"}])
+
+    monkeypatch.setattr(cache_consultas.time, "time", lambda: ahora + 2 * 3600)
+    assert cache.obtener("tavily", "tavily") is None
+    assert cache.obtener("firecrawl", "firecrawl") == [{"nombre": "x"}]
+    assert cache.obtener("google_places", "google_places") is None
+    assert cache.estadisticas().keys() == {"tavily", "firecrawl"}
+
+    assert cache.purgar() == 1
+    assert cache.estadisticas()["firecrawl"]["entradas"] == 1
+    assert cache.estadisticas()["tavily"]["entradas"] == 0
+
+
+def test_clave_canonicaliza_solo_la_consulta():
+    clave = CacheConsultas.clave
+    assert clave("tavily", "search", {"query": " Abogados   MADRID"}) == clave("tavily", "search", {"query": "abogados madrid"})
+    assert clave("tavily", "search", {"query": "q"}) != clave("google_search", "search", {"query": "q"})
+    assert clave("tavily", "search", {"query": "q", "pais": "ES"}) != clave("tavily", "search", {"query": "q", "pais": "es"})
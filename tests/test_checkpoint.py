@@ -0,0 +1,135 @@
+"""Pruebas de core/checkpoint.py y de la reanudación del orquestador."""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from adapters.base import SearchAdapter, SearchResult
+from core.checkpoint import (
+    ETAPA_COMPLETADA, CheckpointBusqueda, clave_tarea, podar_ejecuciones
+)
+from core.orquestador import BusquedaConfig, Orquestador
+
+
+class AdapterFalso(SearchAdapter):
+    """Devuelve un despacho por prompt y anota los prompts pedidos."""
+
+    usar_cache = False
+
+    def __init__(self):
+        super().__init__("clave")
+        self.nombre = "tavily"
+        self.prompts = []
+
+    def search(self, query, **kwargs):
+        self.prompts.append(query)
+        n = len(self.prompts)
+        return [SearchResult(
+            nombre=f"Abogados {query} {n}", telefono=[f"+34 91{n:07d}"], web=f"https://despacho{n}.es"
+        )]
+
+
+@pytest.fixture
+def orquestador(config_agentes, tracker, tmp_path):
+    orquestador = Orquestador(data_dir=tmp_path / "data")
+    orquestador.adapters = {"tavily": AdapterFalso()}
+    return orquestador
+
+
+def _config():
+    return BusquedaConfig(ciudad="Madrid", apis_habilitadas=["tavily"], usar_places=False,
+                          scraping_profundo=False, max_resultados_por_api=100)
+
+
+def test_plan_se_guarda_y_se_reanuda(tmp_path):
+    checkpoint = CheckpointBusqueda.crear(tmp_path, {"ciudad": "Madrid"})
+    assert checkpoint.plan("apis", ["tavily", "google_search"]) == ["tavily", "google_search"]
+    checkpoint.registrar(clave_tarea("tavily", "p1"), [])
+
+    reabierto = CheckpointBusqueda.abrir(tmp_path, checkpoint.run_id)
+    assert reabierto.plan("apis", ["google_search"]) == ["tavily", "google_search"]
+    assert reabierto.reanudada(clave_tarea("tavily", "p1"))
+
+    reabierto.registrar(clave_tarea("tavily", "p2"), [])
+    assert reabierto.completada(clave_tarea("tavily", "p2"))
+    assert not reabierto.reanudada(clave_tarea("tavily", "p2"))
+
+
+def test_completar_borra_los_resultados(tmp_path):
+    checkpoint = CheckpointBusqueda.crear(tmp_path, {"ciudad": "Madrid"})
+    checkpoint.registrar(clave_tarea("tavily", "p1"), [{"nombre": "x"}])
+    checkpoint.marcar_etapa(ETAPA_COMPLETADA)
+
+    assert not (checkpoint.directorio / "resultados.jsonl").exists()
+    assert CheckpointBusqueda.abrir(tmp_path, checkpoint.run_id).etapa == ETAPA_COMPLETADA
+
+
+def test_podar_ejecuciones(tmp_path):
+    viejas = datetime.now() - timedelta(days=10)
+    completada = CheckpointBusqueda.crear(tmp_path, {"ciudad": "Madrid"})
+    completada.estado.update(etapa=ETAPA_COMPLETADA, fecha_completada=viejas.isoformat())
+    completada._guardar_estado()
+    cortada = CheckpointBusqueda.crear(tmp_path, {"ciudad": "Sevilla"})
+    cortada.estado["creado"] = viejas.isoformat()
+    cortada._guardar_estado()
+    reciente = CheckpointBusqueda.crear(tmp_path, {"ciudad": "Bilbao"})
+
+    assert podar_ejecuciones(tmp_path, dias_completadas=7, dias_pendientes=30) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([cortada.run_id, reciente.run_id])
+
+
+def test_reanudar_lanza_solo_lo_que_faltaba_del_plan(orquestador, monkeypatch):
+    orquestador.planificador.planificar = lambda ciudad, api, grupos: ["p1", "p2", "p3"]
+    checkpoint = CheckpointBusqueda.crear(orquestador.dir_ejecuciones, {
+        "ciudad": "Madrid", "apis_habilitadas": ["tavily"], "usar_places": False,
+        "scraping_profundo": False, "max_resultados_por_api": 100,
+    })
+    # Primer intento: planificó p1..p3, hizo p1 y se cortó
+    checkpoint.plan("apis", ["tavily"])
+    checkpoint.plan("consultas|tavily", ["p1", "p2", "p3"])
+    checkpoint.registrar(clave_tarea("tavily", "p1"), [SearchResult(
+        nombre="Abogados p1", telefono=["+34 930000001"], web="https://p1.es"
+    )])
+
+    # Ahora el planificador elegiría otros prompts
+    orquestador.planificador.planificar = lambda ciudad, api, grupos: ["otro", "p3"]
+    registradas = []
+    monkeypatch.setattr(orquestador.planificador, "registrar",
+                        lambda ciudad, api, consulta, *a, **k: registradas.append(consulta))
+
+    resultado = orquestador.reanudar(checkpoint.run_id)
+
+    assert orquestador.adapters["tavily"].prompts == ["p2", "p3"]
+    assert registradas == ["p2", "p3"]
+    assert resultado.total_encontrados == 3
+    assert resultado.consolidacion.total_nuevos == 3
+    assert not (checkpoint.directorio / "resultados.jsonl").exists()
+
+
+def test_reanudar_no_cuenta_dos_veces_en_la_saturacion(orquestador, monkeypatch):
+    from core import orquestador as modulo
+    registros = []
+    original = modulo.DetectorSaturacion.registrar
+    monkeypatch.setattr(modulo.DetectorSaturacion, "registrar",
+                        lambda self, origen, *a: (registros.append(origen), original(self, origen, *a)))
+
+    checkpoint = CheckpointBusqueda.crear(orquestador.dir_ejecuciones, {
+        "ciudad": "Madrid", "apis_habilitadas": ["tavily"], "usar_places": False,
+        "scraping_profundo": False, "max_resultados_por_api": 100,
+    })
+    checkpoint.plan("apis", ["tavily"])
+    checkpoint.plan("consultas|tavily", ["p1", "p2"])
+    checkpoint.registrar(clave_tarea("tavily", "p1"), [])
+
+    orquestador.reanudar(checkpoint.run_id)
+    assert registros == ["tavily"]
+    assert orquestador.adapters["tavily"].prompts == ["p2"]
+
+
+def test_ejecucion_nueva_guarda_el_plan(orquestador):
+    orquestador.planificador.planificar = lambda ciudad, api, grupos: ["p1", "p2"]
+    resultado = orquestador.ejecutar_busqueda(_config())
+
+    estado = json.loads((orquestador.dir_ejecuciones / resultado.run_id / "estado.json").read_text("utf-8"))
+    assert estado["etapa"] == ETAPA_COMPLETADA
+    assert estado["plan"] == {"apis": ["tavily"], "consultas|tavily": ["p1", "p2"]}
@@ -0,0 +1,145 @@
+"""Pruebas de core/cola_trabajos.py: huérfanos y propiedad de los trabajos."""
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+
+from core.cola_trabajos import COMPLETADO, EJECUTANDO, ERROR, PENDIENTE, ColaTrabajos, Trabajador
+
+
+class ProcesoFalso:
+    """Sustituto de multiprocessing.Process para _procesos."""
+
+    def __init__(self, vivo=True, exitcode=None):
+        self.vivo = vivo
+        self.exitcode = exitcode
+
+    def is_alive(self):
+        return self.vivo
+
+    def join(self):
+        pass
+
+
+@pytest.fixture
+def cola(tmp_path):
+    return ColaTrabajos(tmp_path / "cola.sqlite")
+
+
+def _encolar(cola, ciudad="Madrid"):
+    return cola.encolar({"ciudad": ciudad, "zonas": []})
+
+
+def _envejecer(cola, trabajo_id=None, trabajador=None, segundos=600):
+    """Simula que el trabajo (o el trabajador) dejó de latir hace `segundos`."""
+    with closing(sqlite3.connect(cola.db_path)) as con, con:
+        if trabajo_id is not None:
+            con.execute("UPDATE trabajos SET latido = ? WHERE id = ?", (time.time() - segundos, trabajo_id))
+        if trabajador is not None:
+            con.execute("UPDATE trabajadores SET latido = ? WHERE id = ?", (time.time() - segundos, trabajador))
+
+
+def test_tomar_anota_el_trabajador(cola):
+    trabajo_id = _encolar(cola)
+    trabajo = cola.tomar("a@nodo")
+    assert trabajo["id"] == trabajo_id
+    assert trabajo["estado"] == EJECUTANDO
+    assert cola.obtener(trabajo_id)["trabajador"] == "a@nodo"
+
+
+def test_recupera_huerfano_de_trabajador_muerto(cola):
+    trabajo_id = _encolar(cola)
+    cola.latido_trabajador("a@nodo", time.time())
+    cola.tomar("a@nodo")
+    _envejecer(cola, trabajo_id, trabajador="a@nodo")
+
+    assert cola.recuperar_huerfanos() == 1
+    trabajo = cola.obtener(trabajo_id)
+    assert trabajo["estado"] == PENDIENTE
+    assert trabajo["trabajador"] is None
+    assert cola.tomar("b@nodo")["id"] == trabajo_id
+
+
+def test_no_recupera_trabajo_de_trabajador_vivo(cola):
+    trabajo_id = _encolar(cola)
+    cola.latido_trabajador("a@nodo", time.time())
+    cola.tomar("a@nodo")
+    # Al hijo le falla el latido, pero su trabajador sigue latiendo
+    _envejecer(cola, trabajo_id)
+
+    assert cola.recuperar_huerfanos() == 0
+    assert cola.obtener(trabajo_id)["estado"] == EJECUTANDO
+
+
+def test_trabajador_no_devuelve_sus_procesos_vivos(cola):
+    trabajador = Trabajador(cola)
+    trabajo_id = _encolar(cola)
+    cola.tomar(trabajador.id)
+    trabajador._procesos[trabajo_id] = ProcesoFalso(vivo=True)
+    # Ni el hijo ni el trabajador han podido latir (sqlite bloqueado, p. ej.)
+    _envejecer(cola, trabajo_id)
+
+    assert cola.recuperar_huerfanos(excluir=trabajador._vivos()) == 0
+    assert cola.obtener(trabajo_id)["estado"] == EJECUTANDO
+
+    trabajador._procesos[trabajo_id].vivo = False
+    assert cola.recuperar_huerfanos(excluir=trabajador._vivos()) == 1
+
+
+def test_el_trabajador_anterior_no_pisa_el_estado_final(cola):
+    """Un trabajo devuelto a la cola y retomado por otro no se ejecuta 'dos veces'."""
+    trabajo_id = _encolar(cola)
+    cola.latido_trabajador("a@nodo", time.time())
+    cola.tomar("a@nodo")
+    _envejecer(cola, trabajo_id, trabajador="a@nodo")
+    cola.recuperar_huerfanos()
+    cola.tomar("b@nodo")
+
+    # El hijo de A acaba tarde: ni su resultado ni su error cuentan
+    assert not cola.terminar(trabajo_id, resultado={"nuevos": 1}, trabajador="a@nodo")
+    assert not cola.terminar(trabajo_id, error="cortado", trabajador="a@nodo")
+    trabajo = cola.obtener(trabajo_id)
+    assert trabajo["estado"] == EJECUTANDO
+    assert trabajo["trabajador"] == "b@nodo"
+
+    assert cola.terminar(trabajo_id, resultado={"nuevos": 3}, trabajador="b@nodo")
+    trabajo = cola.obtener(trabajo_id)
+    assert trabajo["estado"] == COMPLETADO
+    assert trabajo["resultado"] == {"nuevos": 3}
+
+
+def test_recoger_terminados_no_marca_error_en_trabajo_ajeno(cola):
+    trabajador = Trabajador(cola)
+    trabajo_id = _encolar(cola)
+    cola.tomar("otro@nodo")
+    trabajador._procesos[trabajo_id] = ProcesoFalso(vivo=False, exitcode=-15)
+
+    trabajador._recoger_terminados()
+    assert cola.obtener(trabajo_id)["estado"] == EJECUTANDO
+
+    propio = _encolar(cola, "Sevilla")
+    cola.tomar(trabajador.id)
+    trabajador._procesos[propio] = ProcesoFalso(vivo=False, exitcode=1)
+    trabajador._recoger_terminados()
+    trabajo = cola.obtener(propio)
+    assert trabajo["estado"] == ERROR
+    assert "código 1" in trabajo["error"]
+
+
+def test_migra_colas_sin_columna_trabajador(tmp_path):
+    ruta = tmp_path / "cola.sqlite"
+    with closing(sqlite3.connect(ruta)) as con, con:
+        con.execute(
+            "CREATE TABLE trabajos (id INTEGER PRIMARY KEY AUTOINCREMENT, ciudad TEXT NOT NULL, "
+            "config TEXT NOT NULL, estado TEXT NOT NULL, progreso TEXT NOT NULL DEFAULT '', run_id TEXT, "
+            "resultado TEXT, error TEXT, creado REAL NOT NULL, iniciado REAL, terminado REAL, latido REAL)"
+        )
+        con.execute(
+            "INSERT INTO trabajos (ciudad, config, estado, creado, latido) VALUES (?, ?, ?, ?, ?)",
+            ("Madrid", '{"ciudad": "Madrid"}', EJECUTANDO, time.time(), time.time() - 600)
+        )
+
+    cola = ColaTrabajos(ruta)
+    assert cola.recuperar_huerfanos() == 1
+    assert cola.tomar("a@nodo")["trabajador"] == "a@nodo"
@@ -0,0 +1,198 @@
+"""Pruebas de core/consolidador.py."""
+import copy
+import json
+import zlib
+
+import pytest
+
+from core.consolidador import (
+    CAMPOS_INDICES, CDIST_DISPONIBLE, SUFIJO_INDICES, ConsolidacionResult, Consolidador,
+    similitud_nombres
+)
+
+
+REGISTROS = [
+    {"nombre": "García Abogados", "telefono": ["912345678"], "web": "https://garcia.es"},
+    {"nombre": "Pérez Extranjería", "email": "info@perez.es"},
+]
+
+
+def _base(tmp_path):
+    path = tmp_path / "madrid.json"
+    path.write_text(json.dumps({"metadata": {}, "registros": REGISTROS}), encoding="utf-8")
+    return path
+
+
+def _indices(consolidador):
+    return {campo: getattr(consolidador, campo) for campo in CAMPOS_INDICES}
+
+
+def test_cargar_no_escribe_el_sidecar(tmp_path):
+    path = _base(tmp_path)
+    antes = sorted(tmp_path.iterdir())
+    Consolidador(str(path))
+    assert sorted(tmp_path.iterdir()) == antes
+
+
+def test_sidecar_reproduce_los_indices(tmp_path):
+    path = _base(tmp_path)
+    construido = Consolidador(str(path))
+    construido.guardar()
+    sidecar = path.with_name(path.stem + SUFIJO_INDICES)
+    assert sidecar.exists()
+
+    cargado = Consolidador(str(path))
+    assert _indices(cargado) == _indices(construido)
+
+
+def test_sidecar_manipulado_se_reconstruye(tmp_path):
+    path = _base(tmp_path)
+    consolidador = Consolidador(str(path))
+    consolidador.guardar()
+    esperado = _indices(consolidador)
+    sidecar = path.with_name(path.stem + SUFIJO_INDICES)
+
+    guardado = json.loads(zlib.decompress(sidecar.read_bytes()))
+    clave = next(iter(guardado["indice_hash"]))
+    guardado["indice_hash"][clave] = [10 ** 6]
+    sidecar.write_bytes(zlib.compress(json.dumps(guardado).encode("utf-8")))
+    assert _indices(Consolidador(str(path))) == esperado
+
+    sidecar.write_bytes(b"no es un sidecar")
+    assert _indices(Consolidador(str(path))) == esperado
+
+
+def test_nombre_similar_solo_entre_registros_con_contacto_comun(tmp_path):
+    consolidador = Consolidador(str(tmp_path / "madrid.json"))
+    consolidador.procesar_batch([
+        {"nombre": "Bufete García Martínez", "telefono": ["912345678"], "web": "https://garciamartinez.es"},
+        {"nombre": "Bufete García Martín", "telefono": ["934567890"], "web": "https://otro-bufete.es"},
+    ])
+    assert len(consolidador.registros) == 2
+
+    nuevo = {"nombre": "Bufete Garcia Martinez SL", "telefono": ["955111222"], "web": "https://www.garciamartinez.es/contacto"}
+    assert consolidador._candidatos_nombre(nuevo) == [0]
+    assert consolidador.buscar_duplicado(nuevo) == (True, 0, "nombre_similar")
+
+    sin_contacto_comun = {"nombre": "Bufete García Martínez", "telefono": ["955111333"], "web": "https://tercero.es"}
+    assert consolidador._candidatos_nombre(sin_contacto_comun) == []
+    assert consolidador.buscar_duplicado(sin_contacto_comun) == (False, None, "")
+
+
+def test_bloqueo_encuentra_lo_mismo_que_comparar_con_toda_la_base(tmp_path):
+    consolidador = Consolidador(str(tmp_path / "madrid.json"))
+    consolidador.procesar_batch([
+        {"nombre": f"Despacho {nombre}", "telefono": [f"91{i:07d}"], "web": f"https://{dominio}.es"}
+        for i, (nombre, dominio) in enumerate([
+            ("Alonso Ruiz", "alonso"), ("Alonso Ruíz", "ruiz"), ("Benítez Lara", "benitez"),
+            ("Castro Gil", "castro"), ("Castro Gil Abogados", "alonso"), ("Díaz Mora", "diaz"),
+        ])
+    ])
+
+    for registro in consolidador.registros:
+        consulta = {"nombre": registro["nombre"] + " y Cía", "web": registro["web"], "telefono": ["600000000"]}
+        nombre = consolidador.normalizar_nombre(consulta["nombre"])
+        fuerza_bruta = [
+            idx for idx, existente in enumerate(consolidador.registros)
+            if consolidador.similitud_nombre(nombre, existente["nombre"]) > 85
+            and consolidador._tienen_datos_comunes(consulta, existente)
+        ]
+        candidatos = [
+            idx for idx in consolidador._candidatos_nombre(consulta)
+            if consolidador.similitud_nombre(nombre, consolidador.registros[idx]["nombre"]) > 85
+        ]
+        assert candidatos == fuerza_bruta
+
+
+def _lote_con_variantes():
+    """Registros de varios despachos y variantes de su nombre con contacto común."""
+    lote = []
+    for i, nombre in enumerate(["Alonso Ruiz", "Benítez Lara", "Castro Gil", "Díaz Mora"]):
+        lote.append({"nombre": f"Despacho {nombre}", "telefono": [f"91{i:07d}"], "web": f"https://d{i}.es"})
+        lote.append({"nombre": f"Despacho {nombre} Abogados", "telefono": [f"93{i:07d}"], "web": f"https://d{i}.es"})
+        lote.append({"nombre": f"{nombre} Asesores", "telefono": [f"91{i:07d}"], "email": f"info@d{i}.es"})
+    return lote
+
+
+@pytest.mark.skipif(not CDIST_DISPONIBLE, reason="requiere rapidfuzz y numpy")
+def test_lote_vectorizado_igual_que_uno_a_uno(tmp_path):
+    bases = {}
+    for vectorizado in (False, True):
+        consolidador = Consolidador(str(tmp_path / f"{vectorizado}.json"))
+        resultado = consolidador.procesar_batch(copy.deepcopy(_lote_con_variantes()), vectorizado=vectorizado)
+        for registro in consolidador.registros:
+            registro.pop("fecha_actualizacion")
+        bases[vectorizado] = (consolidador.registros, resultado.total_nuevos, len(resultado.actualizados))
+
+    assert bases[True] == bases[False]
+    assert bases[True][1] < len(_lote_con_variantes())
+
+
+@pytest.mark.skipif(not CDIST_DISPONIBLE, reason="requiere rapidfuzz y numpy")
+def test_puntuaciones_precalculadas_iguales_a_similitud_nombres(tmp_path):
+    consolidador = Consolidador(str(tmp_path / "madrid.json"))
+    lote = _lote_con_variantes()
+    consolidador.procesar_batch(copy.deepcopy(lote[::3]), vectorizado=False)
+
+    consolidador._precalcular_similitudes(lote)
+    assert consolidador._cache_similitud
+    for (n1, n2), puntuacion in consolidador._cache_similitud.items():
+        assert puntuacion == pytest.approx(similitud_nombres(n1, n2))
+
+
+def test_fusionar_actualiza_indices_sin_claves_viejas(tmp_path):
+    consolidador = Consolidador(str(tmp_path / "madrid.json"))
+    consolidador.procesar_batch([
+        {"nombre": "Despacho Alonso Ruiz", "telefono": ["910000001"], "web": "https://alonso.es"},
+        {"nombre": "Despacho Benítez Lara", "telefono": ["910000002"], "web": "https://benitez.es"},
+    ])
+    resultado = consolidador.procesar_batch([
+        {"nombre": "Despacho Benítez Lara", "telefono": ["910000002", "+34 699 000 002"],
+         "web": "https://benitez.es", "email": "info@benitez.es"},
+    ])
+    assert len(resultado.actualizados) == 1
+    assert consolidador.buscar_duplicado({"nombre": "Otro", "email": "INFO@benitez.es"}) == (True, 1, "email")
+    assert consolidador.buscar_duplicado({"nombre": "Benitez Lara", "telefono": ["699000002"]}) == (True, 1, "telefono")
+
+    reconstruido = Consolidador(str(tmp_path / "otra.json"))
+    reconstruido.cargar_registros(consolidador.registros)
+    assert _indices(consolidador) == _indices(reconstruido)
+    # El hash anterior a la fusión (nombre|teléfono|sin email) ya no apunta a nada
+    assert all(consolidador.indice_hash.values())
+    assert len(consolidador.indice_hash) == len(consolidador.registros)
+
+
+def test_stream_consume_la_entrada_por_tramos(tmp_path):
+    consolidador = Consolidador(str(tmp_path / "madrid.json"))
+    lote = _lote_con_variantes()
+    leidos = []
+
+    def generador():
+        for registro in copy.deepcopy(lote):
+            leidos.append(registro)
+            yield registro
+
+    eventos = consolidador.procesar_stream(generador(), tamano_lote=3)
+    primero = next(eventos)
+    assert primero.tipo == "agregado" and primero.posicion == 0
+    assert len(leidos) == 3
+
+    resto = list(eventos)
+    assert [e.posicion for e in [primero] + resto] == list(range(len(lote)))
+    assert len(leidos) == len(lote)
+
+
+def test_solo_resumen_guarda_posiciones_con_los_mismos_totales(tmp_path):
+    lote = _lote_con_variantes() + [{"nombre": "Sin contacto"}]
+    completo = Consolidador(str(tmp_path / "completo.json")).procesar_batch(copy.deepcopy(lote))
+
+    consolidador = Consolidador(str(tmp_path / "resumen.json"))
+    resumen = ConsolidacionResult(solo_resumen=True)
+    for _ in consolidador.procesar_stream(copy.deepcopy(lote), resumen, tamano_lote=4):
+        pass
+
+    assert resumen.to_dict() == completo.to_dict()
+    # Posición en la entrada de los inválidos (los que no tienen web, filtro sin_web)
+    assert resumen.invalidos == [i for i, registro in enumerate(lote) if not registro.get("web")]
+    for lista in (resumen.agregados, resumen.actualizados, resumen.duplicados_ignorados):
+        assert all(isinstance(idx, int) and 0 <= idx < len(consolidador.registros) for idx in lista)
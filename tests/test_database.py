@@ -0,0 +1,39 @@
+"""Pruebas del bloqueo de archivos de utils/database.py."""
+import threading
+import time
+
+import pytest
+
+from utils.database import bloquear_archivo
+
+
+def test_bloqueo_reentrante_en_el_mismo_hilo(tmp_path):
+    ruta = tmp_path / "madrid.json.lock"
+    with bloquear_archivo(ruta):
+        with bloquear_archivo(ruta, espera=0):
+            pass
+        with bloquear_archivo(ruta, espera=0):
+            pass
+
+
+def test_otro_hilo_espera_al_bloqueo(tmp_path):
+    ruta = tmp_path / "madrid.json.lock"
+    orden = []
+    tomado = threading.Event()
+
+    def primero():
+        with bloquear_archivo(ruta):
+            tomado.set()
+            time.sleep(0.5)
+            orden.append("primero")
+
+    hilo = threading.Thread(target=primero)
+    hilo.start()
+    tomado.wait()
+    with pytest.raises(TimeoutError):
+        with bloquear_archivo(ruta, espera=0.01):
+            pass
+    with bloquear_archivo(ruta):
+        orden.append("segundo")
+    hilo.join()
+    assert orden == ["primero", "segundo"]
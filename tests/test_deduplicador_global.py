@@ -0,0 +1,111 @@
+"""Pruebas de core/deduplicador_global.py."""
+from core import deduplicador_global
+from core.deduplicador_global import ESTADO_PATH, DeduplicadorGlobal, unificar_grupo
+from utils.database import guardar_archivo
+
+
+def _despacho(nombre, telefono, web=None):
+    return {"nombre": nombre, "telefono": [telefono], "web": web}
+
+
+def _nombres(dedup):
+    return sorted(sorted(dedup.registros[rid]["nombre"] for rid in grupo) for grupo in dedup.grupos())
+
+
+def test_borrar_y_reordenar_no_junta_despachos_distintos():
+    dedup = DeduplicadorGlobal(max_workers=1)
+    a = _despacho("García Abogados", "912345678")
+    b = _despacho("Pérez Extranjería", "913333333")
+    c = _despacho("López Legal", "914444444")
+    dedup.actualizar_ciudad("Madrid", [a, b])
+    dedup.actualizar_ciudad("Barcelona", [dict(a, ciudad="Barcelona")])
+
+    # Se borra A de Madrid y C ocupa otra posición
+    dedup.actualizar_ciudad("Madrid", [c, b])
+
+    assert len(dedup.registros) == 3
+    assert _nombres(dedup) == [["García Abogados"], ["López Legal"], ["Pérez Extranjería"]]
+    assert len(dedup.vista_unificada()) == 3
+
+
+def test_quitar_el_enlace_separa_el_grupo():
+    dedup = DeduplicadorGlobal(max_workers=1)
+    # B enlaza A (mismo teléfono y nombre parecido) con C (misma web)
+    a = _despacho("García Abogados", "912345678")
+    b = _despacho("García Abogados Madrid", "912345678", "https://garcia.es")
+    c = _despacho("Bufete García", "933333333", "https://garcia.es")
+    dedup.actualizar_ciudad("Madrid", [a, b])
+    dedup.actualizar_ciudad("Barcelona", [c])
+    assert len(dedup.grupos()) == 1
+
+    # B pierde la web: A y B siguen juntos, C queda aparte
+    dedup.actualizar_ciudad("Madrid", [a, dict(b, web=None)])
+    assert _nombres(dedup) == [["Bufete García"], ["García Abogados", "García Abogados Madrid"]]
+    assert len(dedup.vista_unificada()) == 2
+
+
+def test_registros_identicos_cuentan_por_separado():
+    dedup = DeduplicadorGlobal(max_workers=1)
+    a = _despacho("García Abogados", "912345678")
+    assert dedup.actualizar_ciudad("Madrid", [a, dict(a)]) == 2
+    assert dedup.actualizar_ciudad("Madrid", [a, dict(a)]) == 0
+    assert len(dedup.grupos()) == 1 and len(dedup.registros) == 2
+
+
+def _ciudades(tmp_path, **ciudades):
+    for ciudad, registros in ciudades.items():
+        guardar_archivo(tmp_path / f"{ciudad}.json", {"metadata": {}, "registros": registros})
+
+
+def _contar_fusiones(dedup):
+    fusionados = []
+    dedup.vista_unificada(lambda grupo: fusionados.append(grupo) or unificar_grupo(grupo))
+    return len(fusionados)
+
+
+def test_estado_persistido_solo_reprocesa_lo_cambiado(tmp_path, monkeypatch):
+    a = _despacho("García Abogados", "912345678", "https://garcia.es")
+    b = _despacho("Pérez Extranjería", "913333333")
+    c = _despacho("Bufete García", "933333333", "https://garcia.es")
+    _ciudades(tmp_path, madrid=[a, b], barcelona=[c])
+    estado = tmp_path / ESTADO_PATH
+
+    primero = DeduplicadorGlobal.desde_directorio(tmp_path, estado=estado, max_workers=1)
+    vista = primero.vista_unificada()
+    primero.guardar_estado(estado)
+
+    shards = []
+    original = deduplicador_global._resolver_shard
+    monkeypatch.setattr(deduplicador_global, "_resolver_shard", lambda t: shards.append(t) or original(t))
+
+    # Sin cambios: nada que resolver ni que fusionar
+    segundo = DeduplicadorGlobal.desde_directorio(tmp_path, estado=estado, max_workers=1)
+    assert not shards
+    assert _nombres(segundo) == _nombres(primero)
+    assert _contar_fusiones(segundo) == 0
+    assert sorted(r["nombre"] for r in segundo.vista_unificada()) == sorted(r["nombre"] for r in vista)
+
+    # C cambia de web: solo se refusiona su grupo y el de A
+    _ciudades(tmp_path, barcelona=[dict(c, web="https://bufete.es")])
+    tercero = DeduplicadorGlobal.desde_directorio(tmp_path, estado=estado, max_workers=1)
+    completo = DeduplicadorGlobal.desde_directorio(tmp_path, max_workers=1)
+    assert _nombres(tercero) == _nombres(completo)
+    assert _contar_fusiones(tercero) == 2
+
+
+def test_estado_sin_archivo_de_ciudad_o_danado(tmp_path):
+    a = _despacho("García Abogados", "912345678", "https://garcia.es")
+    c = _despacho("Bufete García", "933333333", "https://garcia.es")
+    _ciudades(tmp_path, madrid=[a], barcelona=[c])
+    estado = tmp_path / ESTADO_PATH
+    dedup = DeduplicadorGlobal.desde_directorio(tmp_path, estado=estado, max_workers=1)
+    dedup.vista_unificada()
+    dedup.guardar_estado(estado)
+
+    (tmp_path / "barcelona.json").unlink()
+    dedup = DeduplicadorGlobal.desde_directorio(tmp_path, estado=estado, max_workers=1)
+    assert _nombres(dedup) == [["García Abogados"]]
+    assert set(dedup.por_ciudad) == {"Madrid"}
+
+    estado.write_bytes(b"no es un estado")
+    assert _nombres(DeduplicadorGlobal.desde_directorio(tmp_path, estado=estado, max_workers=1)) == [["García Abogados"]]
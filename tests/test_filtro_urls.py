@@ -0,0 +1,57 @@
+"""Pruebas de core/filtro_urls.py."""
+from adapters.base import SearchResult
+from core.consolidador import Consolidador
+from core.filtro_urls import FiltroURLs, urls_por_dominio
+
+
+def _filtro(tmp_path):
+    consolidador = Consolidador(str(tmp_path / "madrid.json"))
+    consolidador.procesar_batch([{
+        "nombre": "García Abogados", "telefono": ["912345678"],
+        "email": "info@garcia.es", "web": "https://garcia.es",
+    }])
+    return FiltroURLs(consolidador)
+
+
+def test_descarta_dominio_conocido_sin_datos_nuevos(tmp_path):
+    filtro = _filtro(tmp_path)
+    pasan = list(filtro.filtrar([
+        SearchResult(nombre="García Abogados", telefono=["+34 912 345 678"], web="HTTP://WWW.Garcia.es/contacto?utm_source=x"),
+        SearchResult(nombre="García Abogados", telefono=["600111222"], web="https://garcia.es/equipo"),
+    ]))
+    assert [r["telefono"] for r in pasan] == [["600111222"]]
+    assert filtro.descartados == {"dominio_conocido": 1}
+    assert filtro.dominios_nuevos == 0
+
+
+def test_dominio_repetido_dentro_de_la_busqueda(tmp_path):
+    filtro = _filtro(tmp_path)
+    pasan = list(filtro.filtrar([
+        {"nombre": "Pérez Extranjería", "telefono": ["933000111"], "web": "https://perez.es"},
+        {"nombre": "Pérez Extranjería", "telefono": ["933 000 111"], "web": "https://www.perez.es/"},
+        {"nombre": "Pérez Extranjería", "email": "hola@perez.es", "web": "https://perez.es/contacto"},
+    ]))
+    assert [r.get("email") for r in pasan] == [None, "hola@perez.es"]
+    assert pasan[0]["web"] == "https://perez.es/"
+    assert filtro.dominios_nuevos == 1
+    assert filtro.descartados == {"dominio_conocido": 1}
+
+
+def test_aplica_los_filtros_del_consolidador(tmp_path):
+    filtro = _filtro(tmp_path)
+    pasan = list(filtro.filtrar([
+        {"nombre": "Sin contacto"},
+        {"nombre": "Diccionario", "telefono": ["911000000"], "web": "https://www.wordreference.com/es/abogado"},
+    ]))
+    assert pasan == []
+    assert filtro.descartados == {"sin_contacto": 1, "dominio_excluido:wordreference.com": 1}
+
+
+def test_urls_por_dominio():
+    urls = [
+        "https://www.directorio.es/madrid", "https://directorio.es/espana",
+        "otro.es/abogados#lista", "https://tercero.es", "https://cuarto.es",
+    ]
+    assert urls_por_dominio(urls, limite=3) == [
+        "https://www.directorio.es/madrid", "https://otro.es/abogados", "https://tercero.es/"
+    ]
@@ -0,0 +1,112 @@
+"""Pruebas de adapters/google_adapter.py (sin red: sesión HTTP falsa)."""
+import threading
+import time
+
+import pytest
+
+from adapters import google_adapter
+from adapters.base import SearchResult
+from adapters.google_adapter import GooglePlacesAdapter
+from utils import cache_consultas
+from utils.cache_consultas import CacheConsultas
+
+
+class RespuestaFalsa:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+class SesionFalsa:
+    """Responde Nearby Search y Place Details y apunta las URLs pedidas."""
+
+    def __init__(self, latencia=0.0):
+        self.llamadas = []
+        self.latencia = latencia
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.llamadas.append(url)
+            self.simultaneas += 1
+            self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        try:
+            time.sleep(self.latencia)
+            return self._responder(url)
+        finally:
+            with self._lock:
+                self.simultaneas -= 1
+
+    def _responder(self, url):
+        if url.endswith("/nearbysearch/json"):
+            return RespuestaFalsa({"status": "OK", "results": [
+                {"name": "García Abogados", "place_id": "p1", "vicinity": "Gran Vía 1", "types": ["lawyer"]},
+            ]})
+        return RespuestaFalsa({"status": "OK", "result": {
+            "name": "García Abogados",
+            "formatted_phone_number": "912 345 678",
+            "website": "https://garcia.es",
+            "formatted_address": "Gran Vía 1, Madrid",
+        }})
+
+
+@pytest.fixture
+def sesion():
+    return SesionFalsa()
+
+
+@pytest.fixture
+def adapter(sesion, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_consultas, "_cache", CacheConsultas(tmp_path / "cache.sqlite", config={}))
+    monkeypatch.setattr(google_adapter, "get_sesion", lambda perfil="api": sesion)
+    adapter = GooglePlacesAdapter(api_key="clave")
+    # Sin presupuesto compartido (data/api_usage.json)
+    monkeypatch.setattr(adapter, "reservar_cuota", lambda *args, **kwargs: None)
+    adapter.sesion = sesion
+    return adapter
+
+
+def test_place_id_sobrevive_a_to_dict():
+    resultado = SearchResult(nombre="García Abogados", place_id="p1")
+    assert SearchResult.from_dict(resultado.to_dict()).place_id == "p1"
+    assert "place_id" not in SearchResult(nombre="Sin Places").to_dict()
+
+
+def test_enriquece_resultado_de_la_cache(adapter):
+    adapter.search("abogado extranjería")
+    cacheados = adapter.search("abogado extranjería")
+    assert adapter.sesion.llamadas.count(f"{adapter.BASE_URL}/nearbysearch/json") == 1
+    assert cacheados[0].place_id == "p1"
+
+    enriquecidos = adapter.enriquecer_con_detalles(cacheados)
+    assert enriquecidos[0].web == "https://garcia.es"
+    assert enriquecidos[0].telefono == ["+34 912 345 678"]
+    assert adapter.sesion.llamadas[-1].endswith("/details/json")
+
+
+def test_detalles_en_paralelo_y_sin_repetir_los_cacheados(config_agentes, sesion, adapter):
+    # Limitador de google_places según el archivo: 10 simultáneas, ráfaga 20
+    sesion.latencia = 0.2
+    detalle = f"{adapter.BASE_URL}/details/json"
+    resultados = [SearchResult(nombre=f"Despacho {i}", place_id=f"p{i}") for i in range(10)]
+
+    inicio = time.perf_counter()
+    adapter.enriquecer_con_detalles(resultados)
+    duracion = time.perf_counter() - inicio
+
+    assert sesion.llamadas.count(detalle) == 10
+    assert sesion.max_simultaneas == 10
+    assert duracion < 1.0  # en serie serían 2 s
+
+    # Los 10 ya están en la caché: solo se piden los 5 nuevos
+    mas = [SearchResult(nombre=f"Despacho {i}", place_id=f"p{i}") for i in range(15)]
+    enriquecidos = adapter.enriquecer_con_detalles(mas)
+    assert sesion.llamadas.count(detalle) == 15
+    assert all(r.web == "https://garcia.es" for r in enriquecidos)
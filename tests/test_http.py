@@ -0,0 +1,84 @@
+"""Pruebas de utils/http.py."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.orquestador import Orquestador
+from utils.http import crear_sesion, get_sesion
+
+
+def test_sin_config_path_aplica_pool_y_reintentos(config_agentes, tmp_path):
+    Orquestador(data_dir=tmp_path / "data")
+
+    adaptador = get_sesion("api").get_adapter("https://maps.googleapis.com")
+    assert adaptador._pool_connections == 4
+    assert adaptador._pool_maxsize == 4
+    assert adaptador.max_retries.total == 5
+    assert adaptador.max_retries.backoff_factor == 0.25
+    assert 500 in adaptador.max_retries.status_forcelist
+
+    # El perfil web mantiene sus propios reintentos
+    assert get_sesion("web").get_adapter("https://despacho.es").max_retries.total == 1
+
+
+def test_la_sesion_se_comparte(config_agentes):
+    assert get_sesion("api") is get_sesion("api")
+
+
+class Servidor(BaseHTTPRequestHandler):
+    """Responde los estados de `respuestas` en orden y anota cada petición."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    respuestas = []
+    peticiones = []
+
+    def do_GET(self):
+        estado = self.respuestas.pop(0) if self.respuestas else 200
+        self.peticiones.append((self.client_address, self.headers.get("User-Agent"), estado))
+        cuerpo = b"{}"
+        self.send_response(estado)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    Servidor.respuestas, Servidor.peticiones = [], []
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Servidor)
+    hilo = threading.Thread(target=servidor.serve_forever, args=(0.05,), daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_reintenta_los_5xx(servidor):
+    sesion = crear_sesion(reintentos=3, backoff=0, jitter=0)
+    Servidor.respuestas = [503, 502]
+    assert sesion.get(servidor, timeout=5).status_code == 200
+    assert [estado for *_, estado in Servidor.peticiones] == [503, 502, 200]
+
+    # Agotados los reintentos se devuelve la última respuesta
+    Servidor.respuestas = [500] * 5
+    assert sesion.get(servidor, timeout=5).status_code == 500
+
+
+def test_el_429_no_se_reintenta_en_la_sesion(servidor):
+    sesion = crear_sesion(reintentos=3, backoff=0, jitter=0)
+    Servidor.respuestas = [429]
+    assert sesion.get(servidor, timeout=5).status_code == 429
+    assert len(Servidor.peticiones) == 1
+
+
+def test_reutiliza_la_conexion(servidor):
+    sesion = crear_sesion(user_agent="prueba (gzip)", reintentos=0)
+    for _ in range(3):
+        sesion.get(servidor, timeout=5)
+    clientes = {cliente for cliente, *_ in Servidor.peticiones}
+    assert len(clientes) == 1
+    assert {agente for _, agente, _ in Servidor.peticiones} == {"prueba (gzip)"}
@@ -0,0 +1,30 @@
+"""
+Importar el orquestador y los adapters no carga los SDKs de API.
+
+Misma comprobación que scripts/medir_importacion.py, en un proceso nuevo
+para que no influyan los módulos que ya haya importado pytest.
+"""
+import importlib.util
+import statistics
+from pathlib import Path
+
+_ruta = Path(__file__).resolve().parent.parent / "scripts" / "medir_importacion.py"
+_spec = importlib.util.spec_from_file_location("medir_importacion", _ruta)
+medir_importacion = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(medir_importacion)
+
+MODULOS = [
+    "core.orquestador",
+    "adapters",
+    "adapters.registro",
+    "adapters.google_adapter",
+    "utils.http",
+]
+
+
+def test_importar_no_carga_sdks_y_cabe_en_el_presupuesto():
+    medidas = [medir_importacion.medir(MODULOS) for _ in range(3)]
+
+    for medida in medidas:
+        assert medida["modulos"] == []
+    assert statistics.median(m["segundos"] for m in medidas) <= medir_importacion.PRESUPUESTO_SEGUNDOS
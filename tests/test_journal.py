@@ -0,0 +1,116 @@
+"""Pruebas del journal de las ciudades (utils/database.py y Consolidador)."""
+import json
+
+import pytest
+
+from core.consolidador import Consolidador
+from utils.database import anexar_journal, cargar_archivo, guardar_archivo, ruta_journal
+
+
+def _registro(i):
+    return {"nombre": f"Despacho {i}", "telefono": [f"91234567{i}"]}
+
+
+def _ciudad(tmp_path, total=2):
+    path = tmp_path / "madrid.json"
+    guardar_archivo(path, {"metadata": {}, "registros": [_registro(i) for i in range(total)]})
+    return path, json.loads(path.read_text(encoding="utf-8"))["metadata"]["journal_base"]
+
+
+def _nombres(registros):
+    return [r["nombre"] for r in registros]
+
+
+def test_reproduce_el_journal(tmp_path):
+    path, token = _ciudad(tmp_path)
+    anexar_journal(path, token, [
+        {"op": "actualizar", "idx": 0, "registro": {**_registro(0), "nombre": "Despacho 0 SL"}},
+        {"op": "agregar", "idx": 2, "registro": _registro(2)},
+    ])
+
+    esperado = ["Despacho 0 SL", "Despacho 1", "Despacho 2"]
+    assert _nombres(cargar_archivo(path)["registros"]) == esperado
+    consolidador = Consolidador(str(path), journal=True)
+    assert _nombres(consolidador.registros) == esperado
+    assert consolidador.buscar_duplicado(_registro(2))[0]
+
+
+def test_consolidador_guarda_en_el_journal(tmp_path):
+    # Base bastante mayor que el cambio, para que guardar() no compacte
+    path, _ = _ciudad(tmp_path, total=40)
+    snapshot = path.read_bytes()
+    consolidador = Consolidador(str(path), journal=True)
+    nuevo = {"nombre": "Abogados Ruiz", "telefono": ["913000111"], "web": "https://ruizabogados.es"}
+    assert consolidador.procesar_batch([nuevo]).total_nuevos == 1
+    consolidador.guardar()
+
+    assert path.read_bytes() == snapshot
+    assert ruta_journal(path).exists()
+    assert _nombres(cargar_archivo(path)["registros"])[-1] == "Abogados Ruiz"
+
+
+def test_ultima_linea_a_medias(tmp_path):
+    path, token = _ciudad(tmp_path)
+    anexar_journal(path, token, [{"op": "agregar", "idx": 2, "registro": _registro(2)}])
+    with open(ruta_journal(path), "a", encoding="utf-8") as f:
+        f.write('{"op": "agregar", "idx": 3, "regis')
+
+    assert len(cargar_archivo(path)["registros"]) == 3
+    assert len(Consolidador(str(path), journal=True).registros) == 3
+
+    # El siguiente append cierra la línea rota y sus operaciones cuentan
+    anexar_journal(path, token, [{"op": "agregar", "idx": 3, "registro": _registro(3)}])
+    assert len(cargar_archivo(path)["registros"]) == 4
+    assert len(Consolidador(str(path), journal=True).registros) == 4
+
+
+def test_operacion_no_valida_corta_la_reproduccion(tmp_path):
+    path, token = _ciudad(tmp_path)
+    anexar_journal(path, token, [
+        {"op": "agregar", "idx": 2, "registro": _registro(2)},
+        {"op": "actualizar", "idx": 99, "registro": _registro(99)},
+        {"op": "agregar", "idx": 3, "registro": _registro(3)},
+    ])
+
+    esperado = ["Despacho 0", "Despacho 1", "Despacho 2"]
+    assert _nombres(cargar_archivo(path)["registros"]) == esperado
+    consolidador = Consolidador(str(path), journal=True)
+    assert _nombres(consolidador.registros) == esperado
+    assert not consolidador._carga_fallida
+
+    # No se anexa tras la operación rota: se reescribe el snapshot
+    consolidador.guardar()
+    assert not ruta_journal(path).exists()
+    assert _nombres(cargar_archivo(path)["registros"]) == esperado
+
+
+def test_journal_huerfano_tras_compactar(tmp_path):
+    path, token = _ciudad(tmp_path)
+    anexar_journal(path, token, [{"op": "agregar", "idx": 2, "registro": _registro(2)}])
+    journal = ruta_journal(path).read_bytes()
+
+    consolidador = Consolidador(str(path), journal=True)
+    consolidador.compactar()
+    # Caída entre el rename del snapshot y el borrado del journal
+    ruta_journal(path).write_bytes(journal)
+
+    assert len(Consolidador(str(path), journal=True).registros) == 3
+    assert not ruta_journal(path).exists()
+    assert ruta_journal(path).with_name(ruta_journal(path).name + ".huerfano").read_bytes() == journal
+    assert len(cargar_archivo(path)["registros"]) == 3
+
+
+def test_no_guarda_sobre_una_base_ilegible(tmp_path):
+    path = tmp_path / "madrid.json"
+    path.write_text('{"metadata": {}, "registros": [', encoding="utf-8")
+    consolidador = Consolidador(str(path), journal=True)
+    assert consolidador.registros == []
+
+    with pytest.raises(ValueError):
+        consolidador.guardar()
+    with pytest.raises(ValueError):
+        consolidador.compactar()
+    assert path.read_text(encoding="utf-8") == '{"metadata": {}, "registros": ['
+
+    # A otra ruta sí se puede guardar
+    consolidador.guardar(str(tmp_path / "copia.json"))
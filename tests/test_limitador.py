@@ -0,0 +1,127 @@
+"""Pruebas de utils/limitador.py y de SearchAdapter.llamar_api."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from adapters.base import SearchAdapter
+from utils.limitador import (
+    ESPERA_429, REINTENTOS_429, LimitadorTasa, configurar_limitadores, es_limite_superado, obtener_limitador,
+    segundos_reintento
+)
+
+
+def _cronometrar(limitador, llamadas):
+    inicio = time.monotonic()
+    for _ in range(llamadas):
+        with limitador:
+            pass
+    return time.monotonic() - inicio
+
+
+def test_rafaga_y_despues_ritmo_sostenido():
+    limitador = LimitadorTasa("x", por_segundo=20, rafaga=3, max_paralelo=10)
+    assert _cronometrar(limitador, 3) < 0.03
+    # Con el cubo vacío, una llamada cada 50 ms
+    assert 0.12 < _cronometrar(limitador, 3) < 0.3
+
+
+def test_sin_ritmo_no_espera():
+    assert _cronometrar(LimitadorTasa("x", por_segundo=0, rafaga=1, max_paralelo=1), 50) < 0.05
+
+
+def test_max_paralelo_limita_las_llamadas_simultaneas():
+    limitador = LimitadorTasa("x", por_segundo=0, rafaga=1, max_paralelo=2)
+    en_curso, maximo, lock = [0], [0], threading.Lock()
+
+    def llamada():
+        with limitador:
+            with lock:
+                en_curso[0] += 1
+                maximo[0] = max(maximo[0], en_curso[0])
+            time.sleep(0.02)
+            with lock:
+                en_curso[0] -= 1
+
+    hilos = [threading.Thread(target=llamada) for _ in range(6)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert maximo[0] == 2
+
+
+def test_penalizar_pausa_a_todos():
+    limitador = LimitadorTasa("x", por_segundo=1000, rafaga=5, max_paralelo=5)
+    limitador.penalizar(0.1)
+    assert _cronometrar(limitador, 1) >= 0.09
+
+
+def test_parametros_de_la_configuracion(config_agentes):
+    configurar_limitadores({
+        "busqueda": {"delay_entre_requests": 0.5, "max_paralelo": 4},
+        "apis": {"google_places": {"delay_entre_requests_ms": 100, "rafaga": 8}},
+    })
+    general = obtener_limitador("tavily")
+    assert (general.por_segundo, general.rafaga, general.max_paralelo) == (2, 4, 4)
+    places = obtener_limitador("google_places")
+    assert (places.por_segundo, places.rafaga, places.max_paralelo) == (10, 8, 4)
+    assert obtener_limitador("tavily") is general
+
+
+def _respuesta(status, texto="", cabeceras=None):
+    return SimpleNamespace(status_code=status, text=texto, headers=cabeceras or {})
+
+
+def test_es_limite_superado():
+    assert es_limite_superado(_respuesta(429))
+    assert es_limite_superado(_respuesta(403, '{"reason": "userRateLimitExceeded"}'))
+    assert not es_limite_superado(_respuesta(403, '{"reason": "dailyLimitExceeded"}'))
+    assert not es_limite_superado(_respuesta(200))
+
+    error = RuntimeError("HTTP error")
+    error.response = _respuesta(429)
+    assert es_limite_superado(error)
+    assert es_limite_superado(RuntimeError("Rate limit exceeded"))
+    assert not es_limite_superado(RuntimeError("timeout"))
+
+
+def test_segundos_reintento():
+    assert segundos_reintento(_respuesta(429, cabeceras={"Retry-After": "7"}), 0) == 7
+    assert segundos_reintento(_respuesta(429), 0) == ESPERA_429
+    assert segundos_reintento(_respuesta(429), 2) == ESPERA_429 * 4
+
+
+class AdapterFalso(SearchAdapter):
+    usar_cache = False
+
+    def __init__(self):
+        super().__init__("clave")
+        self.nombre = "tavily"
+
+    def search(self, query, **kwargs):
+        return []
+
+
+@pytest.mark.usefixtures("config_agentes")
+def test_llamar_api_reintenta_tras_429():
+    configurar_limitadores({"busqueda": {"delay_entre_requests_ms": 1, "max_paralelo": 2}})
+    respuestas = [_respuesta(429, cabeceras={"Retry-After": "0"}), _respuesta(200)]
+
+    respuesta = AdapterFalso().llamar_api(respuestas.pop, 0)
+    assert respuesta.status_code == 200
+    assert not respuestas
+
+
+@pytest.mark.usefixtures("config_agentes")
+def test_llamar_api_devuelve_el_429_al_agotar_los_reintentos():
+    configurar_limitadores({"busqueda": {"delay_entre_requests_ms": 1, "max_paralelo": 2}})
+    llamadas = []
+
+    def llamada():
+        llamadas.append(1)
+        return _respuesta(429, cabeceras={"Retry-After": "0"})
+
+    assert AdapterFalso().llamar_api(llamada).status_code == 429
+    assert len(llamadas) == REINTENTOS_429 + 1
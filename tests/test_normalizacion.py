@@ -0,0 +1,18 @@
+"""Pruebas de utils/normalizacion.py."""
+import time
+
+from utils.normalizacion import normalizar_nombre
+
+
+def test_quita_sufijos_encadenados():
+    assert normalizar_nombre("García Abogados S.L.") == "garcia"
+    assert normalizar_nombre("Bufete Pérez & Asociados") == "bufete perez"
+
+
+def test_muchos_sufijos_no_se_dispara():
+    # Con el patrón anterior 22 sufijos tardaban varios segundos
+    nombre = "García " + "Abogado " * 200 + "S.L.P."
+    inicio = time.perf_counter()
+    assert normalizar_nombre(nombre) == "garcia"
+    assert normalizar_nombre(nombre + " Madrid").startswith("garcia abogado")
+    assert time.perf_counter() - inicio < 0.5
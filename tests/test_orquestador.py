@@ -0,0 +1,167 @@
+"""Pruebas de core/orquestador.py."""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from adapters.base import SearchAdapter, SearchResult
+from core.consolidador import Consolidador
+from core.orquestador import BusquedaConfig, Orquestador
+from utils.cache_consultas import get_cache
+from utils.limitador import obtener_limitador
+
+
+def test_sin_config_path_usa_los_limites_por_api(config_agentes, tmp_path):
+    Orquestador(data_dir=tmp_path / "data")
+
+    places = obtener_limitador("google_places")
+    assert (places.por_segundo, places.rafaga, places.max_paralelo) == (10, 20, 10)
+    # Sin valores propios, los de la sección busqueda del archivo
+    tavily = obtener_limitador("tavily")
+    assert (tavily.por_segundo, tavily.rafaga, tavily.max_paralelo) == (1, 3, 3)
+
+
+def test_sin_config_path_completa_el_archivo_con_defaults(config_agentes, tmp_path):
+    orquestador = Orquestador(data_dir=tmp_path / "data")
+    assert orquestador.config["apis"]["tavily"]["habilitado"] is True
+    assert orquestador.config["busqueda"]["max_resultados_por_query"] == 10
+    assert orquestador.config["apis"]["firecrawl"]["cache_ttl_horas"] == 168
+
+
+def test_sin_config_path_respeta_el_ttl_por_api(config_agentes, tmp_path):
+    Orquestador(data_dir=tmp_path / "data")
+
+    cache = get_cache()
+    assert cache.ttl_segundos("firecrawl") == 168 * 3600
+    assert cache.ttl_segundos("tavily") == 24 * 3600
+
+
+class AdapterLento(SearchAdapter):
+    """Tarda un poco en cada búsqueda y anota cuántas hay en curso a la vez."""
+
+    usar_cache = False
+
+    def __init__(self, fallar=()):
+        super().__init__("clave")
+        self.nombre = "tavily"
+        self.fallar = set(fallar)
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self._lock = threading.Lock()
+
+    def search(self, query, **kwargs):
+        with self._lock:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            time.sleep(0.05)
+            if query in self.fallar:
+                raise RuntimeError(f"fallo en {query}")
+            n = int(query[1:])
+            return [SearchResult(
+                nombre=f"Despacho Número {n}", telefono=[f"+34 91{n:07d}"], web=f"https://despacho{n}.es"
+            )]
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+
+PROMPTS = [f"p{n}" for n in range(1, 9)]
+
+
+def _buscar(tmp_path, modo_async, fallar=()):
+    orquestador = Orquestador(data_dir=tmp_path / ("async" if modo_async else "sync"))
+    orquestador.adapters = {"tavily": AdapterLento(fallar)}
+    orquestador.planificador.planificar = lambda ciudad, api, grupos: list(PROMPTS)
+    config = BusquedaConfig(ciudad="Madrid", apis_habilitadas=["tavily"], usar_places=False,
+                            scraping_profundo=False, max_resultados_por_api=100, modo_async=modo_async)
+    resultado = orquestador.ejecutar_busqueda(config)
+    return orquestador, resultado
+
+
+@pytest.mark.usefixtures("config_agentes", "tracker")
+def test_async_consolida_lo_mismo_que_sync(tmp_path):
+    _, sync = _buscar(tmp_path, False)
+    orquestador, asincrono = _buscar(tmp_path, True)
+
+    assert not asincrono.errores
+    assert asincrono.resultados_por_api == sync.resultados_por_api == {"tavily": len(PROMPTS)}
+    assert asincrono.consolidacion.to_dict() == sync.consolidacion.to_dict()
+    # Las llamadas se solapan, sin pasar de busqueda.max_paralelo
+    adapter = orquestador.adapters["tavily"]
+    assert 1 < adapter.max_en_curso <= orquestador.config["busqueda"]["max_paralelo"]
+
+
+@pytest.mark.usefixtures("config_agentes", "tracker")
+def test_async_un_fallo_no_corta_el_resto(tmp_path):
+    _, resultado = _buscar(tmp_path, True, fallar={"p3"})
+
+    assert not resultado.errores
+    assert resultado.resultados_por_api == {"tavily": len(PROMPTS) - 1}
+    assert resultado.consolidacion.total_nuevos == len(PROMPTS) - 1
+
+
+class AdapterPorCiudad(SearchAdapter):
+    """Un despacho distinto por prompt; los prompts llevan la ciudad."""
+
+    usar_cache = False
+
+    def __init__(self):
+        super().__init__("clave")
+        self.nombre = "tavily"
+
+    def search(self, query, **kwargs):
+        time.sleep(0.01)
+        ciudad, n = query.rsplit(" ", 1)
+        prefijo = {"Madrid": "91", "Sevilla": "95", "Bilbao": "94"}[ciudad]
+        return [SearchResult(
+            nombre=f"Despacho {ciudad} {n}", telefono=[f"+34 {prefijo}{int(n):07d}"],
+            web=f"https://{ciudad.lower()}{n}.es", ciudad=ciudad
+        )]
+
+
+def _orquestador_ciudades(tmp_path):
+    orquestador = Orquestador(data_dir=tmp_path / "data")
+    orquestador.adapters = {"tavily": AdapterPorCiudad()}
+    orquestador.planificador.planificar = lambda ciudad, api, grupos: [f"{ciudad} {n}" for n in range(1, 6)]
+    return orquestador
+
+
+def _registros(orquestador, ciudad):
+    return Consolidador(str(orquestador.data_dir / f"{ciudad.lower()}.json")).registros
+
+
+@pytest.mark.usefixtures("config_agentes", "tracker")
+def test_multiciudad_en_paralelo_no_mezcla_ciudades(tmp_path):
+    orquestador = _orquestador_ciudades(tmp_path)
+    ciudades = ["Madrid", "Sevilla", "Bilbao"]
+    resultados = orquestador.ejecutar_multiciudad(ciudades, paralelo=True, max_ciudades=3)
+
+    assert sorted(resultados) == sorted(ciudades)
+    for ciudad, resultado in resultados.items():
+        assert not resultado.errores
+        assert resultado.consolidacion.total_nuevos == 5
+        registros = _registros(orquestador, ciudad)
+        assert len(registros) == 5
+        assert {r["ciudad"] for r in registros} == {ciudad}
+
+    assert len({resultado.run_id for resultado in resultados.values()}) == 3
+    vista = json.loads((orquestador.data_dir / "registros_optimizados.json").read_text("utf-8"))
+    assert len(vista["registros"]) == 15
+
+
+@pytest.mark.usefixtures("config_agentes", "tracker")
+def test_misma_ciudad_a_la_vez_no_pierde_registros(tmp_path):
+    orquestador = _orquestador_ciudades(tmp_path)
+    otro = _orquestador_ciudades(tmp_path)
+    config = BusquedaConfig(ciudad="Madrid", apis_habilitadas=["tavily"], usar_places=False,
+                            scraping_profundo=False)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        resultados = list(executor.map(lambda o: o.ejecutar_busqueda(config), [orquestador, otro]))
+
+    # La segunda espera al bloqueo de la ciudad y ve lo que guardó la primera
+    assert sorted(r.consolidacion.total_nuevos for r in resultados) == [0, 5]
+    assert len(_registros(orquestador, "Madrid")) == 5
@@ -0,0 +1,120 @@
+"""Pruebas de core/pipeline.py."""
+import threading
+import time
+
+import pytest
+
+from adapters.base import SearchAdapter, SearchResult
+from core.orquestador import BusquedaConfig, Orquestador
+from core.pipeline import PipelineConsolidacion
+from utils.trazas import Traza, activar, desactivar, traza_actual
+
+
+def test_consolida_todo_en_orden_al_cerrar():
+    consumidos = []
+    with PipelineConsolidacion(lambda *lote: consumidos.append(lote), capacidad=2) as pipeline:
+        for n in range(10):
+            pipeline.publicar("tavily", f"p{n}", [n])
+    assert consumidos == [("tavily", f"p{n}", [n]) for n in range(10)]
+    assert pipeline.lotes == 10
+
+
+def test_cola_llena_frena_a_los_productores():
+    seguir = threading.Event()
+    publicados = []
+
+    def consumir(origen, consulta, resultados):
+        seguir.wait()
+
+    pipeline = PipelineConsolidacion(consumir, capacidad=2)
+    pipeline.iniciar()
+
+    def productor():
+        for n in range(5):
+            pipeline.publicar("tavily", f"p{n}", [])
+            publicados.append(n)
+
+    hilo = threading.Thread(target=productor)
+    hilo.start()
+    time.sleep(0.2)
+    # Uno en el consumidor y dos en la cola; el cuarto espera
+    assert publicados == [0, 1, 2]
+
+    seguir.set()
+    hilo.join()
+    pipeline.cerrar()
+    assert publicados == [0, 1, 2, 3, 4]
+    assert pipeline.lotes == 5
+
+
+def test_error_del_consumidor_llega_a_los_productores():
+    def consumir(origen, consulta, resultados):
+        if consulta == "p1":
+            raise ValueError("base corrupta")
+
+    pipeline = PipelineConsolidacion(consumir, capacidad=1)
+    pipeline.iniciar()
+    pipeline.publicar("tavily", "p0", [])
+    pipeline.publicar("tavily", "p1", [])
+    with pytest.raises(ValueError, match="base corrupta"):
+        for n in range(2, 50):
+            pipeline.publicar("tavily", f"p{n}", [])
+            time.sleep(0.01)
+    with pytest.raises(ValueError):
+        pipeline.cerrar()
+    assert pipeline.lotes == 1
+
+
+def test_cerrar_sin_propagar():
+    pipeline = PipelineConsolidacion(lambda *lote: 1 / 0)
+    pipeline.iniciar()
+    pipeline.publicar("tavily", "p0", [])
+    pipeline.cerrar(propagar=False)
+    assert isinstance(pipeline.error, ZeroDivisionError)
+
+
+def test_el_consumidor_hereda_la_traza_activa():
+    vistas = []
+    traza = Traza("Madrid")
+    token = activar(traza)
+    try:
+        with PipelineConsolidacion(lambda *lote: vistas.append(traza_actual())) as pipeline:
+            pipeline.publicar("tavily", "p0", [])
+    finally:
+        desactivar(token)
+    assert vistas == [traza]
+
+
+class AdapterFalso(SearchAdapter):
+    usar_cache = False
+
+    def __init__(self):
+        super().__init__("clave")
+        self.nombre = "tavily"
+        self.prompts = []
+
+    def search(self, query, **kwargs):
+        self.prompts.append(query)
+        time.sleep(0.01)
+        return [SearchResult(nombre=f"Despacho {query}", telefono=["+34 912 345 678"], web="https://d.es")]
+
+
+@pytest.mark.usefixtures("config_agentes", "tracker")
+def test_orquestador_deja_de_buscar_si_falla_la_consolidacion(tmp_path, monkeypatch):
+    orquestador = Orquestador(data_dir=tmp_path / "data")
+    orquestador.config["busqueda"]["cola_consolidacion"] = 1
+    orquestador.adapters = {"tavily": AdapterFalso()}
+    orquestador.planificador.planificar = lambda ciudad, api, grupos: [f"p{n}" for n in range(20)]
+
+    def consolidar_tarea(ejecucion, origen, consulta, resultados):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(orquestador, "_consolidar_tarea", consolidar_tarea)
+    resultado = orquestador.ejecutar_busqueda(BusquedaConfig(
+        ciudad="Madrid", apis_habilitadas=["tavily"], usar_places=False,
+        scraping_profundo=False, max_resultados_por_api=100
+    ))
+
+    assert resultado.errores == ["Error general: disco lleno"]
+    assert len(orquestador.adapters["tavily"].prompts) < 20
+    assert not (orquestador.data_dir / "madrid.json").exists()
@@ -0,0 +1,76 @@
+"""Pruebas de core/planificador.py."""
+from datetime import datetime, timedelta
+
+from core.planificador import RENDIMIENTO_INICIAL, PlanificadorConsultas
+
+
+GRUPOS = {"centro": ["c1", "c2", "c3"], "norte": ["n1", "n2"]}
+
+
+def _planificador(tmp_path, **config):
+    return PlanificadorConsultas(tmp_path / "rendimiento.json", {"max_queries_por_api": 10, **config})
+
+
+def test_sin_historial_alterna_los_grupos(tmp_path):
+    assert _planificador(tmp_path).planificar("Madrid", "tavily", GRUPOS) == ["c1", "n1", "c2", "n2", "c3"]
+
+
+def test_prioriza_los_prompts_que_aportan(tmp_path):
+    planificador = _planificador(tmp_path)
+    planificador.planificar("Madrid", "tavily", GRUPOS)
+    planificador.registrar("Madrid", "tavily", "c1", nuevos=0)
+    planificador.registrar("Madrid", "tavily", "n1", nuevos=6)
+
+    # Los no lanzados heredan la media de su grupo y, a igualdad, van antes
+    assert planificador.planificar("Madrid", "tavily", GRUPOS) == ["n2", "n1", "c2", "c3", "c1"]
+    assert planificador.planificar("Madrid", "tavily", GRUPOS, limite=2) == ["n2", "n1"]
+    # Cada ciudad y cada API llevan su propio historial
+    assert planificador.planificar("Sevilla", "tavily", GRUPOS)[:2] == ["c1", "n1"]
+    assert planificador.planificar("Madrid", "google_search", GRUPOS)[:2] == ["c1", "n1"]
+
+
+def test_api_saturada_solo_sondea(tmp_path):
+    planificador = _planificador(tmp_path, ventana_saturacion=3)
+    for prompt in ("c1", "n1", "c2"):
+        planificador.registrar("Madrid", "tavily", prompt, nuevos=0)
+
+    assert planificador.saturada("Madrid", "tavily")
+    assert len(planificador.planificar("Madrid", "tavily", GRUPOS)) == 1
+
+    planificador.registrar("Madrid", "tavily", "n2", nuevos=1)
+    assert not planificador.saturada("Madrid", "tavily")
+
+
+def test_historial_caducado_se_vuelve_a_explorar(tmp_path):
+    planificador = _planificador(tmp_path, ventana_saturacion=1)
+    planificador.registrar("Madrid", "tavily", "c1", nuevos=0)
+    antigua = (datetime.now() - timedelta(days=60)).isoformat()
+    stats = planificador.datos["ciudades"]["madrid"]["tavily"]
+    stats["ultima"] = stats["prompts"]["c1"]["ultima"] = antigua
+
+    assert not planificador.saturada("Madrid", "tavily")
+    assert planificador._esperado(stats, "c1", "centro") == RENDIMIENTO_INICIAL
+
+
+def test_ordena_apis_por_nuevos_por_dolar(tmp_path):
+    planificador = _planificador(tmp_path)
+    assert planificador.ordenar_apis("Madrid", ["google_search", "tavily"], GRUPOS) == ["tavily", "google_search"]
+
+    for prompt in ("c1", "c2", "c3", "n1", "n2"):
+        planificador.registrar("Madrid", "tavily", prompt, nuevos=0)
+        planificador.registrar("Madrid", "google_search", prompt, nuevos=5)
+    assert planificador.ordenar_apis("Madrid", ["tavily", "google_search"], GRUPOS) == ["google_search", "tavily"]
+
+
+def test_el_historial_se_guarda(tmp_path):
+    planificador = _planificador(tmp_path)
+    planificador.planificar("Madrid", "tavily", GRUPOS)
+    planificador.registrar("Madrid", "tavily", "n2", nuevos=4, dominios=3)
+    planificador.guardar()
+
+    recargado = _planificador(tmp_path)
+    assert recargado.planificar("Madrid", "tavily", GRUPOS) == ["n1", "n2", "c1", "c2", "c3"]
+    assert recargado.resumen("Madrid")["tavily"] == {
+        "consultas": 1, "nuevos": 4, "dominios": 3, "costo": 0.001,
+        "nuevos_por_consulta": 4.0, "nuevos_por_usd": 4000.0, "saturada": False,
+    }
@@ -0,0 +1,66 @@
+"""Pruebas de utils/presupuesto.py y de la reserva de cuota de los adapters."""
+import threading
+
+import pytest
+
+from adapters.base import SearchAdapter
+from core.orquestador import Orquestador
+from utils.presupuesto import PresupuestoAgotado, cuota_restante, reservar_cuota, topes_api
+
+
+class AdapterFalso(SearchAdapter):
+    """Reserva una request por búsqueda y llama a `respuesta`."""
+
+    usar_cache = False
+
+    def __init__(self, respuesta):
+        super().__init__("clave")
+        self.nombre = "google_search"
+        self.respuesta = respuesta
+
+    def search(self, query, **kwargs):
+        self.reservar_cuota()
+        return self.llamar_api(self.respuesta)
+
+
+def _usado(tracker, api="google_search"):
+    tracker.recargar()
+    return tracker.uso_periodo(api, "dia").get("requests", 0)
+
+
+def test_sin_config_path_respeta_los_topes_del_archivo(config_agentes, tracker, tmp_path):
+    Orquestador(data_dir=tmp_path / "data")
+    assert topes_api("google_search") == {"dia": 7}
+    assert topes_api("firecrawl") == {"mes": 50}
+
+
+def test_no_se_pasa_del_tope_con_varios_hilos(config_agentes, tracker):
+    rechazadas = []
+
+    def reservar():
+        try:
+            reservar_cuota("google_search")
+        except PresupuestoAgotado:
+            rechazadas.append(1)
+
+    hilos = [threading.Thread(target=reservar) for _ in range(12)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert _usado(tracker) == 7
+    assert len(rechazadas) == 5
+    assert cuota_restante("google_search") == 0
+
+
+def test_llamada_fallida_devuelve_la_cuota(config_agentes, tracker):
+    def falla():
+        raise TimeoutError("sin respuesta")
+
+    with pytest.raises(TimeoutError):
+        AdapterFalso(falla).search("abogados")
+    assert _usado(tracker) == 0
+
+    assert AdapterFalso(lambda: ["ok"]).search("abogados") == ["ok"]
+    assert _usado(tracker) == 1
@@ -0,0 +1,77 @@
+"""Pruebas de core/saturacion.py y de la parada anticipada del orquestador."""
+import time
+
+import pytest
+
+from adapters.base import SearchAdapter, SearchResult
+from core.orquestador import BusquedaConfig, Orquestador
+from core.saturacion import DetectorSaturacion
+
+
+def test_origen_saturado_al_llenar_la_ventana():
+    detector = DetectorSaturacion("Madrid", {"ventana_dominios": 3, "ventana_dominios_ciudad": 10})
+    detector.registrar("tavily", 10, 0)
+    detector.registrar("tavily", 10, 0)
+    assert not detector.parar("tavily")
+
+    detector.registrar("tavily", 10, 1)
+    assert detector.parar("tavily")
+    assert "1 dominios nuevos en 30 resultados" in detector.motivos["tavily"]
+    assert not detector.parar("google_search")
+    assert not detector.parar()
+
+
+def test_origen_que_aporta_no_se_para():
+    detector = DetectorSaturacion("Madrid", {"ventana_dominios": 2, "umbral_dominios_nuevos": 0.2})
+    for _ in range(5):
+        detector.registrar("tavily", 10, 2)
+    assert not detector.parar("tavily")
+
+
+def test_ciudad_saturada_corta_todos_los_origenes():
+    detector = DetectorSaturacion("Madrid", {"ventana_dominios": 5, "ventana_dominios_ciudad": 4})
+    for origen in ("tavily", "google_search", "google_places", "directorio"):
+        detector.registrar(origen, 5, 0)
+    assert detector.motivo_ciudad.startswith("ciudad saturada")
+    assert detector.parar() and detector.parar("firecrawl")
+    assert not detector.motivos
+
+
+def test_deshabilitado():
+    detector = DetectorSaturacion("Madrid", {"parada_anticipada": False, "ventana_dominios": 1})
+    detector.registrar("tavily", 10, 0)
+    assert not detector.parar("tavily")
+
+
+class AdapterRepetido(SearchAdapter):
+    """Siempre el mismo despacho: a partir de la segunda consulta no hay dominios nuevos."""
+
+    usar_cache = False
+
+    def __init__(self):
+        super().__init__("clave")
+        self.nombre = "tavily"
+        self.prompts = []
+
+    def search(self, query, **kwargs):
+        self.prompts.append(query)
+        time.sleep(0.02)  # da tiempo al consumidor a registrar la consulta anterior
+        return [SearchResult(nombre="García Abogados", telefono=["+34 912 345 678"], web="https://garcia.es")]
+
+
+@pytest.mark.parametrize("modo_async", [False, True])
+@pytest.mark.usefixtures("config_agentes", "tracker")
+def test_busqueda_para_cuando_la_api_satura(tmp_path, modo_async):
+    orquestador = Orquestador(data_dir=tmp_path / "data")
+    orquestador.config["busqueda"]["max_paralelo"] = 1
+    orquestador.adapters = {"tavily": AdapterRepetido()}
+    orquestador.planificador.planificar = lambda ciudad, api, grupos: [f"p{n}" for n in range(10)]
+
+    resultado = orquestador.ejecutar_busqueda(BusquedaConfig(
+        ciudad="Madrid", apis_habilitadas=["tavily"], usar_places=False,
+        scraping_profundo=False, max_resultados_por_api=100, modo_async=modo_async
+    ))
+
+    assert "tavily" in resultado.apis_saturadas
+    assert len(orquestador.adapters["tavily"].prompts) < 10
+    assert resultado.consolidacion.total_nuevos == 1
@@ -0,0 +1,40 @@
+"""Pruebas de utils/telefonos.py."""
+import pytest
+
+from utils.telefonos import (
+    canonicalizar_telefonos, claves_telefonos, clave_telefono, formatear_telefono, normalizar_telefono
+)
+
+
+@pytest.mark.parametrize("telefono", [
+    "912345678", "91 234 56 78", "912-345-678", "(91) 234.56.78",
+    "+34 912 345 678", "+34912345678", "0034 912345678", "34912345678",
+])
+def test_mismo_numero_misma_clave(telefono):
+    assert clave_telefono(telefono) == 34912345678
+    assert normalizar_telefono(telefono) == "+34 912 345 678"
+
+
+@pytest.mark.parametrize("telefono", ["", None, "12345", "512345678", "+34 512 345 678", "sin teléfono"])
+def test_no_reconocibles(telefono):
+    assert clave_telefono(telefono) == 0
+    assert normalizar_telefono(telefono) == ""
+
+
+def test_extranjeros_solo_con_prefijo_internacional():
+    assert clave_telefono("+33 1 23 45 67 89") == 33123456789
+    assert formatear_telefono(33123456789) == "+33123456789"
+    assert clave_telefono("0033 1 23 45 67 89") == 33123456789
+    assert clave_telefono("33 1 23 45 67 89") == 0
+
+
+def test_campo_telefono_como_texto_o_lista():
+    assert claves_telefonos("912345678") == {34912345678}
+    assert claves_telefonos(["912345678", "+34 912 345 678", "no", None]) == {34912345678}
+    assert claves_telefonos(None) == set()
+
+
+def test_canonicalizar_quita_repetidos_y_conserva_lo_desconocido():
+    assert canonicalizar_telefonos(["91 234 56 78", "+34912345678", "ext. 12", "600111222"]) == [
+        "+34 912 345 678", "ext. 12", "+34 600 111 222"
+    ]
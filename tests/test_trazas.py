@@ -0,0 +1,98 @@
+"""Pruebas de utils/trazas.py."""
+import asyncio
+import json
+
+import pytest
+
+from utils import trazas
+from utils.trazas import Traza, activar, anotar, desactivar, exportar_jsonl, exportar_prometheus, span
+
+
+@pytest.fixture
+def traza():
+    traza = Traza("Madrid", "run-1")
+    token = activar(traza)
+    yield traza
+    desactivar(token)
+
+
+def test_sin_traza_activa_no_registra():
+    with span("search", api="tavily") as datos:
+        datos["resultados"] = 3
+    anotar(cache="hit")
+    assert datos == {"api": "tavily", "resultados": 3}
+
+
+def test_spans_anidados_y_errores(traza):
+    with span("search", api="tavily") as datos:
+        with span("llamada_api", api="tavily"):
+            anotar(cache="miss")
+        datos["resultados"] = 2
+    with pytest.raises(ValueError):
+        with span("guardar"):
+            raise ValueError("disco lleno")
+
+    llamada, search, guardar = traza.spans
+    assert llamada["padre"] == search["id"] and search["padre"] is None
+    assert llamada["atributos"] == {"api": "tavily", "cache": "miss"}
+    assert search["atributos"]["resultados"] == 2
+    assert guardar["estado"] == "error" and guardar["error"] == "ValueError: disco lleno"
+
+    resumen = traza.resumen()
+    assert resumen["search:tavily"]["llamadas"] == 1
+    assert resumen["guardar"]["errores"] == 1
+
+
+def test_los_hilos_de_asyncio_heredan_la_traza(traza):
+    def llamada(n):
+        with span("search", api="tavily", n=n):
+            pass
+
+    async def lanzar():
+        with span("ciudad"):
+            await asyncio.gather(*(asyncio.to_thread(llamada, n) for n in range(3)))
+
+    asyncio.run(lanzar())
+    ciudad = traza.spans[-1]
+    assert sorted(s["atributos"]["n"] for s in traza.spans[:-1]) == [0, 1, 2]
+    assert all(s["padre"] == ciudad["id"] for s in traza.spans[:-1])
+
+
+def test_exportar_jsonl_anade_y_rota(traza, tmp_path, monkeypatch):
+    with span("filtro", entrada=5):
+        pass
+    path = tmp_path / "trazas.jsonl"
+    exportar_jsonl(traza, path)
+    exportar_jsonl(traza, path)
+    lineas = [json.loads(linea) for linea in path.read_text("utf-8").splitlines()]
+    assert len(lineas) == 2
+    assert lineas[0]["run_id"] == "run-1" and lineas[0]["ciudad"] == "Madrid"
+    assert lineas[0]["nombre"] == "filtro"
+
+    monkeypatch.setattr(trazas, "MAX_BYTES_JSONL", 10)
+    exportar_jsonl(traza, path)
+    assert len(path.with_name("trazas.jsonl.1").read_text("utf-8").splitlines()) == 2
+    assert len(path.read_text("utf-8").splitlines()) == 1
+
+
+def test_exportar_prometheus_acumula_entre_ejecuciones(traza, tmp_path):
+    with span("search", api="tavily") as datos:
+        datos["bytes"] = 100
+    path = tmp_path / "metricas.prom"
+    exportar_prometheus(traza, path, 1.5)
+    exportar_prometheus(traza, path, 2.25)
+
+    muestras = trazas._leer_metricas(path)
+    etiquetas = '{etapa="search",api="tavily"}'
+    assert muestras[("busqueda_span_segundos_count", etiquetas)] == 2
+    assert muestras[("busqueda_span_bytes_total", etiquetas)] == 200
+    assert muestras[("busqueda_span_errores_total", etiquetas)] == 0
+    assert muestras[("busqueda_span_segundos_bucket", '{etapa="search",api="tavily",le="+Inf"}')] == 2
+    assert muestras[("busqueda_ejecuciones_total", '{ciudad="madrid"}')] == 2
+    assert muestras[("busqueda_ejecucion_segundos", '{ciudad="madrid"}')] == 2.25
+
+    texto = path.read_text("utf-8")
+    assert "# TYPE busqueda_span_segundos histogram" in texto
+    buckets = [linea for linea in texto.splitlines() if linea.startswith("busqueda_span_segundos_bucket")]
+    assert buckets[0].startswith('busqueda_span_segundos_bucket{etapa="search",api="tavily",le="0.05"}')
+    assert buckets[-1].endswith('le="+Inf"} 2')
@@ -2,7 +2,9 @@
 Utilidades del sistema.
 """
 from .database import cargar_ciudad, guardar_ciudad, listar_ciudades
-from .validators import validar_email, validar_telefono, normalizar_telefono
+from .validators import validar_email, validar_telefono
+from .telefonos import normalizar_telefono, clave_telefono, canonicalizar_telefonos
+from .normalizacion import normalizar_nombre, extraer_dominio
 
 __all__ = [
     "cargar_ciudad",
@@ -11,4 +13,8 @@ __all__ = [
     "validar_email",
     "validar_telefono",
     "normalizar_telefono",
+    "clave_telefono",
+    "canonicalizar_telefonos",
+    "normalizar_nombre",
+    "extraer_dominio",
 ]
@@ -1,12 +1,22 @@
 """
 Tracker de uso y costos de APIs.
+
+data/api_usage.json se comparte entre hilos, procesos del CLI y sesiones de
+Streamlit: las escrituras se hacen dentro de APITracker.transaccion(), que
+bloquea data/api_usage.json.lock, relee el archivo y lo reemplaza de forma
+atómica.
 """
 import json
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, date
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
 from dataclasses import dataclass, field, asdict
 
+from utils.database import bloquear_archivo
+
 
 # Costos aproximados por API (USD)
 COSTOS_API = {
@@ -17,6 +27,7 @@ COSTOS_API = {
     "google_search": {
         "por_request": 0.005,  # $5 por 1000
         "limite_gratis": 100,  # por día
+        "periodo_limite": "dia",
     },
     "google_places": {
         "por_request": 0.017,  # aprox
@@ -34,6 +45,34 @@ COSTOS_API = {
 }
 
 
+def limites_api(api: str) -> Dict[str, int]:
+    """
+    Topes del plan gratis de una API por periodo ("dia" o "mes"), en la
+    unidad que cuenta la API (ver unidad_api).
+    """
+    costos = COSTOS_API.get(api, {})
+    limites = {}
+    if "limite_gratis" in costos:
+        limites[costos.get("periodo_limite", "mes")] = costos["limite_gratis"]
+    if "credito_gratis_mes" in costos and costos.get("por_request"):
+        limites["mes"] = int(costos["credito_gratis_mes"] / costos["por_request"])
+    return limites
+
+
+def unidad_api(api: str) -> str:
+    """Contador de uso que limita a una API: "creditos" o "requests"."""
+    return "creditos" if "por_credito" in COSTOS_API.get(api, {}) else "requests"
+
+
+def costo_consulta(api: str) -> float:
+    """Costo aproximado (USD) de una consulta a una API."""
+    costos = COSTOS_API.get(api, {})
+    for clave in ("por_request", "por_credito", "por_query_aprox"):
+        if clave in costos:
+            return costos[clave]
+    return 0.0
+
+
 @dataclass
 class APIUsage:
     """Uso de una API."""
@@ -54,9 +93,27 @@ class APITracker:
     
     def __init__(self, data_path: str = "data/api_usage.json"):
         self.data_path = Path(data_path)
+        self.lock_path = self.data_path.with_name(self.data_path.name + ".lock")
         self.usage: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
         self._cargar()
     
+    @contextmanager
+    def transaccion(self) -> Iterator[Dict[str, Any]]:
+        """
+        Lectura, cambio y escritura de self.usage sin que se cruce otro
+        hilo o proceso. Si el bloque lanza una excepción no se guarda nada.
+        """
+        with self._lock, bloquear_archivo(self.lock_path):
+            self._cargar()
+            yield self.usage
+            self._guardar()
+    
+    def recargar(self):
+        """Vuelve a leer el uso guardado por otros procesos."""
+        with self._lock:
+            self._cargar()
+    
     def _cargar(self):
         """Carga datos de uso existentes."""
         if self.data_path.exists():
@@ -74,10 +131,12 @@ class APITracker:
             }
     
     def _guardar(self):
-        """Guarda datos de uso."""
+        """Guarda datos de uso (archivo temporal + os.replace)."""
         self.data_path.parent.mkdir(exist_ok=True)
-        with open(self.data_path, "w", encoding="utf-8") as f:
+        tmp = self.data_path.with_name(self.data_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
             json.dump(self.usage, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.data_path)
     
     def registrar_uso(
         self,
@@ -88,6 +147,18 @@ class APITracker:
         tokens_output: int = 0
     ):
         """Registra uso de una API."""
+        with self.transaccion():
+            self.sumar_uso(api, requests, creditos, tokens_input, tokens_output)
+    
+    def sumar_uso(
+        self,
+        api: str,
+        requests: int = 1,
+        creditos: int = 0,
+        tokens_input: int = 0,
+        tokens_output: int = 0
+    ):
+        """Suma uso en memoria; llamar dentro de transaccion() para guardarlo."""
         hoy = date.today().isoformat()
         mes = date.today().strftime("%Y-%m")
         
@@ -138,8 +209,6 @@ class APITracker:
         self.usage["totales"][api]["requests"] += requests
         self.usage["totales"][api]["creditos"] += creditos
         self.usage["totales"][api]["costo"] += costo
-        
-        self._guardar()
     
     def _calcular_costo(
         self,
@@ -176,6 +245,11 @@ class APITracker:
         mes = mes or date.today().strftime("%Y-%m")
         return self.usage.get("mes_actual", {}).get(mes, {})
     
+    def uso_periodo(self, api: str, periodo: str) -> Dict[str, Any]:
+        """Uso de una API en el día ("dia") o el mes ("mes") en curso."""
+        uso = self.obtener_uso_dia() if periodo == "dia" else self.obtener_uso_mes()
+        return uso.get(api, {})
+    
     def obtener_totales(self) -> Dict[str, Any]:
         """Obtiene totales históricos."""
         return self.usage.get("totales", {})
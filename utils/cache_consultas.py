@@ -0,0 +1,199 @@
+"""
+Caché persistente de consultas a las APIs de búsqueda.
+
+Guarda en SQLite (data/cache_consultas.sqlite, modo WAL) los resultados de
+los métodos de búsqueda de los adapters, así que la comparten el CLI, los
+hilos del orquestador y las sesiones de Streamlit aunque sean procesos
+distintos. La clave es el hash de (API, método, consulta canonicalizada,
+parámetros).
+
+TTL por API en data/config_agentes.json: apis.<api>.cache_ttl_horas, o
+busqueda.cache_ttl_horas para todas (0 desactiva la caché de esa API).
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from utils.database import DATA_DIR, cargar_config_agentes
+
+
+CACHE_PATH = DATA_DIR / "cache_consultas.sqlite"
+TTL_POR_DEFECTO_HORAS = 24
+
+
+def canonicalizar_consulta(consulta: str) -> str:
+    """Consulta sin espacios sobrantes y sin distinguir mayúsculas."""
+    return " ".join(str(consulta).split()).casefold()
+
+
+class CacheConsultas:
+    """Caché de consultas en SQLite con TTL y contadores de aciertos por API."""
+
+    def __init__(self, db_path: Union[str, Path] = CACHE_PATH, config: Optional[Dict] = None):
+        """
+        Args:
+            db_path: Ruta de la base SQLite
+            config: Configuración de agentes (por defecto data/config_agentes.json)
+        """
+        self.db_path = Path(db_path)
+        self.config = config if config is not None else cargar_config_agentes()
+        self._inicializado = False
+        self._lock = threading.Lock()
+        self._bloqueos: Dict[str, threading.Lock] = {}
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Conexión nueva por operación: válida en cualquier hilo o proceso."""
+        if not self._inicializado:
+            with self._lock:
+                if not self._inicializado:
+                    self._crear_tablas()
+                    self._inicializado = True
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _crear_tablas(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS consultas (
+                    clave TEXT PRIMARY KEY,
+                    api TEXT NOT NULL,
+                    metodo TEXT NOT NULL,
+                    parametros TEXT NOT NULL,
+                    respuesta TEXT NOT NULL,
+                    creado REAL NOT NULL
+                )
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS contadores (
+                    api TEXT PRIMARY KEY,
+                    aciertos INTEGER NOT NULL DEFAULT 0,
+                    fallos INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+    def bloqueo(self, clave: str) -> threading.Lock:
+        """
+        Lock por clave dentro del proceso: si varios hilos piden a la vez la
+        misma consulta, solo uno llama a la API y el resto lee la caché.
+        """
+        with self._lock:
+            return self._bloqueos.setdefault(clave, threading.Lock())
+
+    def ttl_segundos(self, api: str) -> float:
+        """TTL configurado para una API (0 = sin caché)."""
+        config_api = self.config.get("apis", {}).get(api, {})
+        horas = config_api.get(
+            "cache_ttl_horas",
+            self.config.get("busqueda", {}).get("cache_ttl_horas", TTL_POR_DEFECTO_HORAS)
+        )
+        return float(horas) * 3600
+
+    @staticmethod
+    def clave(api: str, metodo: str, parametros: Dict[str, Any]) -> str:
+        """
+        Clave de caché de una llamada.
+
+        Args:
+            api: Nombre del adapter
+            metodo: Método llamado (search, extract_structured...)
+            parametros: Argumentos de la llamada por nombre
+
+        Returns:
+            Hash SHA-256 hexadecimal
+        """
+        canonicos = {
+            nombre: canonicalizar_consulta(valor) if nombre == "query" else valor
+            for nombre, valor in parametros.items()
+        }
+        texto = json.dumps([api, metodo, canonicos], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def obtener(self, api: str, clave: str) -> Optional[List[Dict]]:
+        """
+        Respuesta guardada y vigente, o None. Cuenta el acierto o el fallo.
+        """
+        ttl = self.ttl_segundos(api)
+        if ttl <= 0:
+            return None
+
+        try:
+            with closing(self._conectar()) as con, con:
+                fila = con.execute(
+                    "SELECT respuesta, creado FROM consultas WHERE clave = ?", (clave,)
+                ).fetchone()
+                acierto = fila is not None and time.time() - fila[1] < ttl
+                columna = "aciertos" if acierto else "fallos"
+                con.execute(
+                    f"INSERT INTO contadores (api, {columna}) VALUES (?, 1) "
+                    f"ON CONFLICT(api) DO UPDATE SET {columna} = {columna} + 1",
+                    (api,)
+                )
+            return json.loads(fila[0]) if acierto else None
+        except (sqlite3.Error, ValueError) as e:
+            print(f"[Cache] Error leyendo caché: {e}")
+            return None
+
+    def guardar(self, api: str, metodo: str, clave: str, parametros: Dict[str, Any], respuesta: List[Dict]):
+        """Guarda (o renueva) la respuesta de una llamada."""
+        if self.ttl_segundos(api) <= 0:
+            return
+
+        try:
+            with closing(self._conectar()) as con, con:
+                con.execute(
+                    "INSERT OR REPLACE INTO consultas VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        clave, api, metodo,
+                        json.dumps(parametros, ensure_ascii=False, default=str),
+                        json.dumps(respuesta, ensure_ascii=False),
+                        time.time(),
+                    )
+                )
+        except sqlite3.Error as e:
+            print(f"[Cache] Error guardando en caché: {e}")
+
+    def purgar(self) -> int:
+        """Borra las entradas caducadas. Devuelve cuántas se han borrado."""
+        ahora = time.time()
+        borradas = 0
+        with closing(self._conectar()) as con, con:
+            for (api,) in con.execute("SELECT DISTINCT api FROM consultas").fetchall():
+                borradas += con.execute(
+                    "DELETE FROM consultas WHERE api = ? AND creado < ?",
+                    (api, ahora - self.ttl_segundos(api))
+                ).rowcount
+        return borradas
+
+    def estadisticas(self) -> Dict[str, Dict[str, int]]:
+        """Aciertos, fallos y entradas guardadas por API."""
+        with closing(self._conectar()) as con:
+            stats = {
+                api: {"aciertos": aciertos, "fallos": fallos, "entradas": 0}
+                for api, aciertos, fallos in con.execute("SELECT api, aciertos, fallos FROM contadores")
+            }
+            for api, entradas in con.execute("SELECT api, COUNT(*) FROM consultas GROUP BY api"):
+                stats.setdefault(api, {"aciertos": 0, "fallos": 0, "entradas": 0})["entradas"] = entradas
+        return stats
+
+
+# Instancia global
+_cache: Optional[CacheConsultas] = None
+
+
+def get_cache() -> CacheConsultas:
+    """Obtiene instancia global de la caché."""
+    global _cache
+    if _cache is None:
+        _cache = CacheConsultas()
+    return _cache
+
+
+def configurar_cache(config: Dict):
+    """Aplica la configuración (TTL por API) a la caché global."""
+    get_cache().config = config
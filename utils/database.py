@@ -2,12 +2,432 @@
 Funciones de acceso a la base de datos JSON.
 """
 import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional, Iterable, Tuple, Union
 from datetime import datetime
 
+try:
+    import fcntl
+    FCNTL_DISPONIBLE = True
+except ImportError:  # Windows
+    import msvcrt
+    FCNTL_DISPONIBLE = False
+
 
 DATA_DIR = Path(__file__).parent.parent / "data"
+CONFIG_AGENTES = DATA_DIR / "config_agentes.json"
+
+# Journal de cambios: <ciudad>.journal.jsonl junto al snapshot <ciudad>.json.
+# La primera línea identifica el snapshot al que se aplican las demás
+# ({"base": token}); cada línea siguiente es {"op", "idx", "registro"}.
+SUFIJO_JOURNAL = ".journal.jsonl"
+
+# Versión del archivo leída por cargar_archivo (no se guarda en disco): si al
+# guardar ya no coincide, otro proceso ha escrito entretanto
+CLAVE_VERSION = "version_archivo"
+
+# Segundos que espera guardar_archivo al bloqueo de una ciudad que se está
+# editando con datos leídos antes (p. ej. una página durante una búsqueda)
+ESPERA_BLOQUEO_EDICION = 10
+
+
+class ArchivoModificado(Exception):
+    """El archivo de la ciudad ha cambiado (o está en uso) desde que se leyó."""
+
+
+def ruta_bloqueo(archivo: Union[str, Path]) -> Path:
+    """Archivo de bloqueo de una ciudad (<ciudad>.json.lock)."""
+    archivo = Path(archivo)
+    return archivo.with_name(archivo.name + ".lock")
+
+
+def version_archivo(archivo: Union[str, Path]) -> str:
+    """Identifica el estado en disco de una ciudad (snapshot y journal) sin leerla."""
+    archivo = Path(archivo)
+    partes = []
+    for ruta in (archivo, ruta_journal(archivo)):
+        try:
+            estado = ruta.stat()
+            partes.append(f"{estado.st_mtime_ns}-{estado.st_size}")
+        except FileNotFoundError:
+            partes.append("-")
+    return ":".join(partes)
+
+
+def ruta_journal(archivo: Union[str, Path]) -> Path:
+    """Ruta del journal asociado a un archivo de ciudad."""
+    archivo = Path(archivo)
+    return archivo.with_name(archivo.stem + SUFIJO_JOURNAL)
+
+
+def _leer_journal(journal: Path, token: Optional[str]) -> Tuple[List[Dict], bool]:
+    """
+    Lee las operaciones de un journal.
+
+    Args:
+        journal: Ruta del journal
+        token: Token del snapshot (metadata.journal_base)
+
+    Returns:
+        (operaciones, valido). valido=False si el journal pertenece a
+        otro snapshot y no debe aplicarse.
+    """
+    operaciones = []
+    with open(journal, "r", encoding="utf-8") as f:
+        cabecera = f.readline()
+        try:
+            base = json.loads(cabecera).get("base")
+        except (json.JSONDecodeError, AttributeError):
+            base = None
+        if not token or base != token:
+            return [], False
+
+        for linea in f:
+            if not linea.endswith("\n"):
+                # Última línea a medio escribir (caída durante el append)
+                break
+            try:
+                operaciones.append(json.loads(linea))
+            except json.JSONDecodeError:
+                # Resto de un append interrumpido, cerrado por el siguiente
+                continue
+    return operaciones, True
+
+
+def leer_journal(archivo: Union[str, Path], token: Optional[str]) -> List[Dict]:
+    """
+    Devuelve las operaciones pendientes del journal de un snapshot.
+
+    Un journal de otro snapshot (p. ej. tras reescribir el JSON a mano) se
+    renombra a .huerfano para no perderlo ni aplicarlo dos veces.
+
+    Args:
+        archivo: Ruta del snapshot
+        token: metadata.journal_base del snapshot cargado
+
+    Returns:
+        Lista de operaciones {"op", "idx", "registro"} en orden
+    """
+    journal = ruta_journal(archivo)
+    if not journal.exists():
+        return []
+
+    operaciones, valido = _leer_journal(journal, token)
+    if not valido:
+        huerfano = journal.with_name(journal.name + ".huerfano")
+        os.replace(journal, huerfano)
+        print(f"[Journal] {journal.name} no corresponde al snapshot, movido a {huerfano.name}")
+        return []
+    return operaciones
+
+
+def aplicar_operacion(registros: List[Dict], op: Dict) -> Tuple[int, Optional[Dict]]:
+    """
+    Aplica una operación del journal sobre la lista de registros.
+
+    Args:
+        registros: Registros del snapshot, se modifican in situ
+        op: Operación {"op", "idx", "registro"}
+
+    Returns:
+        (idx, registro_anterior). registro_anterior es None si se agregó.
+
+    Raises:
+        ValueError: Si la operación está mal formada o idx no es una
+            posición existente ni la siguiente libre
+    """
+    if (not isinstance(op, dict) or not isinstance(op.get("registro"), dict)
+            or type(op.get("idx")) is not int):
+        raise ValueError("operación mal formada")
+    idx = op["idx"]
+    if 0 <= idx < len(registros):
+        anterior = registros[idx]
+        registros[idx] = op["registro"]
+        return idx, anterior
+    if idx == len(registros) and op.get("op") == "agregar":
+        registros.append(op["registro"])
+        return idx, None
+    raise ValueError(f"operación fuera de rango (idx={idx})")
+
+
+def reproducir_journal(
+    archivo: Union[str, Path],
+    token: Optional[str],
+    registros: List[Dict],
+    al_aplicar: Optional[Callable[[int, Optional[Dict]], None]] = None,
+) -> Tuple[int, bool]:
+    """
+    Aplica sobre los registros del snapshot las operaciones de su journal.
+
+    Es la única reproducción del journal (cargar_archivo y el Consolidador
+    la comparten). Las líneas a medio escribir ya las descarta
+    leer_journal. La primera operación que no se puede aplicar corta la
+    reproducción: las siguientes se escribieron sobre un estado que ya no
+    se puede reconstruir, así que se ignoran y se avisa. El journal no se
+    toca; el siguiente snapshot completo lo sustituye.
+
+    Args:
+        archivo: Ruta del snapshot
+        token: metadata.journal_base del snapshot cargado
+        registros: Registros del snapshot, se modifican in situ
+        al_aplicar: Se llama con (idx, registro_anterior) tras cada operación
+
+    Returns:
+        (aplicadas, completo). completo=False si se cortó en una operación
+        no válida.
+    """
+    operaciones = leer_journal(archivo, token)
+    for aplicadas, op in enumerate(operaciones):
+        try:
+            idx, anterior = aplicar_operacion(registros, op)
+        except ValueError as e:
+            print(f"[Journal] {ruta_journal(archivo).name}: operación {aplicadas + 1} no válida ({e}), "
+                  f"se ignoran {len(operaciones) - aplicadas} operaciones desde ahí")
+            return aplicadas, False
+        if al_aplicar:
+            al_aplicar(idx, anterior)
+    return len(operaciones), True
+
+
+def aplicar_journal(data: Dict[str, Any], archivo: Union[str, Path]) -> int:
+    """
+    Aplica sobre data (snapshot ya cargado) los cambios pendientes del journal.
+
+    Args:
+        data: Dict con metadata y registros, se modifica in situ
+        archivo: Ruta del snapshot
+
+    Returns:
+        Número de operaciones aplicadas (ver reproducir_journal)
+    """
+    registros = data.setdefault("registros", [])
+    aplicadas, _ = reproducir_journal(archivo, data.get("metadata", {}).get("journal_base"), registros)
+    if aplicadas:
+        data["metadata"]["total_registros"] = len(registros)
+    return aplicadas
+
+
+def leer_snapshot(archivo: Union[str, Path]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Lee el JSON de una ciudad sin aplicar el journal.
+
+    Args:
+        archivo: Ruta del JSON de la ciudad
+
+    Returns:
+        (data, firma). firma identifica la versión exacta del archivo
+        leído (mtime, tamaño y CRC32 del contenido).
+    """
+    archivo = Path(archivo)
+    estado = archivo.stat()
+    with open(archivo, "rb") as f:
+        contenido = f.read()
+    data = json.loads(contenido)
+    data.setdefault("metadata", {})
+    return data, _firma(estado, contenido)
+
+
+def _firma(estado: os.stat_result, contenido: bytes) -> Dict[str, int]:
+    return {
+        "mtime_ns": estado.st_mtime_ns,
+        "tamano": estado.st_size,
+        "crc32": zlib.crc32(contenido),
+    }
+
+
+def cargar_archivo(archivo: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Carga un archivo de ciudad aplicando su journal, si lo tiene.
+
+    Args:
+        archivo: Ruta del JSON de la ciudad
+
+    Returns:
+        Dict con metadata y registros. metadata.version_archivo identifica
+        lo leído para que guardar_archivo detecte escrituras intermedias
+    """
+    # Antes de leer: si cambia durante la lectura, guardar lo detecta igual
+    version = version_archivo(archivo)
+    data, _ = leer_snapshot(archivo)
+    aplicar_journal(data, archivo)
+    data["metadata"][CLAVE_VERSION] = version
+    return data
+
+
+def guardar_archivo(archivo: Union[str, Path], data: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Escribe el snapshot completo de forma atómica y descarta el journal.
+
+    Se escribe a un temporal y se renombra, así una caída a mitad de
+    escritura deja intacto el archivo anterior. data debe incluir ya los
+    cambios del journal (cargado con cargar_archivo).
+
+    Escribe con el bloqueo de la ciudad (el mismo que toma el orquestador
+    durante una búsqueda). Si data viene de cargar_archivo y el archivo ha
+    cambiado desde entonces, no se escribe: se perderían esos cambios.
+
+    Args:
+        archivo: Ruta del JSON de la ciudad
+        data: Dict con metadata y registros
+
+    Returns:
+        Firma del archivo escrito (ver leer_snapshot)
+
+    Raises:
+        ArchivoModificado: Si el archivo cambió desde que se leyó, o si
+            sigue bloqueado (búsqueda en curso) pasados ESPERA_BLOQUEO_EDICION s
+    """
+    archivo = Path(archivo)
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    metadata = data.setdefault("metadata", {})
+    leida = metadata.pop(CLAVE_VERSION, None)
+
+    try:
+        with bloquear_archivo(ruta_bloqueo(archivo), espera=ESPERA_BLOQUEO_EDICION if leida else None):
+            if leida and version_archivo(archivo) != leida:
+                metadata[CLAVE_VERSION] = leida
+                raise ArchivoModificado(f"{archivo.name} ha cambiado desde que se leyó")
+
+            metadata["journal_base"] = uuid.uuid4().hex
+            contenido = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+            temporal = archivo.with_name(archivo.name + ".tmp")
+            with open(temporal, "wb") as f:
+                f.write(contenido)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, archivo)
+
+            # El journal antiguo ya está incluido en el snapshot
+            ruta_journal(archivo).unlink(missing_ok=True)
+            if leida:
+                metadata[CLAVE_VERSION] = version_archivo(archivo)
+            return _firma(archivo.stat(), contenido)
+    except TimeoutError:
+        metadata[CLAVE_VERSION] = leida
+        raise ArchivoModificado(f"{archivo.name} está en uso (¿búsqueda en curso?)")
+
+
+def anexar_journal(archivo: Union[str, Path], token: str, operaciones: Iterable[Dict]) -> int:
+    """
+    Añade operaciones al journal de un archivo de ciudad.
+
+    Escribe una línea JSON compacta por operación y hace fsync, de modo que
+    el coste es proporcional al cambio y no al tamaño de la base.
+
+    Args:
+        archivo: Ruta del snapshot
+        token: metadata.journal_base del snapshot sobre el que se aplican
+        operaciones: Dicts {"op": "agregar"|"actualizar", "idx", "registro"}
+
+    Returns:
+        Tamaño del journal en bytes tras escribir
+    """
+    with bloquear_archivo(ruta_bloqueo(archivo)):
+        return _anexar_journal(ruta_journal(archivo), token, operaciones)
+
+
+def _anexar_journal(journal: Path, token: str, operaciones: Iterable[Dict]) -> int:
+    lineas = [json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n" for op in operaciones]
+    if not journal.exists():
+        lineas.insert(0, json.dumps({"base": token}) + "\n")
+    else:
+        with open(journal, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            truncado = False
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                truncado = f.read(1) != b"\n"
+        if truncado:
+            # Cerrar la línea a medias de un append anterior interrumpido
+            lineas.insert(0, "\n")
+
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write("".join(lineas))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+# Bloqueos que ya tiene cada hilo (ruta -> profundidad), para que sean reentrantes
+_bloqueos_hilo = threading.local()
+
+
+@contextmanager
+def bloquear_archivo(path: Union[str, Path], espera: Optional[float] = None):
+    """
+    Bloqueo exclusivo entre procesos sobre un archivo auxiliar.
+
+    Es reentrante en el mismo hilo: el orquestador bloquea la ciudad durante
+    toda la búsqueda y el consolidador vuelve a pedirlo al guardar. Otros
+    hilos y procesos esperan.
+
+    Args:
+        path: Archivo de bloqueo
+        espera: Segundos como mucho (None = esperar lo que haga falta)
+
+    Raises:
+        TimeoutError: Si pasan `espera` segundos sin conseguirlo
+    """
+    path = Path(path)
+    clave = str(path.resolve())
+    tomados = _bloqueos_hilo.__dict__.setdefault("tomados", {})
+    if clave in tomados:
+        tomados[clave] += 1
+        try:
+            yield
+        finally:
+            tomados[clave] -= 1
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    limite = None if espera is None else time.monotonic() + espera
+    with open(path, "a+b") as f:
+        if FCNTL_DISPONIBLE:
+            modo = fcntl.LOCK_EX if limite is None else fcntl.LOCK_EX | fcntl.LOCK_NB
+            while True:
+                try:
+                    fcntl.flock(f.fileno(), modo)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= limite:
+                        raise TimeoutError(f"{path.name} bloqueado")
+                    time.sleep(0.1)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK se rinde tras 10 s; seguir esperando si no hay límite
+                    if limite is not None and time.monotonic() >= limite:
+                        raise TimeoutError(f"{path.name} bloqueado")
+        tomados[clave] = 1
+        try:
+            yield
+        finally:
+            del tomados[clave]
+            if FCNTL_DISPONIBLE:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def cargar_config_agentes() -> Dict[str, Any]:
+    """Configuración de data/config_agentes.json ({} si no existe o no se puede leer)."""
+    try:
+        with open(CONFIG_AGENTES, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
 
 def cargar_ciudad(ciudad: str) -> Dict[str, Any]:
@@ -33,8 +453,7 @@ def cargar_ciudad(ciudad: str) -> Dict[str, Any]:
         }
     
     try:
-        with open(archivo, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return cargar_archivo(archivo)
     except Exception as e:
         print(f"Error cargando {ciudad}: {e}")
         return {"metadata": {}, "registros": []}
@@ -59,8 +478,7 @@ def guardar_ciudad(ciudad: str, data: Dict[str, Any]) -> bool:
     data["metadata"]["total_registros"] = len(data.get("registros", []))
     
     try:
-        with open(archivo, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        guardar_archivo(archivo, data)
         return True
     except Exception as e:
         print(f"Error guardando {ciudad}: {e}")
@@ -84,8 +502,7 @@ def listar_ciudades() -> List[Dict[str, Any]]:
             continue
         
         try:
-            with open(archivo, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = cargar_archivo(archivo)
             
             registros = data.get("registros", [])
             
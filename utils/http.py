@@ -0,0 +1,131 @@
+"""
+Sesiones HTTP compartidas (requests) con pool de conexiones y reintentos.
+
+Un requests.get suelto abre una conexión TCP + TLS nueva en cada llamada.
+Las sesiones de este módulo se comparten entre todos los hilos del proceso
+y mantienen las conexiones abiertas (un pool por host), piden las
+respuestas comprimidas con gzip y reintentan los errores transitorios
+(5xx, conexión caída) con backoff exponencial y jitter.
+
+Perfiles:
+    "api" -> APIs de Google (adapters/google_adapter.py). El 429 no se
+             reintenta aquí: lo gestiona SearchAdapter.llamar_api, que
+             pausa la API para todos los hilos con el limitador compartido.
+    "web" -> webs de despachos (pages/4_Enriquecer.py), con User-Agent de
+             navegador y menos reintentos para no bloquear la página.
+
+Configuración (data/config_agentes.json, sección "http"):
+    pool_conexiones, reintentos, backoff_segundos, jitter_segundos
+
+Uso:
+    respuesta = get_sesion().get(url, params=params, timeout=30)
+"""
+import importlib.util
+import threading
+from typing import Dict, Optional
+
+from utils.database import cargar_config_agentes
+
+# requests se importa al crear la primera sesión (ver scripts/medir_importacion.py)
+REQUESTS_DISPONIBLE = importlib.util.find_spec("requests") is not None
+
+POOL_CONEXIONES = 10        # conexiones abiertas por host
+REINTENTOS = 3
+BACKOFF_SEGUNDOS = 0.5      # 0.5, 1, 2... entre reintentos
+JITTER_SEGUNDOS = 0.5       # aleatorio añadido a cada espera
+ESTADOS_REINTENTABLES = (500, 502, 503, 504)
+
+# Google solo comprime la respuesta si el User-Agent contiene "gzip"
+USER_AGENT_API = "evergreen-scraper/1.0 (gzip)"
+USER_AGENT_WEB = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+PERFILES = {
+    "api": {"User-Agent": USER_AGENT_API, "reintentos": None},
+    "web": {"User-Agent": USER_AGENT_WEB, "reintentos": 1},
+}
+
+
+def crear_sesion(
+    user_agent: str = USER_AGENT_API,
+    pool: int = POOL_CONEXIONES,
+    reintentos: int = REINTENTOS,
+    backoff: float = BACKOFF_SEGUNDOS,
+    jitter: float = JITTER_SEGUNDOS,
+) -> "requests.Session":
+    """
+    Crea una sesión con pool de conexiones, gzip y reintentos.
+
+    Args:
+        user_agent: Cabecera User-Agent de todas las peticiones
+        pool: Conexiones que se mantienen abiertas por host (las llamadas
+            simultáneas por encima de este número abren una y la cierran)
+        reintentos: Reintentos ante 5xx o errores de conexión (solo GET)
+        backoff: Base del backoff exponencial en segundos
+        jitter: Segundos aleatorios como mucho añadidos a cada espera
+
+    Returns:
+        requests.Session lista para compartir entre hilos
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    reintento = Retry(
+        total=reintentos,
+        backoff_factor=backoff,
+        backoff_jitter=jitter,
+        status_forcelist=ESTADOS_REINTENTABLES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # agotados los reintentos se devuelve la última respuesta
+    )
+    adaptador = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=reintento)
+
+    sesion = requests.Session()
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    sesion.headers.update({"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate"})
+    return sesion
+
+
+_sesiones: Dict[str, "requests.Session"] = {}
+_config: Optional[Dict] = None
+_lock = threading.Lock()
+
+
+def configurar_http(config: Dict):
+    """
+    Fija la configuración de las sesiones del proceso.
+
+    Las sesiones ya creadas se sustituyen; las llamadas en curso terminan
+    con las anteriores.
+
+    Args:
+        config: Configuración completa (con sección "http")
+    """
+    global _config
+    with _lock:
+        _config = config
+        _sesiones.clear()
+
+
+def get_sesion(perfil: str = "api") -> "requests.Session":
+    """Sesión compartida de un perfil ("api" o "web"); se crea la primera vez."""
+    global _config
+    if not REQUESTS_DISPONIBLE:
+        raise ImportError("requests no está instalado")
+    with _lock:
+        if perfil not in _sesiones:
+            if _config is None:
+                _config = cargar_config_agentes()
+            http = _config.get("http", {})
+            ajustes = PERFILES[perfil]
+            reintentos = ajustes["reintentos"]
+            _sesiones[perfil] = crear_sesion(
+                user_agent=ajustes["User-Agent"],
+                pool=http.get("pool_conexiones", POOL_CONEXIONES),
+                reintentos=http.get("reintentos", REINTENTOS) if reintentos is None else reintentos,
+                backoff=http.get("backoff_segundos", BACKOFF_SEGUNDOS),
+                jitter=http.get("jitter_segundos", JITTER_SEGUNDOS),
+            )
+        return _sesiones[perfil]
@@ -0,0 +1,179 @@
+"""
+Limitador de tasa compartido por API.
+
+Cada API tiene un cubo de tokens (ritmo sostenido más una ráfaga) y un tope
+de llamadas simultáneas, comunes a todos los hilos del proceso. Los adapters
+lo usan a través de SearchAdapter.llamar_api().
+
+Configuración (data/config_agentes.json):
+    busqueda.delay_entre_requests_ms  -> ritmo por defecto (1 llamada cada N ms)
+    busqueda.max_paralelo             -> llamadas simultáneas por defecto
+    apis.<api>.delay_entre_requests_ms, apis.<api>.max_paralelo, apis.<api>.rafaga
+                                      -> valores propios de una API
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from utils.database import cargar_config_agentes
+
+
+DELAY_POR_DEFECTO = 1.0  # segundos entre llamadas
+MAX_PARALELO_POR_DEFECTO = 3
+ESPERA_429 = 5.0  # segundos de pausa tras un 429 sin Retry-After
+REINTENTOS_429 = 2
+
+
+class LimitadorTasa:
+    """Cubo de tokens más semáforo de concurrencia para una API."""
+
+    def __init__(self, api: str, por_segundo: float, rafaga: int, max_paralelo: int):
+        """
+        Args:
+            api: Nombre de la API (solo informativo)
+            por_segundo: Llamadas sostenidas por segundo (0 = sin límite)
+            rafaga: Llamadas que pueden salir seguidas con el cubo lleno
+            max_paralelo: Llamadas simultáneas como máximo
+        """
+        self.api = api
+        self.por_segundo = por_segundo
+        self.rafaga = max(1, rafaga)
+        self.max_paralelo = max(1, max_paralelo)
+
+        self._lock = threading.Lock()
+        self._semaforo = threading.BoundedSemaphore(self.max_paralelo)
+        self._tokens = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+        return False
+
+    def adquirir(self):
+        """Espera a tener hueco de concurrencia y un token."""
+        self._semaforo.acquire()
+        try:
+            self._esperar_token()
+        except BaseException:
+            self._semaforo.release()
+            raise
+
+    def liberar(self):
+        self._semaforo.release()
+
+    def penalizar(self, segundos: float):
+        """Pausa la API para todos los hilos (p. ej. tras un 429) y vacía el cubo."""
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+            self._tokens = 0.0
+
+    def _esperar_token(self):
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                if ahora < self._pausa_hasta:
+                    espera = self._pausa_hasta - ahora
+                elif self.por_segundo <= 0:
+                    return
+                else:
+                    self._tokens = min(
+                        self.rafaga,
+                        self._tokens + (ahora - max(self._ultimo, self._pausa_hasta)) * self.por_segundo
+                    )
+                    self._ultimo = ahora
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    espera = (1 - self._tokens) / self.por_segundo
+            time.sleep(espera)
+
+
+_limitadores: Dict[str, LimitadorTasa] = {}
+_config: Optional[Dict] = None
+_lock_registro = threading.Lock()
+
+
+def configurar_limitadores(config: Dict):
+    """
+    Fija la configuración de los limitadores del proceso.
+
+    Los limitadores ya creados se sustituyen; las llamadas en curso terminan
+    con los anteriores.
+
+    Args:
+        config: Configuración completa (con secciones "busqueda" y "apis")
+    """
+    global _config
+    with _lock_registro:
+        _config = config
+        _limitadores.clear()
+
+
+def obtener_limitador(api: str) -> LimitadorTasa:
+    """Limitador compartido de una API (se crea la primera vez)."""
+    global _config
+    with _lock_registro:
+        if api not in _limitadores:
+            if _config is None:
+                _config = cargar_config_agentes()
+            _limitadores[api] = LimitadorTasa(api, *_parametros(api, _config))
+        return _limitadores[api]
+
+
+def _delay(config: Dict) -> Optional[float]:
+    if "delay_entre_requests_ms" in config:
+        return config["delay_entre_requests_ms"] / 1000
+    if "delay_entre_requests" in config:
+        return float(config["delay_entre_requests"])
+    return None
+
+
+def _parametros(api: str, config: Dict) -> Tuple[float, int, int]:
+    """(por_segundo, rafaga, max_paralelo) de una API según la configuración."""
+    busqueda = config.get("busqueda", {})
+    config_api = config.get("apis", {}).get(api, {})
+
+    delay = _delay(config_api)
+    if delay is None:
+        delay = _delay(busqueda)
+    if delay is None:
+        delay = DELAY_POR_DEFECTO
+
+    max_paralelo = config_api.get("max_paralelo", busqueda.get("max_paralelo", MAX_PARALELO_POR_DEFECTO))
+    rafaga = config_api.get("rafaga", max_paralelo)
+    por_segundo = 1 / delay if delay > 0 else 0
+    return por_segundo, rafaga, max_paralelo
+
+
+def es_limite_superado(resultado: Any) -> bool:
+    """
+    True si una respuesta o excepción corresponde a un HTTP 429, o al 403
+    rateLimitExceeded / userRateLimitExceeded con el que las APIs de Google
+    avisan de exceso de ritmo (dailyLimitExceeded no: reintentar no sirve).
+    """
+    for objeto in (resultado, getattr(resultado, "response", None)):
+        estado = getattr(objeto, "status_code", None)
+        if estado == 429:
+            return True
+        if estado == 403 and "ratelimitexceeded" in (getattr(objeto, "text", "") or "").lower():
+            return True
+    if isinstance(resultado, Exception):
+        texto = str(resultado).lower()
+        return "429" in texto or "rate limit" in texto
+    return False
+
+
+def segundos_reintento(resultado: Any, intento: int) -> float:
+    """Espera antes de reintentar: Retry-After si viene, si no backoff exponencial."""
+    for objeto in (resultado, getattr(resultado, "response", None)):
+        cabeceras = getattr(objeto, "headers", None) or {}
+        try:
+            return float(cabeceras.get("Retry-After"))
+        except (TypeError, ValueError, AttributeError):
+            pass
+    return ESPERA_429 * 2 ** intento
@@ -0,0 +1,111 @@
+"""
+Normalización compartida para comparar registros.
+Usada por el consolidador, la página de depuración y el optimizador.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# Sufijos que no distinguen un despacho de otro (más largos primero)
+SUFIJOS_NOMBRE = [
+    "& asociados", "y asociados", "asociados",
+    "abogados", "abogado", "despacho", "bufete",
+    "s.l.p.", "s.l.", "s.c.", "s.a.",
+    "lawyers", "legal", "law",
+]
+
+# Uno o varios sufijos al final del nombre, con punto opcional. El espacio
+# final va fuera de la repetición: dentro, "\s*\s*" entre dos sufijos admite
+# muchos repartos y un nombre con muchos sufijos tarda exponencialmente
+_PATRON_SUFIJOS = re.compile(
+    r'(?:\s*(?:' + "|".join(re.escape(s) for s in SUFIJOS_NOMBRE) + r')\.?)+\s*$'
+)
+_PATRON_NO_PALABRA = re.compile(r'[^\w\s]')
+
+
+def quitar_acentos(texto: str) -> str:
+    """Elimina tildes y diacríticos (á -> a, ñ -> n, ç -> c)."""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=65536)
+def normalizar_nombre(nombre: str) -> str:
+    """
+    Normaliza un nombre de despacho para comparación.
+
+    Minúsculas, sin acentos, sin sufijos genéricos (abogados, S.L., ...),
+    sin signos y con espacios simples. El resultado se puede pasar tal
+    cual a los scorers de rapidfuzz (sin processor).
+
+    Args:
+        nombre: Nombre a normalizar
+
+    Returns:
+        Nombre normalizado o string vacío
+    """
+    if not nombre:
+        return ""
+
+    nombre = quitar_acentos(nombre.lower().strip())
+    nombre = _PATRON_SUFIJOS.sub("", nombre)
+    nombre = _PATRON_NO_PALABRA.sub("", nombre)
+
+    return " ".join(nombre.split())
+
+
+def extraer_dominio(url: str) -> str:
+    """
+    Extrae el dominio de una URL (sin protocolo, www, ruta ni query).
+
+    Args:
+        url: URL completa o parcial
+
+    Returns:
+        Dominio en minúsculas o string vacío
+    """
+    if not url:
+        return ""
+    url = url.lower().replace("https://", "").replace("http://", "").replace("www.", "")
+    return url.split("/")[0].split("?")[0].strip()
+
+
+# Parámetros de query que no cambian la página (seguimiento de campañas)
+PARAMETROS_SEGUIMIENTO = ("utm_", "gclid", "fbclid", "msclkid", "mc_", "_ga")
+
+
+def canonicalizar_url(url: str) -> str:
+    """
+    Forma canónica de una URL para comparar resultados de búsqueda.
+
+    Añade https:// si falta, pasa esquema y host a minúsculas y quita el
+    puerto por defecto, el fragmento y los parámetros de seguimiento.
+
+    Args:
+        url: URL completa o parcial
+
+    Returns:
+        URL canónica o string vacío
+    """
+    if not url:
+        return ""
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+
+    try:
+        partes = urlsplit(url)
+        host = partes.hostname or ""
+        if partes.port and partes.port not in (80, 443):
+            host = f"{host}:{partes.port}"
+    except ValueError:
+        return url
+
+    query = urlencode([
+        (clave, valor)
+        for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not clave.lower().startswith(PARAMETROS_SEGUIMIENTO)
+    ])
+    return urlunsplit((partes.scheme.lower(), host, partes.path or "/", query, ""))
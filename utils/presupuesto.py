@@ -0,0 +1,122 @@
+"""
+Control del presupuesto de las APIs.
+
+Antes de cada llamada, los adapters reservan cuota con
+SearchAdapter.reservar_cuota(). La reserva relee data/api_usage.json,
+comprueba los topes diario y mensual de la API y anota el uso, todo dentro
+de APITracker.transaccion(). Así los hilos del orquestador, varios procesos
+del CLI y las sesiones de Streamlit pueden gastar a la vez hasta el tope del
+plan gratis, pero nunca pasarlo.
+
+Los topes salen de COSTOS_API (utils/api_tracker.py). En
+data/config_agentes.json se pueden cambiar por API con
+apis.<api>.limite_diario y apis.<api>.limite_mensual.
+"""
+from typing import Dict, Optional
+
+from utils.api_tracker import get_tracker, limites_api, unidad_api
+from utils.database import cargar_config_agentes
+
+
+# Periodo del tracker -> clave de la configuración de cada API
+CLAVES_PERIODO = {"dia": "limite_diario", "mes": "limite_mensual"}
+NOMBRES_PERIODO = {"dia": "diario", "mes": "mensual"}
+
+_config: Optional[Dict] = None
+
+
+class PresupuestoAgotado(Exception):
+    """La llamada superaría el tope diario o mensual de la API."""
+
+
+def configurar_presupuesto(config: Dict):
+    """Fija la configuración (topes por API) del proceso."""
+    global _config
+    _config = config
+
+
+def topes_api(api: str) -> Dict[str, int]:
+    """
+    Topes de una API por periodo ("dia", "mes") en su unidad (ver unidad_api).
+
+    Returns:
+        Dict periodo -> tope; vacío si la API no tiene tope
+    """
+    global _config
+    if _config is None:
+        _config = cargar_config_agentes()
+
+    topes = limites_api(api)
+    config_api = _config.get("apis", {}).get(api, {})
+    for periodo, clave in CLAVES_PERIODO.items():
+        if clave in config_api:
+            topes[periodo] = config_api[clave]
+    return topes
+
+
+def reservar_cuota(api: str, requests: int = 1, creditos: int = 0):
+    """
+    Reserva y anota en el tracker el uso de una llamada, si cabe en los topes.
+
+    Args:
+        api: Nombre de la API
+        requests: Requests que hará la llamada
+        creditos: Créditos que consumirá (Firecrawl)
+
+    Raises:
+        PresupuestoAgotado: Si con esta llamada se pasaría algún tope
+    """
+    topes = topes_api(api)
+    unidad = unidad_api(api)
+    cantidad = creditos if unidad == "creditos" else requests
+
+    tracker = get_tracker()
+    with tracker.transaccion():
+        for periodo, tope in topes.items():
+            usado = tracker.uso_periodo(api, periodo).get(unidad, 0)
+            if usado + cantidad > tope:
+                raise PresupuestoAgotado(
+                    f"{api}: tope {NOMBRES_PERIODO[periodo]} de {tope} {unidad} "
+                    f"alcanzado ({usado} usados)"
+                )
+        tracker.sumar_uso(api, requests=requests, creditos=creditos)
+
+
+def liberar_cuota(api: str, requests: int = 1, creditos: int = 0):
+    """
+    Devuelve una reserva de reservar_cuota() cuya llamada ha fallado.
+
+    Args:
+        api: Nombre de la API
+        requests: Requests reservados
+        creditos: Créditos reservados
+    """
+    tracker = get_tracker()
+    with tracker.transaccion():
+        tracker.sumar_uso(api, requests=-requests, creditos=-creditos)
+
+
+def cuota_restante(api: str) -> Optional[int]:
+    """
+    Unidades que le quedan a una API en el periodo más restrictivo.
+
+    Returns:
+        Unidades restantes, o None si la API no tiene tope
+    """
+    topes = topes_api(api)
+    if not topes:
+        return None
+
+    tracker = get_tracker()
+    tracker.recargar()
+    unidad = unidad_api(api)
+    return max(0, min(
+        tope - tracker.uso_periodo(api, periodo).get(unidad, 0)
+        for periodo, tope in topes.items()
+    ))
+
+
+def hay_cuota(api: str, cantidad: int = 1) -> bool:
+    """True si la API puede gastar `cantidad` unidades más sin pasar sus topes."""
+    restante = cuota_restante(api)
+    return restante is None or restante >= cantidad
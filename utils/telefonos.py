@@ -0,0 +1,99 @@
+"""
+Normalización canónica de teléfonos.
+
+Todas las comparaciones usan la clave entera E.164 (34XXXXXXXXX) y todo lo
+que se guarda usa el mismo formato de texto (+34 XXX XXX XXX), así que un
+mismo número escrito de formas distintas cae siempre en la misma clave.
+"""
+from functools import lru_cache
+from typing import Iterable, List, Set, Union
+
+
+PREFIJO_ESPANA = 34
+
+
+@lru_cache(maxsize=65536)
+def clave_telefono(telefono: str) -> int:
+    """
+    Clave E.164 entera de un teléfono.
+
+    Números nacionales de 9 dígitos (6, 7, 8 o 9 inicial) reciben el prefijo
+    34; con + o 00 se acepta cualquier prefijo internacional.
+
+    Args:
+        telefono: Teléfono en cualquier formato
+
+    Returns:
+        Clave (p. ej. 34912345678) o 0 si no es un teléfono reconocible
+    """
+    if not telefono:
+        return 0
+
+    telefono = str(telefono).strip()
+    digitos = "".join(c for c in telefono if c.isdigit())
+    internacional = telefono.startswith("+")
+    if digitos.startswith("00"):
+        digitos = digitos[2:]
+        internacional = True
+
+    if len(digitos) == 9 and digitos[0] in "6789":
+        return int(f"{PREFIJO_ESPANA}{digitos}")
+    if len(digitos) == 11 and digitos.startswith("34") and digitos[2] in "6789":
+        return int(digitos)
+    if internacional and 8 <= len(digitos) <= 15 and not digitos.startswith("34"):
+        return int(digitos)
+    return 0
+
+
+def formatear_telefono(clave: int) -> str:
+    """Texto canónico de una clave: +34 XXX XXX XXX, o +<dígitos> si es extranjero."""
+    if not clave:
+        return ""
+    digitos = str(clave)
+    if digitos.startswith("34") and len(digitos) == 11:
+        return f"+34 {digitos[2:5]} {digitos[5:8]} {digitos[8:]}"
+    return f"+{digitos}"
+
+
+def normalizar_telefono(telefono: str) -> str:
+    """
+    Normaliza un teléfono al formato canónico +34 XXX XXX XXX.
+
+    Args:
+        telefono: Teléfono a normalizar
+
+    Returns:
+        Teléfono normalizado o string vacío si no es reconocible
+    """
+    return formatear_telefono(clave_telefono(telefono))
+
+
+def _como_lista(telefonos: Union[str, Iterable[str], None]) -> List[str]:
+    if not telefonos:
+        return []
+    if isinstance(telefonos, str):
+        return [telefonos]
+    return [t for t in telefonos if t]
+
+
+def claves_telefonos(telefonos: Union[str, Iterable[str], None]) -> Set[int]:
+    """Claves de un campo telefono (string o lista), sin los no reconocibles."""
+    return {clave for clave in map(clave_telefono, _como_lista(telefonos)) if clave}
+
+
+def canonicalizar_telefonos(telefonos: Union[str, Iterable[str], None]) -> List[str]:
+    """
+    Lista de teléfonos en formato canónico, sin repetidos y en su orden.
+
+    Los valores no reconocibles se conservan tal cual para no perder datos.
+    """
+    resultado = []
+    vistas = set()
+    for telefono in _como_lista(telefonos):
+        clave = clave_telefono(telefono)
+        texto = formatear_telefono(clave) if clave else str(telefono).strip()
+        marca = clave or texto
+        if texto and marca not in vistas:
+            vistas.add(marca)
+            resultado.append(texto)
+    return resultado
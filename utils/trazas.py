@@ -0,0 +1,269 @@
+"""
+Trazas por etapa de una búsqueda.
+
+Cada ejecución de una ciudad activa una Traza y las etapas del pipeline se
+miden con span(): llamadas a adapters (búsquedas, Places, extracción de
+Firecrawl), cada request HTTP (SearchAdapter.llamar_api), filtrado de URLs,
+consolidación y guardado. Cada span anota duración, tamaño de la respuesta
+y si terminó bien o con error. Fuera de una ejecución trazada, span() no
+hace nada, así que las páginas y scripts que usan los mismos métodos no
+pagan nada.
+
+La traza activa va en una ContextVar: la heredan las tareas de asyncio y
+asyncio.to_thread, y cada hilo de ejecutar_multiciudad tiene la suya.
+
+Al terminar la ciudad, el orquestador exporta los spans a:
+    data/trazas.jsonl             -> un span por línea (run_id, ciudad, ...)
+    data/metricas_busqueda.prom   -> formato de texto de Prometheus, acumulado
+                                     entre ejecuciones (textfile collector)
+
+Configuración (data/config_agentes.json): trazas.habilitadas (true por defecto).
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from utils.database import bloquear_archivo
+
+
+TRAZAS_JSONL = "trazas.jsonl"
+METRICAS_PROMETHEUS = "metricas_busqueda.prom"
+MAX_BYTES_JSONL = 20 * 1024 * 1024  # al pasarlo se rota a trazas.jsonl.1
+
+# Límites de los buckets del histograma de duración (segundos)
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_traza_actual: ContextVar[Optional["Traza"]] = ContextVar("traza_actual", default=None)
+_span_actual: ContextVar[Optional[Dict[str, Any]]] = ContextVar("span_actual", default=None)
+
+
+class Traza:
+    """Spans de una ejecución de búsqueda."""
+
+    def __init__(self, ciudad: str, run_id: Optional[str] = None):
+        self.ciudad = ciudad
+        self.run_id = run_id
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()  # spans desde los hilos de asyncio.to_thread
+        self._siguiente_id = 0
+
+    def _nuevo_id(self) -> int:
+        with self._lock:
+            self._siguiente_id += 1
+            return self._siguiente_id
+
+    def agregar(self, registro: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(registro)
+
+    def resumen(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Tiempo por etapa, de más a menos segundos.
+
+        Returns:
+            Dict "etapa" o "etapa:api" -> {llamadas, segundos, max_segundos,
+            errores, bytes}
+        """
+        etapas: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            api = s["atributos"].get("api")
+            clave = f"{s['nombre']}:{api}" if api else s["nombre"]
+            etapa = etapas.setdefault(clave, {
+                "llamadas": 0, "segundos": 0.0, "max_segundos": 0.0, "errores": 0, "bytes": 0,
+            })
+            segundos = s["duracion_ms"] / 1000
+            etapa["llamadas"] += 1
+            etapa["segundos"] += segundos
+            etapa["max_segundos"] = max(etapa["max_segundos"], segundos)
+            etapa["errores"] += s["estado"] != "ok"
+            etapa["bytes"] += s["atributos"].get("bytes") or 0
+        for etapa in etapas.values():
+            etapa["segundos"] = round(etapa["segundos"], 3)
+            etapa["max_segundos"] = round(etapa["max_segundos"], 3)
+        return dict(sorted(etapas.items(), key=lambda x: -x[1]["segundos"]))
+
+
+def activar(traza: Traza):
+    """Hace de `traza` la activa en el contexto actual. Devuelve el token para desactivar()."""
+    return _traza_actual.set(traza)
+
+
+def desactivar(token):
+    _traza_actual.reset(token)
+
+
+def traza_actual() -> Optional[Traza]:
+    return _traza_actual.get()
+
+
+@contextmanager
+def span(nombre: str, **atributos) -> Iterator[Dict[str, Any]]:
+    """
+    Mide un bloque como un span de la traza activa.
+
+    Devuelve el dict de atributos, al que el bloque puede añadir datos
+    (resultados, bytes...). Si el bloque lanza una excepción, el span queda
+    con estado "error" y la excepción se propaga.
+
+    Args:
+        nombre: Etapa ("search", "llamada_api", "filtro", "guardar"...)
+        **atributos: Datos del span (api, consulta...)
+    """
+    traza = _traza_actual.get()
+    if traza is None:
+        yield atributos
+        return
+
+    padre = _span_actual.get()
+    registro = {
+        "id": traza._nuevo_id(),
+        "padre": padre["id"] if padre else None,
+        "nombre": nombre,
+        "inicio": datetime.now().isoformat(timespec="milliseconds"),
+        "estado": "ok",
+        "atributos": atributos,
+    }
+    token = _span_actual.set(registro)
+    t0 = time.perf_counter()
+    try:
+        yield atributos
+    except BaseException as e:
+        registro["estado"] = "error"
+        registro["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        registro["duracion_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        _span_actual.reset(token)
+        traza.agregar(registro)
+
+
+def anotar(**atributos):
+    """Añade atributos al span abierto en el contexto actual (si lo hay)."""
+    actual = _span_actual.get()
+    if actual is not None:
+        actual["atributos"].update(atributos)
+
+
+def tamano_payload(respuesta: Any) -> int:
+    """Bytes aproximados de una respuesta: cuerpo HTTP o JSON de los resultados."""
+    contenido = getattr(respuesta, "content", None)
+    if isinstance(contenido, (bytes, str)):
+        return len(contenido)
+    if isinstance(respuesta, list):
+        respuesta = [r.to_dict() if hasattr(r, "to_dict") else r for r in respuesta]
+    try:
+        return len(json.dumps(respuesta, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def exportar_jsonl(traza: Traza, path: Union[str, Path]):
+    """Añade los spans de la traza a un archivo JSON-lines (rota al pasar MAX_BYTES_JSONL)."""
+    path = Path(path)
+    lineas = "".join(
+        json.dumps({"run_id": traza.run_id, "ciudad": traza.ciudad, **s}, ensure_ascii=False, default=str) + "\n"
+        for s in traza.spans
+    )
+    with bloquear_archivo(path.with_name(path.name + ".lock")):
+        if path.exists() and path.stat().st_size > MAX_BYTES_JSONL:
+            os.replace(path, path.with_name(path.name + ".1"))
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lineas)
+
+
+# Formato de texto de Prometheus: nombre{etiquetas} valor
+_LINEA_METRICA = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$")
+
+_METRICAS = {
+    "busqueda_span_segundos": ("histogram", "Duración de cada etapa de la búsqueda"),
+    "busqueda_span_errores_total": ("counter", "Spans terminados con error"),
+    "busqueda_span_bytes_total": ("counter", "Bytes recibidos por etapa"),
+    "busqueda_ejecuciones_total": ("counter", "Búsquedas de ciudad terminadas"),
+    "busqueda_ejecucion_segundos": ("gauge", "Duración de la última búsqueda de la ciudad"),
+}
+
+
+def _etiquetas(**valores) -> str:
+    partes = []
+    for clave, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        partes.append(f'{clave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _orden_muestra(muestra: Tuple[Tuple[str, str], float]) -> Tuple:
+    """Orden estable del archivo, con los buckets de cada serie de menor a mayor `le`."""
+    (nombre, etiquetas), _ = muestra
+    le = re.search(r',le="([^"]*)"', etiquetas)
+    if not le:
+        return nombre, etiquetas, 0.0
+    return nombre, etiquetas[:le.start()], float(le.group(1).replace("+Inf", "inf"))
+
+
+def _leer_metricas(path: Path) -> Dict[Tuple[str, str], float]:
+    muestras = {}
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for linea in f:
+                encontrada = _LINEA_METRICA.match(linea.strip())
+                if encontrada and not linea.startswith("#"):
+                    nombre, etiquetas, valor = encontrada.groups()
+                    try:
+                        muestras[(nombre, etiquetas or "")] = float(valor)
+                    except ValueError:
+                        pass
+    return muestras
+
+
+def exportar_prometheus(traza: Traza, path: Union[str, Path], duracion_segundos: float):
+    """
+    Suma los spans de la traza a las métricas acumuladas del archivo.
+
+    Histograma de duración, errores y bytes por (etapa, api), más
+    ejecuciones y duración de la última por ciudad.
+    """
+    path = Path(path)
+    with bloquear_archivo(path.with_name(path.name + ".lock")):
+        muestras = _leer_metricas(path)
+
+        def sumar(nombre: str, etiquetas: str, valor: float):
+            muestras[(nombre, etiquetas)] = muestras.get((nombre, etiquetas), 0.0) + valor
+
+        for s in traza.spans:
+            etapa, api = s["nombre"], s["atributos"].get("api", "")
+            segundos = s["duracion_ms"] / 1000
+            for limite in BUCKETS_SEGUNDOS:
+                sumar("busqueda_span_segundos_bucket", _etiquetas(etapa=etapa, api=api, le=limite),
+                      segundos <= limite)
+            sumar("busqueda_span_segundos_bucket", _etiquetas(etapa=etapa, api=api, le="+Inf"), 1)
+            sumar("busqueda_span_segundos_sum", _etiquetas(etapa=etapa, api=api), segundos)
+            sumar("busqueda_span_segundos_count", _etiquetas(etapa=etapa, api=api), 1)
+            sumar("busqueda_span_errores_total", _etiquetas(etapa=etapa, api=api), s["estado"] != "ok")
+            sumar("busqueda_span_bytes_total", _etiquetas(etapa=etapa, api=api),
+                  s["atributos"].get("bytes") or 0)
+
+        ciudad = _etiquetas(ciudad=traza.ciudad.lower())
+        sumar("busqueda_ejecuciones_total", ciudad, 1)
+        muestras[("busqueda_ejecucion_segundos", ciudad)] = round(duracion_segundos, 3)
+
+        lineas = []
+        for metrica, (tipo, ayuda) in _METRICAS.items():
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} {tipo}"]
+            for (nombre, etiquetas), valor in sorted(muestras.items(), key=_orden_muestra):
+                if nombre == metrica or (tipo == "histogram" and nombre.rsplit("_", 1)[0] == metrica):
+                    valor = int(valor) if valor.is_integer() else round(valor, 6)
+                    lineas.append(f"{nombre}{etiquetas} {valor}")
+
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lineas) + "\n")
+        os.replace(tmp, path)
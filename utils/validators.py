@@ -4,6 +4,8 @@ Funciones de validación y normalización.
 import re
 from typing import Optional
 
+from .telefonos import normalizar_telefono
+
 
 def validar_email(email: str) -> bool:
     """
@@ -59,43 +61,6 @@ def validar_telefono(telefono: str) -> bool:
     return False
 
 
-def normalizar_telefono(telefono: str) -> str:
-    """
-    Normaliza teléfono al formato +34 XXX XXX XXX.
-    
-    Args:
-        telefono: Teléfono a normalizar
-        
-    Returns:
-        Teléfono normalizado o string vacío si inválido
-    """
-    if not telefono:
-        return ""
-    
-    # Extraer dígitos y +
-    limpio = "".join(c for c in telefono if c.isdigit() or c == "+")
-    
-    # Quitar + para procesar
-    tiene_plus = limpio.startswith("+")
-    if tiene_plus:
-        limpio = limpio[1:]
-    
-    # Normalizar a formato 34XXXXXXXXX
-    if limpio.startswith("34"):
-        pass  # Ya tiene prefijo
-    elif len(limpio) == 9 and limpio[0] in "6789":
-        limpio = "34" + limpio
-    else:
-        return ""  # Formato no reconocido
-    
-    # Verificar longitud final
-    if len(limpio) != 11:
-        return ""
-    
-    # Formatear: +34 XXX XXX XXX
-    return f"+{limpio[:2]} {limpio[2:5]} {limpio[5:8]} {limpio[8:]}"
-
-
 def normalizar_email(email: str) -> Optional[str]:
     """
     Normaliza y valida email.